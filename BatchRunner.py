@@ -0,0 +1,142 @@
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LabeledOutput:
+    def __init__(self, stream):
+        """
+        Stand-in for sys.stdout that prefixes every line with the label of the thread that printed it.
+
+        Lines are buffered per thread and written whole, so the output of packs exported at the same time
+        interleaves line by line instead of mid-line.
+
+        Parameters:
+        - stream: the stream the labeled lines are written to, usually the original sys.stdout.
+        """
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def set_label(self, label):
+        """This method sets the label of the calling thread, None for unlabeled output."""
+        self.flush()
+        self.local.label = label
+
+    def inherit(self):
+        """This method returns a thread initializer that gives new threads the label of the calling thread."""
+        label = getattr(self.local, "label", None)
+        return lambda: self.set_label(label)
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", "") + text
+        *lines, self.local.buffer = buffer.split("\n")
+        if lines:
+            label = getattr(self.local, "label", None)
+            prefix = f"[{label}] " if label else ""
+            with self.lock:
+                self.stream.write("".join(f"{prefix}{line}\n" for line in lines))
+        return len(text)
+
+    def flush(self):
+        buffer = getattr(self.local, "buffer", "")
+        if buffer:
+            self.local.buffer = ""
+            self.write(buffer + "\n")
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class PackResult:
+    def __init__(self, label):
+        """
+        The outcome of one pack of a batch.
+
+        Parameters:
+        - label: str, the name the pack is reported under.
+        """
+        self.label = label
+        self.version = None
+        self.status = "pending"
+        self.duration = 0.0
+        self.error = None
+        self.scheduler = None   # StageScheduler, set by the job once its stages are added
+
+    def stage_states(self, state):
+        """This method returns the names of the pack's stages that ended in the given state."""
+        if self.scheduler is None:
+            return []
+        return [name for name, stage in self.scheduler.stages.items() if stage.status == state]
+
+
+class BatchRunner:
+    def __init__(self, max_workers=2):
+        """
+        Runs one job per pack on a thread pool, labeling the output of every pack and summarising them at the end.
+
+        A job that raises fails its own pack only, the other packs keep going.
+
+        Parameters:
+        - max_workers: int, the number of packs processed at once.
+        """
+        self.max_workers = max_workers
+        self.output = LabeledOutput(sys.stdout)
+
+    def _run_job(self, result, job):
+        self.output.set_label(result.label)
+        start = time.perf_counter()
+        try:
+            job(result)
+            result.status = "done"
+        except Exception as ex:
+            result.status = "failed"
+            result.error = ex
+            print(f"[Batch] Failed: {ex}")
+        finally:
+            result.duration = time.perf_counter() - start
+            self.output.set_label(None)
+
+    def run(self, jobs):
+        """
+        Run the jobs and print the summary.
+
+        Parameters:
+        - jobs: list of (label, job) tuples, where job is a callable receiving the pack's PackResult. Labels
+          must be unique.
+
+        Returns:
+        - list of PackResult in the order of the jobs.
+        """
+        results = [PackResult(label) for label, _ in jobs]
+        start = time.perf_counter()
+        stdout = sys.stdout
+        sys.stdout = self.output
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for result, (_, job) in zip(results, jobs):
+                    executor.submit(self._run_job, result, job)
+        finally:
+            self.output.flush()
+            sys.stdout = stdout
+        self.wall_time = time.perf_counter() - start
+        self.print_summary(results)
+        return results
+
+    def print_summary(self, results):
+        """This method prints the outcome of every pack with the stages that did not finish."""
+        print("")
+        for result in results:
+            name = f"{result.label} {result.version}" if result.version else result.label
+            line = f"[Batch] {name}: {result.status} in {result.duration:.2f} s"
+            if result.error is not None:
+                line += f" ({result.error})"
+            print(line)
+            for state in ("failed", "skipped"):
+                stages = result.stage_states(state)
+                if stages:
+                    print(f"[Batch]     {state.capitalize()} stages: {', '.join(stages)}")
+        done = sum(result.status == "done" for result in results)
+        print(f"[Batch] {done} of {len(results)} packs finished, {sum(result.duration for result in results):.2f} s of pack time, {self.wall_time:.2f} s wall time.")
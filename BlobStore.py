@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+
+# Written into every materialised version folder, maps file names to git blob SHAs.
+MANIFEST_NAME = ".manifest.json"
+STORE_NAME = ".blobs"
+
+
+def git_blob_sha(data):
+    """This function returns the git blob SHA of the given bytes, the same value git and the trees API report."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def read_manifest(folder):
+    """This function returns the manifest of a version folder, or None if it has none."""
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME), "r", encoding="utf8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(folder, tree_sha, files):
+    """This function writes the manifest of a version folder."""
+    with open(os.path.join(folder, MANIFEST_NAME), "w", encoding="utf8") as f:
+        json.dump({"tree": tree_sha, "files": files}, f, indent=1, sort_keys=True)
+
+
+class BlobStore:
+    def __init__(self, root):
+        """
+        Content-addressed store of file contents keyed by git blob SHA, shared by all version folders.
+
+        Version folders are materialised as hardlinks into the store (copies where hardlinks are not supported),
+        so a file that is identical across releases is stored once.
+
+        Parameters:
+        - root: str, the folder containing the version folders. The store itself lives in its .blobs subfolder.
+        """
+        self.root = root
+        self.store_path = os.path.join(root, STORE_NAME)
+
+    def blob_path(self, blob_sha):
+        return os.path.join(self.store_path, blob_sha[:2], blob_sha[2:])
+
+    def __contains__(self, blob_sha):
+        return os.path.exists(self.blob_path(blob_sha))
+
+    def remove(self, blob_sha):
+        """This method drops a blob from the store, e.g. one that failed verification, so it is fetched again."""
+        try:
+            os.remove(self.blob_path(blob_sha))
+        except FileNotFoundError:
+            pass
+
+    def add_file(self, file_path, blob_sha=None, move=False):
+        """
+        Add an existing file to the store.
+
+        Parameters:
+        - file_path: str, the file to add.
+        - blob_sha: str, the expected blob SHA. A ValueError is raised if the content does not match.
+        - move: bool, whether the file may be moved into the store instead of copied.
+
+        Returns:
+        - The blob SHA of the file.
+        """
+        with open(file_path, "rb") as f:
+            actual_sha = git_blob_sha(f.read())
+        if blob_sha is not None and actual_sha != blob_sha:
+            raise ValueError(f"{file_path} does not match blob {blob_sha}")
+
+        blob_path = self.blob_path(actual_sha)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temp_path = f"{blob_path}.{os.getpid()}.tmp"
+            if move:
+                os.replace(file_path, temp_path)
+            else:
+                shutil.copyfile(file_path, temp_path)
+            os.replace(temp_path, blob_path)
+        return actual_sha
+
+    def add_bytes(self, data, blob_sha=None):
+        """This method adds the given bytes to the store and returns their blob SHA."""
+        actual_sha = git_blob_sha(data)
+        if blob_sha is not None and actual_sha != blob_sha:
+            raise ValueError(f"Downloaded content does not match blob {blob_sha}")
+
+        blob_path = self.blob_path(actual_sha)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temp_path = f"{blob_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, blob_path)
+        return actual_sha
+
+    def _link(self, blob_sha, file_path):
+        """This method places a blob at the given path as a hardlink, falling back to a copy."""
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        try:
+            os.link(self.blob_path(blob_sha), file_path)
+        except OSError:
+            shutil.copyfile(self.blob_path(blob_sha), file_path)
+
+    def materialize(self, folder, files, tree_sha=None):
+        """
+        Create a version folder from blobs in the store and write its manifest.
+
+        Parameters:
+        - folder: str, the version folder to create.
+        - files: dict, file name -> blob SHA. Every blob must already be in the store.
+        - tree_sha: str, optional git tree SHA of the folder.
+        """
+        os.makedirs(folder, exist_ok=True)
+        for filename, blob_sha in files.items():
+            self._link(blob_sha, os.path.join(folder, filename))
+        write_manifest(folder, tree_sha, files)
+
+    def version_folders(self):
+        """This method returns the paths of all version folders next to the store."""
+        if not os.path.isdir(self.root):
+            return []
+        return [entry.path for entry in os.scandir(self.root) if entry.is_dir() and entry.name != STORE_NAME and not entry.name.endswith(".partial")]
+
+    def ingest_folder(self, folder):
+        """This method adds the files of a folder without a manifest to the store, relinks them and writes the manifest."""
+        files = {}
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.name != MANIFEST_NAME:
+                files[entry.name] = self.add_file(entry.path)
+        self.materialize(folder, files)
+        return read_manifest(folder)
+
+    def index(self):
+        """
+        Index the version folders, ingesting folders that were created before the store existed.
+
+        Returns:
+        - (trees, blobs) where trees maps tree SHAs to version folders and blobs is the set of blob SHAs in use.
+        """
+        trees = {}
+        blobs = set()
+        for folder in self.version_folders():
+            manifest = read_manifest(folder)
+            if manifest is None:
+                manifest = self.ingest_folder(folder)
+            if manifest.get("tree"):
+                trees[manifest["tree"]] = folder
+            blobs.update(manifest["files"].values())
+        return trees, blobs
+
+    def gc(self, retained_versions=None):
+        """
+        Drop blobs that are not referenced by any retained version folder.
+
+        Parameters:
+        - retained_versions: list of str, optional names of the version folders to keep. Other version folders are removed first.
+
+        Returns:
+        - (removed version folders, removed blobs, freed bytes)
+        """
+        removed_folders = 0
+        if retained_versions is not None:
+            retained_versions = set(retained_versions)
+            for folder in self.version_folders():
+                if os.path.basename(folder) not in retained_versions:
+                    shutil.rmtree(folder)
+                    removed_folders += 1
+
+        _, referenced = self.index()
+
+        removed_blobs = freed_bytes = 0
+        if os.path.isdir(self.store_path):
+            for prefix in os.scandir(self.store_path):
+                if not prefix.is_dir():
+                    continue
+                for blob in os.scandir(prefix.path):
+                    if prefix.name + blob.name not in referenced:
+                        freed_bytes += blob.stat().st_size
+                        os.remove(blob.path)
+                        removed_blobs += 1
+                if not os.listdir(prefix.path):
+                    os.rmdir(prefix.path)
+
+        return removed_folders, removed_blobs, freed_bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the blob store behind the tempgit comparison folders.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subparsers.add_parser("gc", help="Drop blobs that are not referenced by any retained version folder.")
+    gc_parser.add_argument("root", help="The tempgit folder.")
+    gc_parser.add_argument("--keep", nargs="+", metavar="VERSION", help="Only retain these version folders, all others are removed first.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        sys.exit(f"{args.root} does not exist.")
+
+    removed_folders, removed_blobs, freed_bytes = BlobStore(args.root).gc(args.keep)
+    print(f"Removed {removed_folders} version folders and {removed_blobs} blobs, freed {freed_bytes / 1024:.1f} KiB.")
@@ -0,0 +1,132 @@
+import os
+import yaml
+
+# Use the libyaml backed loader when PyYAML was built with it, it is several times faster.
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class ChangelogCorpus:
+    def __init__(self, changelog_dir):
+        """
+        Loads every changelog YAML file in a directory once and keeps the parsed data in memory.
+
+        Parameters:
+        - changelog_dir: str, the directory containing the changelog YAML files.
+        """
+        self.changelog_dir = changelog_dir
+
+        self.files = {}     # changelog file name -> parsed YAML data
+        self.versions = []  # version strings, newest first
+        self._version_files = {}  # version -> changelog file name
+        self._version_index = {}  # version -> position in self.versions
+
+        self.load()
+
+    def _load_file(self, changelog_yml):
+        """This method parses a single changelog file and returns its data, or None if it could not be parsed."""
+        file_path = os.path.join(self.changelog_dir, changelog_yml)
+        try:
+            with open(file_path, "r", encoding="utf8") as f:
+                return yaml.load(f, Loader=YamlLoader)
+        except yaml.YAMLError as e:
+            print(f"Error parsing {file_path}: {e}") # Handle YAML errors gracefully
+        except OSError as e:
+            print(f"Error reading {file_path}: {e}")
+        return None
+
+    def load(self):
+        """This method (re)loads all changelog files and rebuilds the version index."""
+        # Sorted in reverse so that the newest changelog comes first, matching the Windows directory listing order.
+        changelog_list = sorted((f for f in os.listdir(self.changelog_dir) if f.endswith(('.yml', '.yaml'))), reverse=True)
+        # Parsing holds the GIL, so the files are read one after another.
+        loaded = [self._load_file(changelog) for changelog in changelog_list]
+
+        self.files = {changelog_yml: data for changelog_yml, data in zip(changelog_list, loaded) if isinstance(data, dict)}
+        self._build_index()
+
+    def reload_files(self, changelog_files):
+        """
+        Re-parse only the given changelog files, which may have been added, edited or deleted, and rebuild the version index.
+
+        Returns:
+        - set of the versions whose changelog was among the files, before or after the reload.
+        """
+        changelog_files = [f for f in changelog_files if f.endswith(('.yml', '.yaml'))]
+        versions = {version for version, changelog_yml in self._version_files.items() if changelog_yml in changelog_files}
+        for changelog_yml in changelog_files:
+            self.files.pop(changelog_yml, None)
+            if os.path.isfile(os.path.join(self.changelog_dir, changelog_yml)):
+                data = self._load_file(changelog_yml)
+                if isinstance(data, dict):
+                    self.files[changelog_yml] = data
+        self._build_index()
+        versions.update(version for version, changelog_yml in self._version_files.items() if changelog_yml in changelog_files)
+        return versions
+
+    def _build_index(self):
+        """This method rebuilds the version index from the loaded changelog files."""
+        self.versions = []
+        self._version_files = {}
+        self._version_index = {}
+
+        for changelog_yml in sorted(self.files, reverse=True):
+            data = self.files[changelog_yml]
+            if data.get("version") is None:
+                print(f"Key 'version' not found in {os.path.join(self.changelog_dir, changelog_yml)}")
+                continue
+            version = str(data["version"])
+            if version in self._version_index:
+                print(f"Duplicate changelog for version {version}: {changelog_yml}")
+                continue
+            self._version_index[version] = len(self.versions)
+            self._version_files[version] = changelog_yml
+            self.versions.append(version)
+
+    def __len__(self):
+        return len(self.versions)
+
+    def __iter__(self):
+        return iter(self.versions)
+
+    def __contains__(self, version):
+        return str(version) in self._version_index
+
+    def get_file_value(self, changelog_yml, key):
+        """This method returns the value of a key from a changelog file, or None if the file or key does not exist."""
+        changelog_data = self.files.get(changelog_yml)
+        if changelog_data is None:
+            return None
+        try:
+            return changelog_data[key]
+        except KeyError:
+            print(f"Key '{key}' not found in {os.path.join(self.changelog_dir, changelog_yml)}") # Handle missing key
+
+    def get_value(self, version, key):
+        """This method returns the value of a key from the changelog of the given version."""
+        changelog_yml = self._version_files.get(str(version))
+        if changelog_yml is None:
+            return None
+        return self.get_file_value(changelog_yml, key)
+
+    def get_file_name(self, version):
+        """This method returns the name of the changelog file belonging to the given version."""
+        return self._version_files.get(str(version))
+
+    def next_version(self, version):
+        """This method returns the version released before the given version, or None if it is the oldest one."""
+        index = self._version_index.get(str(version))
+        if index is None or index + 1 >= len(self.versions):
+            return None
+        return self.versions[index + 1]
+
+    def previous_version(self, version):
+        """This method returns the version released after the given version, or None if it is the newest one."""
+        index = self._version_index.get(str(version))
+        if not index:
+            return None
+        return self.versions[index - 1]
+
+    def pairs(self):
+        """This method yields (version, next_version) tuples from newest to oldest. next_version is None for the oldest version."""
+        for i, version in enumerate(self.versions):
+            yield version, (self.versions[i + 1] if i + 1 < len(self.versions) else None)
@@ -1,184 +1,314 @@
 import os
-import yaml
-from mdutils.mdutils import MdUtils
+import json
+import hashlib
+import contextlib
 import re
-import toml
 import itertools
 import MarkdownHelper as markdown
 import GitHubHelper as github
+from ChangelogCorpus import ChangelogCorpus
+from ModSnapshot import SnapshotLoader, snapshot_key
+from HistoryMatrix import HistoryMatrix
+from DiffCache import folder_fingerprint
 
 class ChangelogFactory:
-    def __init__(self, changelog_dir, modpack_name, modpack_version):
+    # Bump this whenever the layout of the changelog sections changes, older manifests then trigger a full rebuild.
+    CHANGELOG_MANIFEST_VERSION = 1
+
+    def __init__(self, changelog_dir, modpack_name, modpack_version, corpus=None, snapshot_loader=None, diff_cache=None):
         self.changelog_dir = changelog_dir
         self.modpack_name = modpack_name
         self.modpack_version = modpack_version
+        # Every changelog YAML is parsed once and shared by all callers.
+        self.corpus = corpus if corpus is not None else ChangelogCorpus(changelog_dir)
+        # Every mods folder is parsed once and shared by all comparisons.
+        self.snapshot_loader = snapshot_loader if snapshot_loader is not None else SnapshotLoader()
+        # Optional DiffCache, comparisons of unchanged folders are then read from disk instead of recomputed.
+        self.diff_cache = diff_cache
+        # Version x mod matrix of every folder compared so far, with diffs precomputed by prepare_history.
+        self.history = HistoryMatrix()
+        self._history_diffs = {}
     
     def get_changelog_value(self, changelog_yml, key):
-        if changelog_yml.endswith(('.yml', '.yaml')) and changelog_yml:  # Filter only YAML files
-            file_path = os.path.join(self.changelog_dir, changelog_yml)
-            try:
-                with open(file_path, "r", encoding="utf8") as f: # Open the YAML file and load its contents
-                    changelog_data = yaml.safe_load(f)
-                    return changelog_data[key] # Returns value of key
-            except yaml.YAMLError as e:
-                print(f"Error parsing {file_path}: {e}") # Handle YAML errors gracefully
-            except KeyError:
-                print(f"Key '{key}' not found in {file_path}") # Handle missing key
-            finally:
-                f.close()
+        if changelog_yml and changelog_yml.endswith(('.yml', '.yaml')):  # Filter only YAML files
+            return self.corpus.get_file_value(changelog_yml, key)
 
     def compare_toml_files(self, dir1, dir2):
-        # Initialize dictionaries to store TOML data
-        toml_data_1 = {}
-        toml_data_2 = {}
-        
-
-        def local_load_toml_files_from_dir(dir, dict):
-            try:
-                for filename in os.listdir(dir):
-                    if filename.endswith('.toml'):
-                        filepath = os.path.join(dir, filename)
-                        with open(filepath, "r", encoding="utf8") as f:
-                            mod_toml = toml.load(f)
-                            side = str(mod_toml['side'])
-                            if side in ("both", "client", "server"):
-                                dict[filename] = toml.load(filepath)
-            except Exception as ex:
-                print(ex)
-
-        local_load_toml_files_from_dir(dir1, toml_data_1)
-        local_load_toml_files_from_dir(dir2, toml_data_2)
-
-
-        # Prepare to store results
+        if self.diff_cache is not None:
+            return self.diff_cache.get_or_compute(dir1, dir2, lambda: self._compare_toml_files(dir1, dir2))
+        return self._compare_toml_files(dir1, dir2)
+
+    def _compare_toml_files(self, dir1, dir2):
+        return self.format_differences(self.compare_mod_files(dir1, dir2))
+
+    def compare_mod_files(self, dir1, dir2):
+        """This method returns the unformatted diff of two mods folders: (metafile name, old record, new record) tuples with (name, side, filename) records."""
+        pair = (snapshot_key(dir1), snapshot_key(dir2))
+        raw_differences = self._history_diffs.get(pair)
+        if raw_differences is None:
+            self._add_to_history([dir1, dir2])
+            raw_differences = self.history.diff(*pair)
+        return raw_differences
+
+    def _add_to_history(self, paths):
+        """This method loads the snapshots of the given folders into the history matrix, skipping folders already in it."""
+        paths = [path for path in dict.fromkeys(paths) if snapshot_key(path) not in self.history]
+        for snapshot in self.snapshot_loader.load_many(paths):
+            self.history.add_version(snapshot_key(snapshot.path), snapshot)
+
+    def add_snapshot(self, snapshot, tempgit_path=None, packwiz_mods_path=None):
+        """
+        This method adds a snapshot to the history matrix as soon as it is available, e.g. from a download stream.
+
+        If the comparison paths are given, every changelog pair whose folders are both in the history by now is diffed right away.
+        """
+        self.history.add_version(snapshot_key(snapshot.path), snapshot)
+        if tempgit_path is None:
+            return
+
+        ready_pairs = []
+        for version, next_version in self.corpus.pairs():
+            if not next_version:
+                continue
+            pair = tuple(snapshot_key(path) for path in self.get_comparison_paths(version, next_version, tempgit_path, packwiz_mods_path))
+            if pair not in self._history_diffs and snapshot.path and snapshot_key(snapshot.path) in pair and all(key in self.history for key in pair):
+                ready_pairs.append(pair)
+        self._history_diffs.update(self.history.diff_pairs(ready_pairs))
+
+    def refresh_snapshot(self, snapshot):
+        """
+        This method replaces the history of a folder whose snapshot changed, e.g. after SnapshotLoader.update_files.
+
+        Diffs involving the folder are dropped, and so is its remembered fingerprint, so the next comparison sees the change.
+        """
+        key = snapshot_key(snapshot.path)
+        self.history.add_version(key, snapshot)
+        self._history_diffs = {pair: differences for pair, differences in self._history_diffs.items() if key not in pair}
+        if self.diff_cache is not None:
+            self.diff_cache.forget_fingerprint(snapshot.path)
+
+    def prepare_history(self, tempgit_path, packwiz_mods_path, versions=None):
+        """
+        This method diffs every version pair of the changelog that is not cached yet in a single sweep over the history matrix.
+
+        If versions is given, only the pairs of those versions are diffed.
+        """
+        missing_pairs = []
+        for version, next_version in self.corpus.pairs():
+            if not next_version or (versions is not None and version not in versions):
+                continue
+            pair = self.get_comparison_paths(version, next_version, tempgit_path, packwiz_mods_path)
+            if (snapshot_key(pair[0]), snapshot_key(pair[1])) in self._history_diffs:
+                continue
+            if self.diff_cache is None or not self.diff_cache.contains(*pair):
+                missing_pairs.append(pair)
+
+        if not missing_pairs:
+            return
+
+        self._add_to_history([path for pair in reversed(missing_pairs) for path in pair])
+        self._history_diffs.update(self.history.diff_pairs((snapshot_key(old), snapshot_key(new)) for old, new in missing_pairs))
+
+    def format_differences(self, raw_differences):
+        """This method turns a HistoryMatrix diff into the added/removed/modified lists used by the changelogs."""
         results = {
             'added': [],
             'removed': [],
             'modified': []
         }
 
-
         def local_get_side_str(side):
             if side != "both":
                 return f" `{str(side).capitalize()}`"
             else:
                 return ""
-        # Check for added and modified files
-        for filename, data in toml_data_2.items():
-            if filename not in toml_data_1:
-                name_data_1 = data.get('name', filename)
-                side_data_1 = data.get('side', filename)
-                side_str_1 = local_get_side_str(side_data_1)
-                results['added'].append(markdown.remove_bracketed_text(name_data_1) + side_str_1) # + str(data.get('side', filename)).capitalize()
-            else:
-                # Compare "version" fields
-                version1 = toml_data_1[filename].get('filename', None)
-                version2 = data.get('filename', None)
-                if version1 != version2:
-                    results['modified'].append((markdown.remove_bracketed_text(data.get('name', filename)), version1, version2))
-
-        # Check for removed files
-        for filename in toml_data_1.keys():
-            if filename not in toml_data_2:
-                side_data_2 = toml_data_1[filename].get('side', filename)
-                side_str_2 = local_get_side_str(side_data_2)
-                results['removed'].append(markdown.remove_bracketed_text(toml_data_1[filename].get('name', filename) + side_str_2))
+
+        for _, _, (name, side, _) in raw_differences['added']:
+            results['added'].append(markdown.remove_bracketed_text(name) + local_get_side_str(side))
+
+        for _, (name, side, _), _ in raw_differences['removed']:
+            results['removed'].append(markdown.remove_bracketed_text(name + local_get_side_str(side)))
+
+        for _, (_, _, version1), (name, _, version2) in raw_differences['modified']:
+            results['modified'].append((markdown.remove_bracketed_text(name), version1, version2))
 
         return results
 
+    def compare_versions(self, old_version, new_version, tempgit_path, packwiz_mods_path):
+        """This method compares any two versions directly, e.g. 2.0.0 -> 2.5.0, without walking the versions in between."""
+        def local_get_version_path(version):
+            if str(version) == str(self.modpack_version):
+                return packwiz_mods_path
+            return os.path.join(tempgit_path, str(version))
+
+        return self.compare_toml_files(local_get_version_path(old_version), local_get_version_path(new_version))
+
+    def get_comparison_paths(self, version, next_version, tempgit_path, packwiz_mods_path):
+        """This method returns the (old, new) mods folders to compare for a version. The work in progress version is compared against the live mods folder."""
+        next_version_path = os.path.join(tempgit_path, str(next_version))
+        if str(version) == str(self.modpack_version):
+            return next_version_path, packwiz_mods_path
+        return next_version_path, os.path.join(tempgit_path, str(version))
 
     def Reverse(self, lst):
         new_lst = lst[::-1]
         return new_lst
 
 
-    def build_markdown_changelog(self, repo_owner, repo_name, tempgit_path, packwiz_mods_path, file_name="CHANGELOG", repo_branch = "main", mc_version=None):
-        mdFile = MdUtils(file_name)
+    def build_markdown_changelog(self, repo_owner, repo_name, tempgit_path, packwiz_mods_path, file_name="CHANGELOG", repo_branch = "main", mc_version=None, manifest_path=None):
+        """
+        This method writes the combined changelog of every version.
+
+        With a manifest_path, the inputs of every version section (its changelog YAML, the fingerprints of the compared
+        mods folders and the render options) are hashed and recorded next to the section's position in the file. On the
+        next run only sections whose inputs changed are diffed and rendered, the others are copied from the existing file.
+        A missing or stale manifest, a changed version list or an edited file fall back to a full rebuild.
+        """
+        file_path = os.path.abspath(file_name + ".md")
+        pairs = list(self.corpus.pairs())
+        section_inputs = [self._changelog_section_inputs(version, next_version, tempgit_path, packwiz_mods_path, repo_owner, repo_name, repo_branch) for version, next_version in pairs]
+
+        manifest = self._read_changelog_manifest(manifest_path, file_path, [version for version, _ in pairs]) if manifest_path else None
+        if manifest is None:
+            changed = set(range(len(pairs)))
+        else:
+            changed = {i for i, inputs in enumerate(section_inputs) if manifest["sections"][i]["inputs"] != inputs}
+
+        # Diff every uncached version pair that is rendered in one sweep before rendering.
+        self.prepare_history(tempgit_path, packwiz_mods_path, versions={pairs[i][0] for i in changed})
+
+        # Unchanged sections are copied from the old file while the new one is written, both are read and written in order.
+        sections = []
+        digest = hashlib.sha1()
+        with markdown.MarkdownWriter.open(file_path, digest) as writer:
+            # The old file must be closed before the new one is renamed over it (Windows refuses to replace open files).
+            with (open(file_path, "r", encoding="utf-8") if manifest is not None else contextlib.nullcontext()) as old_file:
+                self._write_changelog_header(writer, mc_version)
+                position = 0
+                for i, (version, next_version) in enumerate(pairs):
+                    offset = writer.length
+                    if i in changed:
+                        self._write_changelog_section(writer, version, next_version, repo_owner, repo_name, tempgit_path, packwiz_mods_path, repo_branch)
+                    else:
+                        old_section = manifest["sections"][i]
+                        old_file.read(old_section["offset"] - position)
+                        writer.write(old_file.read(old_section["length"]))
+                        position = old_section["offset"] + old_section["length"]
+                    sections.append({"version": version, "inputs": section_inputs[i], "offset": offset, "length": writer.length - offset})
 
-        changelog_list = self.Reverse(os.listdir(self.changelog_dir))
-        #changelog_list_reversed = self.Reverse(changelog_list)
-        #changelog_iter1, changelog_iter2 = itertools.tee(changelog_list)
+        if manifest_path:
+            self._write_changelog_manifest(manifest_path, file_path, digest.hexdigest(), sections)
+            print(f"[Changelog] Rendered {len(changed)} of {len(pairs)} version sections.")
 
-        # Iterate over the list with an index using enumerate
-        mdFile.new_paragraph(f"##### {self.modpack_name}")
+    def _write_changelog_header(self, writer, mc_version=None):
+        """This method writes the title and heading of the combined changelog."""
+        writer.title()
+        writer.paragraph(f"##### {self.modpack_name}")
 
         if mc_version:
-            mdFile.new_paragraph(f"# Changelog - {mc_version}")
+            writer.paragraph(f"# Changelog - {mc_version}")
+        else:
+            writer.paragraph(f"# Changelog")
+
+    def _write_changelog_section(self, writer, version, next_version, repo_owner, repo_name, tempgit_path, packwiz_mods_path, repo_branch="main"):
+        """This method writes the section of a single version of the combined changelog."""
+        added_mods = None
+        removed_mods = None
+
+        fabric_loader = self.corpus.get_value(version, "Fabric version")
+        improvements = self.corpus.get_value(version, "Changes/Improvements")
+        overview_legacy = self.corpus.get_value(version, "Update overview")
+        bug_fixes = self.corpus.get_value(version, "Bug Fixes")
+        config_changes = self.corpus.get_value(version, "Config Changes")
+
+        next_version_path = os.path.join(tempgit_path, str(next_version))
+        version_path = os.path.join(tempgit_path, str(version))
+
+        print(f"[DEBUG] {next_version_path} + {version_path}")
+
+        if next_version:
+            differences = self.compare_toml_files(*self.get_comparison_paths(version, next_version, tempgit_path, packwiz_mods_path))
         else:
-            mdFile.new_paragraph(f"# Changelog")
+            differences = None
 
-        for i, changelog in enumerate(changelog_list):
-            # Check if there's a "next" item
-            if i + 1 < len(changelog_list):
-                next_changelog = changelog_list[i + 1]
+        if differences:
+            added_mods = differences['added']
+            removed_mods = differences['removed']
+
+        if version == self.modpack_version: # and not github.check_tag_exists(repo_owner, repo_name, version)
+                writer.heading(f"v{version} `Work in progress`", 2)
+        else: 
+            if not "v" in version:
+                writer.heading(f"v{version}", 2)
             else:
-                next_changelog = None  # No next item if we're at the last one
-
-
-            added_mods = None
-            removed_mods = None
-
-            if changelog.endswith(('.yml', '.yaml')):  # Filter only YAML files
-                version = self.get_changelog_value(changelog, "version")
-                if next_changelog:
-                    next_version = self.get_changelog_value(next_changelog , "version")
-
-                fabric_loader = self.get_changelog_value(changelog, "Fabric version")
-                improvements = self.get_changelog_value(changelog, "Changes/Improvements")
-                overview_legacy = self.get_changelog_value(changelog, "Update overview")
-                bug_fixes = self.get_changelog_value(changelog, "Bug Fixes")
-                config_changes = self.get_changelog_value(changelog, "Config Changes")
-
-                next_version_path = os.path.join(tempgit_path, str(next_version))
-                version_path = os.path.join(tempgit_path, str(version))
-
-                print(f"[DEBUG] {next_version_path} + {version_path}")
-
-                if str(version) != str(self.modpack_version) and next_version:
-                    differences = self.compare_toml_files(next_version_path, version_path)
-                elif str(version) == str(self.modpack_version) and next_version:
-                    differences = self.compare_toml_files(next_version_path, packwiz_mods_path)
-                else:
-                    differences = None
-
-                if differences:
-                    added_mods = differences['added']
-                    removed_mods = differences['removed']
-                
-                # if not "v" in version:
-                #     mdFile.new_paragraph(f"## {self.modpack_name} | v{version}")
-                # else:
-                #     mdFile.new_paragraph(f"## {self.modpack_name} | {version}")
-                
-                if version == self.modpack_version: # and not github.check_tag_exists(repo_owner, repo_name, version)
-                        mdFile.new_paragraph(f"## v{version} `Work in progress`")
-                else: 
-                    if not "v" in version:
-                        mdFile.new_paragraph(f"## v{version}")
-                    else:
-                        mdFile.new_paragraph(f"## {version}")
-
-                mdFile.new_paragraph(f"*Fabric Loader {fabric_loader}* | *[Mod Updates](https://github.com/{repo_owner}/{repo_name}/blob/{repo_branch}/Changelogs/changelog_mods_{version}.md)*")
-                if improvements:
-                    mdFile.new_paragraph("### Changes/Improvements ⭐")
-                    mdFile.new_paragraph(markdown.markdown_list_maker(improvements))
-                if overview_legacy:
-                    mdFile.new_paragraph("### Update overview")
-                    mdFile.new_paragraph(markdown.markdown_list_maker(overview_legacy))
-                if bug_fixes:
-                    mdFile.new_paragraph("### Bug Fixes 🪲")
-                    mdFile.new_paragraph(markdown.markdown_list_maker(bug_fixes))
-                if added_mods:
-                    mdFile.new_paragraph("### Added Mods ✅")
-                    mdFile.new_paragraph(markdown.markdown_list_maker(added_mods))
-                if removed_mods:
-                    mdFile.new_paragraph("### Removed Mods ❌")
-                    mdFile.new_paragraph(markdown.markdown_list_maker(removed_mods))
-                if config_changes:
-                    mdFile.new_paragraph("### Config Changes 📝")
-                    mdFile.new_paragraph(markdown.codify_bracketed_text(config_changes))
-                #mdFile.new_paragraph("---")
-        mdFile.create_md_file()
+                writer.heading(f"{version}", 2)
+
+        writer.paragraph(f"*Fabric Loader {fabric_loader}* | *[Mod Updates](https://github.com/{repo_owner}/{repo_name}/blob/{repo_branch}/Changelogs/changelog_mods_{version}.md)*")
+        if improvements:
+            writer.heading("Changes/Improvements ⭐", 3)
+            writer.list(improvements)
+        if overview_legacy:
+            writer.heading("Update overview", 3)
+            writer.list(overview_legacy)
+        if bug_fixes:
+            writer.heading("Bug Fixes 🪲", 3)
+            writer.list(bug_fixes)
+        if added_mods:
+            writer.heading("Added Mods ✅", 3)
+            writer.list(added_mods)
+        if removed_mods:
+            writer.heading("Removed Mods ❌", 3)
+            writer.list(removed_mods)
+        if config_changes:
+            writer.heading("Config Changes 📝", 3)
+            writer.paragraph(markdown.codify_bracketed_text(config_changes))
+        #writer.paragraph("---")
+
+    def _changelog_section_inputs(self, version, next_version, tempgit_path, packwiz_mods_path, *render_options):
+        """This method returns a hash over everything the section of a version is rendered from."""
+        digest = hashlib.sha1()
+        try:
+            with open(os.path.join(self.changelog_dir, self.corpus.get_file_name(version)), "rb") as f:
+                digest.update(f.read())
+        except (OSError, TypeError):
+            digest.update(b"missing")
+        if next_version:
+            for path in self.get_comparison_paths(version, next_version, tempgit_path, packwiz_mods_path):
+                digest.update(folder_fingerprint(path).encode("utf8"))
+        digest.update(repr((str(version) == str(self.modpack_version), next_version) + render_options).encode("utf8"))
+        return digest.hexdigest()
+
+    def _read_changelog_manifest(self, manifest_path, file_path, versions):
+        """This method returns the manifest if it still describes the changelog file, otherwise None."""
+        try:
+            with open(manifest_path, "r", encoding="utf8") as f:
+                manifest = json.load(f)
+            digest = hashlib.sha1()
+            with open(file_path, "r", encoding="utf-8") as f:
+                for chunk in iter(lambda: f.read(markdown.MarkdownWriter.BUFFER_SIZE), ""):
+                    digest.update(chunk.encode("utf8"))
+        except (OSError, ValueError):
+            return None
+
+        if (manifest.get("version") != self.CHANGELOG_MANIFEST_VERSION
+                or manifest.get("file") != file_path
+                or manifest.get("text") != digest.hexdigest()
+                or [section["version"] for section in manifest.get("sections", [])] != versions):
+            return None
+        return manifest
+
+    def _write_changelog_manifest(self, manifest_path, file_path, text_hash, sections):
+        """This method records the inputs and positions of every section of the changelog file."""
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf8") as f:
+            json.dump({
+                "version": self.CHANGELOG_MANIFEST_VERSION,
+                "file": file_path,
+                "text": text_hash,
+                "sections": sections  # Offsets and lengths are in characters of the text as read back with universal newlines.
+            }, f, indent=1)
+        os.replace(temp_path, manifest_path)
 
 
 # # Set the changelog directory
@@ -0,0 +1,148 @@
+import os
+import json
+
+from ServerPackArchive import ServerPackArchive, file_crc
+from ServerModResolver import SERVER_SIDES
+
+DELTA_MANIFEST_NAME = "delta.json"
+DELETE_LIST_NAME = "delta-delete.txt"
+
+# Run from the server folder after extracting the delta archive into it, they delete the files listed in the
+# delete list, then the delta files and themselves.
+APPLY_SH = """#!/bin/sh
+# Updates a {modpack_name} server from {from_version} to {to_version}.
+# Extract this archive into the server folder, replacing existing files, then run this script there.
+cd "$(dirname "$0")" || exit 1
+while IFS= read -r file; do
+    [ -n "$file" ] && rm -f -- "$file"
+done < {delete_list}
+rm -f -- {delete_list} {manifest} apply-delta.bat apply-delta.sh
+echo "Updated to {to_version}."
+"""
+
+APPLY_BAT = """@echo off
+rem Updates a {modpack_name} server from {from_version} to {to_version}.
+rem Extract this archive into the server folder, replacing existing files, then run this script there.
+cd /d "%~dp0"
+setlocal enabledelayedexpansion
+for /f "usebackq delims=" %%f in ("{delete_list}") do (
+    set "file=%%f"
+    if exist "!file:/=\\!" del /q "!file:/=\\!"
+)
+endlocal
+del /q {delete_list} {manifest} apply-delta.sh
+echo Updated to {to_version}.
+(goto) 2>nul & del "%~f0"
+"""
+
+
+def server_jar_changes(raw_differences):
+    """
+    Turn the diff of two mods folders into the jar changes of the server.
+
+    Parameters:
+    - raw_differences: dict, the output of ChangelogFactory.compare_mod_files.
+
+    Returns:
+    - (deleted, added) where deleted is a set of jar filenames to remove and added a set of metafile names whose
+      jars have to be shipped.
+    """
+    deleted = set()
+    added = set()
+    for metafile, old_record, new_record in raw_differences['removed'] + raw_differences['modified'] + raw_differences['added']:
+        if old_record is not None and old_record[1] in SERVER_SIDES and old_record[2]:
+            deleted.add(old_record[2])
+        if new_record is not None and new_record[1] in SERVER_SIDES:
+            added.add(metafile)
+    return deleted, added
+
+
+class DeltaPack:
+    def __init__(self, modpack_name, from_version, to_version):
+        """
+        Builds an update archive that takes a server from one version to the next.
+
+        The archive holds only the files that changed, a delete list of the files that were removed, a JSON manifest
+        describing both and apply scripts for Linux and Windows. It is written with ServerPackArchive, so it is
+        compressed in parallel and reproducible.
+
+        Parameters:
+        - modpack_name: str, the name shown by the apply scripts.
+        - from_version: str, the version the server is on.
+        - to_version: str, the version the archive updates to.
+        """
+        self.modpack_name = modpack_name
+        self.from_version = from_version
+        self.to_version = to_version
+        self.archive = ServerPackArchive()
+        self.files = set()
+        self.deleted = set()
+        self.changes = {}
+
+    def add_file(self, source_path, arcname):
+        """This method ships a changed or new file."""
+        self.archive.add_file(source_path, arcname)
+        self.files.add(arcname)
+
+    def discard(self, arcname):
+        """This method stops shipping a file."""
+        self.archive.discard(arcname)
+        self.files.discard(arcname)
+
+    def delete(self, arcname):
+        """This method lists a file that has to be removed from the server."""
+        self.deleted.add(arcname)
+
+    def add_folder_changes(self, source_path, previous_entries, arcname_prefix="", skip_prefixes=()):
+        """
+        Ship the files of a folder that differ from the previous version, and delete the ones that are gone.
+
+        Parameters:
+        - source_path: str, the folder as it is in the new version.
+        - previous_entries: dict of arcname -> (CRC-32, size) of the previous version, see read_entries. Without
+          it every file is shipped and nothing is deleted.
+        - arcname_prefix: str, the path of the folder inside the server folder.
+        - skip_prefixes: tuple of str, arcname prefixes whose changes are handled elsewhere, e.g. 'mods/'.
+        """
+        prefix = arcname_prefix.strip("/") + "/" if arcname_prefix.strip("/") else ""
+        current = set()
+        for root, _, files in os.walk(source_path):
+            relative_root = os.path.relpath(root, source_path).replace(os.sep, "/")
+            for file in files:
+                arcname = prefix + (file if relative_root == "." else f"{relative_root}/{file}")
+                if arcname.startswith(skip_prefixes):
+                    continue
+                current.add(arcname)
+                file_path = os.path.join(root, file)
+                previous = previous_entries.get(arcname) if previous_entries is not None else None
+                if previous is None or previous != (file_crc(file_path), os.path.getsize(file_path)):
+                    self.add_file(file_path, arcname)
+
+        if previous_entries is not None:
+            for arcname in previous_entries:
+                if arcname.startswith(prefix) and not arcname.startswith(skip_prefixes) and arcname not in current:
+                    self.delete(arcname)
+
+    def write(self, dest_path):
+        """
+        Write the delta archive to dest_path.
+
+        Returns:
+        - (number of shipped files, number of deleted files)
+        """
+        # A file that is deleted and shipped again (e.g. a jar moved to another metafile) must survive the apply script.
+        deleted = sorted(self.deleted - self.files)
+        manifest = {
+            "from": self.from_version,
+            "to": self.to_version,
+            "files": sorted(self.files),
+            "delete": deleted,
+            "changes": self.changes,
+        }
+        values = {"modpack_name": self.modpack_name, "from_version": self.from_version, "to_version": self.to_version, "delete_list": DELETE_LIST_NAME, "manifest": DELTA_MANIFEST_NAME}
+        self.archive.add_bytes(json.dumps(manifest, indent=1).encode("utf8"), DELTA_MANIFEST_NAME)
+        self.archive.add_bytes("".join(f"{arcname}\n" for arcname in deleted).encode("utf8"), DELETE_LIST_NAME)
+        self.archive.add_bytes(APPLY_SH.format(**values).encode("utf8"), "apply-delta.sh")
+        self.archive.add_bytes(APPLY_BAT.format(**values).replace("\n", "\r\n").encode("utf8"), "apply-delta.bat")
+        self.archive.write(dest_path)
+        return len(self.files), len(deleted)
@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+
+
+def folder_fingerprint(path):
+    """This function returns a hash over the names, sizes and modification times of the pw.toml files in a folder."""
+    digest = hashlib.sha1()
+    try:
+        with os.scandir(path) as entries:
+            files = sorted((entry.name, entry.stat()) for entry in entries if entry.name.endswith('.toml'))
+        for name, stat in files:
+            digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf8"))
+    except FileNotFoundError:
+        digest.update(b"missing")
+    return digest.hexdigest()
+
+
+class DiffCache:
+    # Bump this whenever the format of the comparison results changes, older cache files are then ignored.
+    CACHE_VERSION = 1
+
+    def __init__(self, cache_path):
+        """
+        Persistent cache of mods folder comparisons, keyed by a fingerprint of both folders.
+
+        Parameters:
+        - cache_path: str, the JSON file the cache is stored in.
+        """
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._diffs = {}
+        self._used = set()
+        self._fingerprints = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """This method reads the cache file, starting with an empty cache if it is missing or outdated."""
+        try:
+            with open(self.cache_path, "r", encoding="utf8") as f:
+                cache_data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as ex:
+            print(f"Ignoring unreadable diff cache {self.cache_path}: {ex}")
+            return
+        if cache_data.get("version") == self.CACHE_VERSION:
+            self._diffs = cache_data.get("diffs", {})
+
+    def save(self, prune=True):
+        """
+        This method writes the cache file.
+
+        With prune, entries that were not used during this run are dropped. Only prune from a caller that compares
+        every version pair, a partial render (e.g. the incremental CHANGELOG.md) would throw away the rest.
+        """
+        if not self._dirty and (not prune or len(self._used) == len(self._diffs)):
+            return
+        diffs = {key: value for key, value in self._diffs.items() if key in self._used} if prune else self._diffs
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf8") as f:
+            json.dump({"version": self.CACHE_VERSION, "diffs": diffs}, f)
+        os.replace(temp_path, self.cache_path)
+        self._diffs = diffs
+        self._dirty = False
+
+    def fingerprint(self, path):
+        """This method returns the fingerprint of a folder, remembering it for the rest of the run."""
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in self._fingerprints:
+            self._fingerprints[key] = folder_fingerprint(path)
+        return self._fingerprints[key]
+
+    def forget_fingerprint(self, path=None):
+        """This method drops remembered fingerprints so that changed folders are hashed again."""
+        if path is None:
+            self._fingerprints.clear()
+        else:
+            self._fingerprints.pop(os.path.normcase(os.path.abspath(path)), None)
+
+    def _key(self, dir1, dir2):
+        return f"{self.fingerprint(dir1)}:{self.fingerprint(dir2)}"
+
+    def contains(self, dir1, dir2):
+        """This method checks whether the comparison of two folders is cached."""
+        return self._key(dir1, dir2) in self._diffs
+
+    def get_or_compute(self, dir1, dir2, compute):
+        """This method returns the cached comparison of two folders, calling compute() and storing its result on a miss."""
+        key = self._key(dir1, dir2)
+        self._used.add(key)
+        if key in self._diffs:
+            self.hits += 1
+            differences = self._diffs[key]
+            return {
+                'added': list(differences['added']),
+                'removed': list(differences['removed']),
+                'modified': [tuple(modified) for modified in differences['modified']]
+            }
+
+        self.misses += 1
+        differences = compute()
+        self._diffs[key] = differences
+        self._dirty = True
+        return differences
+
+    def stats(self):
+        """This method returns a one-line summary of the cache usage."""
+        return f"[Cache] Mod diffs: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,136 @@
+import os
+import time
+import queue
+import threading
+
+try:
+    # pip install watchdog, optional. Without it folders are polled.
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+def folder_key(path):
+    """This function returns the normalised form of a folder path that changes are reported under."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def scan_folder(path, suffixes):
+    """This function returns file name -> (size, mtime_ns) for the files in a folder with one of the given suffixes."""
+    files = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffixes) and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return files
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if path:
+                path = os.fsdecode(path)
+                self.watcher.report(os.path.dirname(path), os.path.basename(path))
+
+
+class FolderWatcher:
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, folders, suffixes=(".toml", ".yml", ".yaml"), debounce=1.0, use_watchdog=True):
+        """
+        Watches folders (not their subfolders) for created, changed and deleted files and reports them in batches.
+
+        Changes are debounced: a batch is only reported once no file changed for `debounce` seconds, so a bulk
+        update of hundreds of files turns into a single batch. Uses watchdog (inotify, ReadDirectoryChangesW, ...)
+        when it is installed, otherwise the folders are polled every POLL_INTERVAL seconds.
+
+        Parameters:
+        - folders: list of str, the folders to watch.
+        - suffixes: tuple of str, only files ending in one of these are reported.
+        - debounce: float, the quiet period in seconds that ends a batch.
+        - use_watchdog: bool, whether watchdog may be used if it is installed.
+        """
+        self.folders = {folder_key(folder): folder for folder in folders}
+        self.suffixes = tuple(suffixes)
+        self.debounce = debounce
+        self.events = queue.Queue()
+        self.stopped = threading.Event()
+        self.backend = "watchdog" if use_watchdog and Observer is not None else "polling"
+        self._observer = None
+        self._poller = None
+
+    def report(self, folder, filename):
+        """This method queues a change of a file, ignoring files outside the watched folders or with other suffixes."""
+        key = folder_key(folder)
+        if key in self.folders and filename.endswith(self.suffixes):
+            self.events.put((self.folders[key], filename))
+
+    def start(self):
+        if self.backend == "watchdog":
+            self._observer = Observer()
+            for folder in self.folders.values():
+                self._observer.schedule(_EventHandler(self), folder, recursive=False)
+            self._observer.start()
+        else:
+            self._poller = threading.Thread(target=self._poll, daemon=True)
+            self._poller.start()
+        return self
+
+    def _poll(self):
+        """This method compares the folders against their previous listing every POLL_INTERVAL seconds."""
+        states = {folder: scan_folder(folder, self.suffixes) for folder in self.folders.values()}
+        while not self.stopped.wait(self.POLL_INTERVAL):
+            for folder, state in states.items():
+                new_state = scan_folder(folder, self.suffixes)
+                for filename in state.keys() | new_state.keys():
+                    if state.get(filename) != new_state.get(filename):
+                        self.events.put((folder, filename))
+                states[folder] = new_state
+
+    def wait(self, timeout=None):
+        """
+        Wait for the next batch of changes.
+
+        Returns:
+        - dict of folder (as it was passed in) -> set of changed file names, empty if the timeout passed or the
+          watcher was closed first.
+        """
+        changes = {}
+        try:
+            folder, filename = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return changes
+        changes.setdefault(folder, set()).add(filename)
+        # Keep collecting until the folders have been quiet for the debounce period.
+        while not self.stopped.is_set():
+            try:
+                folder, filename = self.events.get(timeout=self.debounce)
+            except queue.Empty:
+                break
+            changes.setdefault(folder, set()).add(filename)
+        return changes
+
+    def close(self):
+        self.stopped.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._poller is not None:
+            self._poller.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
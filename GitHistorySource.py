@@ -0,0 +1,166 @@
+import os
+import shutil
+import subprocess
+
+from BlobStore import BlobStore
+
+# Tree entry modes of regular and executable files. Subfolders (40000), symlinks (120000) and submodules (160000)
+# have no file content to materialise.
+FILE_MODES = ("100644", "100755")
+
+
+class MissingObject(Exception):
+    """Raised when an object a tree refers to is not in the local repository, e.g. in a shallow or partial clone."""
+
+
+class GitHistorySource:
+    def __init__(self, repo_path, git_exe="git"):
+        """
+        Reads historical folders straight from a local repository's object database.
+
+        All objects are read through a single long-lived `git cat-file --batch` process, so no network is needed
+        as long as the release tags have been fetched.
+
+        Parameters:
+        - repo_path: str, the path of the local checkout.
+        - git_exe: str, the git executable (default is 'git' from PATH).
+        """
+        self.repo_path = repo_path
+        self.git_exe = git_exe
+        self._process = None
+
+    def _get_process(self):
+        if self._process is None:
+            self._process = subprocess.Popen(
+                [self.git_exe, "cat-file", "--batch"],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        return self._process
+
+    def close(self):
+        """This method stops the cat-file process."""
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_object(self, name):
+        """
+        Read an object from the repository.
+
+        Parameters:
+        - name: str, anything git can resolve to an object, e.g. a SHA or '2.2.0:Packwiz/mods'.
+
+        Returns:
+        - (object SHA, object type, content bytes), or None if the object does not exist.
+        """
+        process = self._get_process()
+        process.stdin.write(name.encode("utf8") + b"\n")
+        process.stdin.flush()
+
+        header = process.stdout.readline().decode("utf8").rstrip("\n")
+        if not header:
+            raise RuntimeError(f"git cat-file exited while reading {name}")
+        if header.endswith(" missing") or header.endswith(" ambiguous"):
+            return None
+
+        object_sha, object_type, size = header.split(" ")
+        content = process.stdout.read(int(size))
+        process.stdout.read(1) # Trailing newline after every object.
+        return object_sha, object_type, content
+
+    @staticmethod
+    def _parse_tree(content):
+        """This function parses a raw git tree object into a list of (mode, name, SHA) tuples."""
+        entries = []
+        position = 0
+        while position < len(content):
+            space = content.index(b" ", position)
+            null = content.index(b"\0", space)
+            mode = content[position:space].decode("ascii")
+            name = content[space + 1:null].decode("utf8")
+            entries.append((mode, name, content[null + 1:null + 21].hex()))
+            position = null + 21
+        return entries
+
+    def list_folder(self, ref, folder_path):
+        """
+        List the files of a folder at a ref.
+
+        Returns:
+        - (tree SHA, {file name: blob SHA}), or None if the ref or folder does not exist.
+        """
+        tree = self.read_object(f"{ref}:{folder_path.strip('/')}")
+        if tree is None or tree[1] != "tree":
+            return None
+        files = {name: object_sha for mode, name, object_sha in self._parse_tree(tree[2]) if mode in FILE_MODES}
+        return tree[0], files
+
+    def read_blob(self, blob_sha):
+        """
+        Read the content of a file from the repository.
+
+        Raises:
+        - MissingObject: if the blob is not in the repository or is not a blob.
+        """
+        blob = self.read_object(blob_sha)
+        if blob is None or blob[1] != "blob":
+            raise MissingObject(f"Blob {blob_sha} is missing from the local repository")
+        return blob[2]
+
+    def sync_folders(self, refs, folder_path, dest_root):
+        """
+        Materialise a folder at several refs into the BlobStore under dest_root, one subfolder per ref.
+
+        Parameters:
+        - refs: list of str, the release tags (or other refs) to read.
+        - folder_path: str, the folder path inside the repository.
+        - dest_root: str, the local folder that receives one subfolder per ref.
+
+        Returns:
+        - List of refs that could not be read.
+        """
+        store = BlobStore(dest_root)
+        local_trees, _ = store.index()
+        failed = []
+
+        for ref in refs:
+            listing = self.list_folder(ref, folder_path)
+            if listing is None:
+                print(f"{folder_path} does not exist in {ref} in the local repository.")
+                failed.append(ref)
+                continue
+            tree_sha, files = listing
+
+            read_count = 0
+            if tree_sha not in local_trees:
+                try:
+                    for blob_sha in files.values():
+                        if blob_sha not in store:
+                            store.add_bytes(self.read_blob(blob_sha), blob_sha)
+                            read_count += 1
+                except MissingObject as ex:
+                    print(f"Failed to sync {ref} from the local repository: {ex}")
+                    failed.append(ref)
+                    continue
+
+            staging_folder = os.path.join(dest_root, ref + ".partial")
+            dest_folder = os.path.join(dest_root, ref)
+            if os.path.isdir(staging_folder):
+                shutil.rmtree(staging_folder)
+            store.materialize(staging_folder, files, tree_sha)
+            if os.path.exists(dest_folder):
+                shutil.rmtree(dest_folder)
+            os.replace(staging_folder, dest_folder)
+            local_trees.setdefault(tree_sha, dest_folder)
+            print(f"Synced {ref} from the local repository: {len(files)} files, {read_count} new.")
+
+        return failed
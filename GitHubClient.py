@@ -0,0 +1,254 @@
+import time
+import random
+import asyncio
+import threading
+import contextlib
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from HttpCache import CachedResponse
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the GitHub rate limit is exhausted for longer than the client is willing to wait."""
+
+
+class GitHubClient:
+    GITHUB_HOSTS = ("api.github.com", "github.com", "raw.githubusercontent.com")  # The token is only sent to these exact hosts.
+    API_HOST = "api.github.com"  # Only the REST API counts against the rate limit, raw files and mod CDNs do not.
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    RATE_LIMIT_RESERVE = 50     # Below this many remaining requests, requests are spread over the rest of the window.
+    POOL_SIZE = 16              # Keep-alive connections kept by the requests session.
+    LIMIT_PER_HOST = 8          # Pooled connections per host for aiohttp sessions.
+
+    def __init__(self, token=None, http_cache=None, max_retries=5, backoff=1.0, max_backoff=60.0, max_rate_limit_wait=300.0):
+        """
+        Shared HTTP client for every GitHub call the tool makes.
+
+        Connections are pooled and kept alive, requests are authenticated when a token is given (5,000 instead of
+        60 requests per hour), API requests are throttled based on the X-RateLimit headers and every request is
+        retried with jittered exponential backoff on 429, rate limited 403 and 5xx responses as well as on
+        connection errors.
+
+        Parameters:
+        - token: str, optional GitHub token.
+        - http_cache: HttpCache, optional cache that JSON responses are revalidated against or served from.
+        - max_retries: int, the number of retries before a request is given up.
+        - backoff: float, the base delay in seconds for exponential backoff.
+        - max_backoff: float, the maximum backoff delay in seconds.
+        - max_rate_limit_wait: float, the longest the client waits for the rate limit to reset before raising RateLimitExceeded.
+        """
+        self.token = token
+        self.http_cache = http_cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_rate_limit_wait = max_rate_limit_wait
+
+        self._rate_remaining = None
+        self._rate_reset = None
+        self._rate_lock = threading.Lock()
+        self.retries = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": "Modpack-CLI-Tool"})
+
+    def close(self):
+        """This method closes the pooled connections of the synchronous session."""
+        self.session.close()
+
+    def _headers(self, url, headers=None):
+        """This method returns the request headers, adding the token for GitHub hosts only."""
+        request_headers = dict(headers or {})
+        host = urlparse(url).hostname or ""
+        if self.token and host in self.GITHUB_HOSTS:
+            request_headers.setdefault("Authorization", f"Bearer {self.token}")
+        return request_headers
+
+    #----------------------------------------
+    # Rate limiting and retries
+    #----------------------------------------
+
+    def _is_api(self, url):
+        """This method checks whether a URL is on the GitHub API host, the only one the rate limit applies to."""
+        return (urlparse(url).hostname or "") == self.API_HOST
+
+    def _update_rate_limit(self, url, headers):
+        """This method remembers the rate limit state reported by a GitHub API response."""
+        if not self._is_api(url):
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self._rate_lock:
+            self._rate_remaining = int(remaining)
+            self._rate_reset = int(reset)
+
+    def _throttle_delay(self, url):
+        """This method returns how long to wait before the next request to stay within the rate limit, 0 outside the API."""
+        if not self._is_api(url):
+            return 0
+        with self._rate_lock:
+            if self._rate_remaining is None:
+                return 0
+            window = self._rate_reset - time.time()
+            if window <= 0:
+                self._rate_remaining = None
+                return 0
+            remaining = self._rate_remaining
+            self._rate_remaining -= 1 # Count requests that are in flight before their response arrives.
+
+        if remaining <= 0:
+            delay = window + 1
+        elif remaining < self.RATE_LIMIT_RESERVE:
+            delay = window / remaining
+        else:
+            return 0
+
+        if delay > self.max_rate_limit_wait:
+            raise RateLimitExceeded(f"GitHub rate limit exhausted, it resets in {int(window)} seconds. Set github_token in settings.yml for a higher limit.")
+        return delay
+
+    def _backoff_delay(self, attempt):
+        """This method returns a fully jittered exponential backoff delay."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _retry_delay(self, status, headers, attempt):
+        """This method returns how long to wait before retrying a response, or None if it should not be retried."""
+        if attempt >= self.max_retries:
+            return None
+
+        retry_after = headers.get("Retry-After")
+        rate_limited = status == 429 or (status == 403 and (retry_after is not None or headers.get("X-RateLimit-Remaining") == "0"))
+        if rate_limited:
+            if retry_after is not None:
+                delay = float(retry_after)
+            elif headers.get("X-RateLimit-Reset"):
+                delay = max(0.0, int(headers["X-RateLimit-Reset"]) - time.time()) + 1
+            else:
+                delay = self._backoff_delay(attempt)
+            return delay if delay <= self.max_rate_limit_wait else None
+
+        if status in self.RETRY_STATUS:
+            return self._backoff_delay(attempt)
+        return None
+
+    #----------------------------------------
+    # Synchronous requests
+    #----------------------------------------
+
+    def _send(self, url, headers):
+        """This method sends a GET request with throttling and retries and returns the final requests response."""
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._throttle_delay(url))
+            try:
+                response = self.session.get(url, headers=self._headers(url, headers))
+            except requests.exceptions.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                time.sleep(self._backoff_delay(attempt))
+                continue
+
+            self._update_rate_limit(url, response.headers)
+            delay = self._retry_delay(response.status_code, response.headers, attempt)
+            if delay is None:
+                return response
+            self.retries += 1
+            time.sleep(delay)
+
+    def get(self, url, headers=None, use_cache=True):
+        """
+        Send a GET request through the pooled session.
+
+        Returns:
+        - CachedResponse
+        """
+        cache = self.http_cache if use_cache else None
+        cached = cache.before_request(url) if cache is not None else None
+        if cache is not None and cache.offline:
+            return cached
+
+        request_headers = dict(headers or {})
+        if cache is not None:
+            request_headers.update(cache.conditional_headers(cached))
+        response = self._send(url, request_headers)
+
+        if cache is not None:
+            return cache.after_response(url, cached, response.status_code, response.headers, response.content)
+        return CachedResponse(url, response.status_code, dict(response.headers), response.content)
+
+    #----------------------------------------
+    # Asynchronous requests
+    #----------------------------------------
+
+    def create_async_session(self, limit_per_host=None):
+        """This method creates an aiohttp session with pooled keep-alive connections capped per host."""
+        connector = aiohttp.TCPConnector(limit_per_host=limit_per_host or self.LIMIT_PER_HOST)
+        return aiohttp.ClientSession(connector=connector, headers={"User-Agent": "Modpack-CLI-Tool"})
+
+    @contextlib.asynccontextmanager
+    async def stream_async(self, session, url, headers=None):
+        """
+        Asynchronously send a GET request with throttling and retries and yield the final aiohttp response unread.
+
+        Parameters:
+        - session: aiohttp.ClientSession, a session created by create_async_session.
+        - url: str, the URL to fetch.
+        - headers: dict, optional request headers.
+        """
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self._throttle_delay(url))
+            try:
+                response = await session.get(url, headers=self._headers(url, headers))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            self._update_rate_limit(url, response.headers)
+            delay = self._retry_delay(response.status, response.headers, attempt)
+            if delay is None:
+                try:
+                    yield response
+                finally:
+                    response.release()
+                return
+            response.release()
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def get_async(self, session, url, headers=None, use_cache=True):
+        """
+        Asynchronously send a GET request and read the whole body.
+
+        Returns:
+        - CachedResponse
+        """
+        cache = self.http_cache if use_cache else None
+        cached = cache.before_request(url) if cache is not None else None
+        if cache is not None and cache.offline:
+            return cached
+
+        request_headers = dict(headers or {})
+        if cache is not None:
+            request_headers.update(cache.conditional_headers(cached))
+        async with self.stream_async(session, url, request_headers) as response:
+            body = await response.read()
+            if cache is not None:
+                return cache.after_response(url, cached, response.status, response.headers, body)
+            return CachedResponse(url, response.status, dict(response.headers), body)
+
+    def stats(self):
+        """This method returns a one-line summary of the client's rate limit state."""
+        remaining = "unknown" if self._rate_remaining is None else self._rate_remaining
+        return f"[GitHub] {'Authenticated' if self.token else 'Unauthenticated'}, {self.retries} retries, rate limit remaining: {remaining}"
@@ -1,11 +1,22 @@
 import os
-import aiohttp
+import shutil
 import asyncio
+from urllib.parse import quote
+
+from BlobStore import BlobStore, read_manifest
+from GitHubClient import GitHubClient
 
 class AsyncGitHubDownloader:
     GITHUB_API_URL = "https://api.github.com/repos"
+    RAW_URL = "https://raw.githubusercontent.com"
+    MAX_CONCURRENCY = 16    # Requests in flight at once across all refs.
+    LIMIT_PER_HOST = 8      # Pooled connections per host.
+    SMALL_FILE_SIZE = 256 * 1024    # Files up to this size are buffered whole instead of streamed.
+    MIN_CHUNK_SIZE = 64 * 1024      # Streamed reads start at this size and double up to MAX_CHUNK_SIZE.
+    MAX_CHUNK_SIZE = 1024 * 1024
+    STREAM_BACKLOG = 32     # Streamed files that may wait for the consumer before downloads pause.
 
-    def __init__(self, repo_owner, repo_name, branch='main'):
+    def __init__(self, repo_owner, repo_name, branch='main', http_cache=None, client=None):
         """
         Initialize the AsyncGitHubDownloader with repository information.
 
@@ -13,10 +24,14 @@ class AsyncGitHubDownloader:
         - repo_owner: str, the owner of the repository.
         - repo_name: str, the name of the repository.
         - branch: str, the branch of the repository (default is 'main').
+        - http_cache: HttpCache, optional cache that API responses are revalidated against or served from.
+        - client: GitHubClient, the shared client to send requests through (default is an unauthenticated client using http_cache).
         """
         self.repo_owner = repo_owner
         self.repo_name = repo_name
         self.branch = branch
+        self.client = client or GitHubClient(http_cache=http_cache)
+        self.http_cache = self.client.http_cache
 
     async def _fetch(self, session, url):
         """
@@ -29,49 +44,432 @@ class AsyncGitHubDownloader:
         Returns:
         - JSON response data.
         """
-        async with session.get(url) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise Exception(f"Failed to fetch data: {response.status}")
+        response = await self.client.get_async(session, url)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"Failed to fetch data: {response.status_code}")
 
-    async def _download_file(self, session, url, dest_folder, filename):
+    async def _download_file(self, session, url, dest_folder, filename, semaphore=None):
         """
         Asynchronously download a single file and save it to the destination folder.
+
+        Small files are read whole and written in one go, larger ones are streamed in chunks that grow while the
+        reads keep filling them. All disk writes run in a worker thread so they never stall the other downloads, and
+        the file is written to a temporary name and renamed into place, so an interrupted run never leaves a truncated file.
         
         Parameters:
         - session: aiohttp.ClientSession, the session to use for downloading.
         - url: str, the file download URL.
         - dest_folder: str, the local folder where the file will be saved.
         - filename: str, the name of the file.
+        - semaphore: asyncio.Semaphore, optional limit on the number of concurrent requests.
         """
+        if semaphore is not None:
+            async with semaphore:
+                return await self._download_file(session, url, dest_folder, filename)
+
+        if self.http_cache is not None and self.http_cache.offline:
+            print(f"Failed to download {filename}: offline mode")
+            return False
+
+        loop = asyncio.get_running_loop()
         file_path = os.path.join(dest_folder, filename)
-        async with session.get(url) as response:
-            if response.status == 200:
-                with open(file_path, 'wb') as f:
-                    while True:
-                        chunk = await response.content.read(1024)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                print(f"Downloaded {filename}")
-            else:
+        temp_path = f"{file_path}.{os.getpid()}.part"
+        async with self.client.stream_async(session, url) as response:
+            if response.status != 200:
                 print(f"Failed to download {filename}: {response.status}")
+                return False
+
+            try:
+                if response.content_length is not None and response.content_length <= self.SMALL_FILE_SIZE:
+                    data = await response.read()
+                    await loop.run_in_executor(None, self._write_file, temp_path, data)
+                else:
+                    f = await loop.run_in_executor(None, open, temp_path, 'wb')
+                    try:
+                        chunk_size = self.MIN_CHUNK_SIZE
+                        while True:
+                            chunk = await response.content.read(chunk_size)
+                            if not chunk:
+                                break
+                            await loop.run_in_executor(None, f.write, chunk)
+                            if len(chunk) == chunk_size and chunk_size < self.MAX_CHUNK_SIZE:
+                                chunk_size *= 2
+                    finally:
+                        await loop.run_in_executor(None, f.close)
+                await loop.run_in_executor(None, os.replace, temp_path, file_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
 
-    async def _get_folder_contents(self, session, folder_path):
+        print(f"Downloaded {filename}")
+        return True
+
+    @staticmethod
+    def _write_file(file_path, data):
+        with open(file_path, 'wb') as f:
+            f.write(data)
+
+    async def _get_folder_contents(self, session, folder_path, ref=None):
         """
         Asynchronously fetch the contents of a folder in the repository.
         
         Parameters:
         - session: aiohttp.ClientSession, the session to use for making requests.
         - folder_path: str, the folder path inside the repository.
+        - ref: str, the branch, tag or commit to list (default is the downloader's branch).
 
         Returns:
         - List of files and folders in the given path.
         """
-        api_url = f"{self.GITHUB_API_URL}/{self.repo_owner}/{self.repo_name}/contents/{folder_path}?ref={self.branch}"
+        api_url = f"{self.GITHUB_API_URL}/{self.repo_owner}/{self.repo_name}/contents/{folder_path}?ref={ref or self.branch}"
+        return await self._fetch(session, api_url)
+
+    async def _download_ref(self, session, semaphore, ref, folder_path, dest_folder):
+        """
+        Asynchronously download all files from a folder at a single ref, sharing the session and concurrency limit.
+
+        Parameters:
+        - session: aiohttp.ClientSession, the shared session.
+        - semaphore: asyncio.Semaphore, the shared limit on concurrent requests.
+        - ref: str, the branch, tag or commit to download.
+        - folder_path: str, the folder path inside the repository.
+        - dest_folder: str, the local folder where files will be saved.
+        """
+        async with semaphore:
+            folder_contents = await self._get_folder_contents(session, folder_path, ref)
+
+        if not os.path.exists(dest_folder):
+            os.makedirs(dest_folder)
+
+        tasks = []
+        for item in folder_contents:
+            if item['type'] == 'file':
+                tasks.append(self._download_file(session, item['download_url'], dest_folder, item['name'], semaphore))
+        await asyncio.gather(*tasks)
+        print(f"Downloaded {len(tasks)} files from {ref}.")
+
+    def _create_session(self, limit_per_host=None):
+        """This method creates a client session whose connections are pooled and capped per host."""
+        return self.client.create_async_session(limit_per_host or self.LIMIT_PER_HOST)
+
+    async def download_folders(self, refs, folder_path, dest_root, max_concurrency=None, limit_per_host=None):
+        """
+        Asynchronously download a folder at several refs over one pooled session.
+
+        Parameters:
+        - refs: list of str, the branches, tags or commits to download.
+        - folder_path: str, the folder path inside the repository.
+        - dest_root: str, the local folder that receives one subfolder per ref.
+        - max_concurrency: int, the maximum number of requests in flight across all refs.
+        - limit_per_host: int, the maximum number of pooled connections per host.
+
+        Returns:
+        - List of refs that failed to download.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.MAX_CONCURRENCY)
+        async with self._create_session(limit_per_host) as session:
+            return await self._download_refs(session, semaphore, refs, folder_path, dest_root)
+
+    async def _download_refs(self, session, semaphore, refs, folder_path, dest_root):
+        """This method downloads a folder at several refs through the contents API and returns the refs that failed."""
+        results = await asyncio.gather(
+            *(self._download_ref(session, semaphore, ref, folder_path, os.path.join(dest_root, ref)) for ref in refs),
+            return_exceptions=True
+        )
+
+        failed = []
+        for ref, result in zip(refs, results):
+            if isinstance(result, Exception):
+                print(f"Failed to download {folder_path} from {ref}: {result}")
+                failed.append(ref)
+        return failed
+
+    async def _get_tree(self, session, tree_ish):
+        """
+        Asynchronously fetch a single git tree, without its subtrees.
+
+        Parameters:
+        - session: aiohttp.ClientSession, the session to use for making requests.
+        - tree_ish: str, a tree SHA, or the branch, tag or commit whose root tree should be fetched.
+
+        Returns:
+        - The trees API response, a dict with 'sha', 'tree' and 'truncated' keys.
+        """
+        api_url = f"{self.GITHUB_API_URL}/{self.repo_owner}/{self.repo_name}/git/trees/{quote(tree_ish, safe='')}"
         return await self._fetch(session, api_url)
 
+    async def _get_folder(self, session, semaphore, ref, folder_path, tree_requests, local_trees=None):
+        """
+        Asynchronously look up a folder at a ref by walking down from the root tree, one folder level per request.
+
+        Only the trees on the way to the folder are fetched, never the whole repository. Trees are requested by SHA
+        once per tree_requests, so refs sharing a parent folder share its request, and a folder whose tree is in
+        local_trees is listed from the manifest of its version folder instead.
+
+        Parameters:
+        - session: aiohttp.ClientSession, the session to use for making requests.
+        - semaphore: asyncio.Semaphore, the shared limit on concurrent requests.
+        - ref: str, the branch, tag or commit to look the folder up at.
+        - folder_path: str, the folder path inside the repository, without leading or trailing '/'.
+        - tree_requests: dict, tree SHA -> task fetching it, shared by the lookups of one sync.
+        - local_trees: dict, optional tree SHA -> version folder of the folders that are already on disk.
+
+        Returns:
+        - (folder tree SHA, {file name: blob SHA}), or None if the folder does not exist at the ref. The file
+          listing is None if the folder's tree was truncated.
+        """
+        async def local_get_tree(tree_ish):
+            async with semaphore:
+                return await self._get_tree(session, tree_ish)
+
+        def get_tree(tree_sha):
+            if tree_sha not in tree_requests:
+                tree_requests[tree_sha] = asyncio.ensure_future(local_get_tree(tree_sha))
+            return tree_requests[tree_sha]
+
+        names = folder_path.split("/")
+        tree = await local_get_tree(ref)
+        for level, name in enumerate(names):
+            folder_sha = next((item["sha"] for item in tree["tree"] if item["path"] == name and item["type"] == "tree"), None)
+            if folder_sha is None:
+                return None
+            if level == len(names) - 1 and local_trees and folder_sha in local_trees:
+                manifest = read_manifest(local_trees[folder_sha])
+                if manifest is not None:
+                    return folder_sha, manifest["files"]
+            tree = await get_tree(folder_sha)
+
+        if tree.get("truncated"):
+            return folder_sha, None
+        return folder_sha, {item["path"]: item["sha"] for item in tree["tree"] if item["type"] == "blob"}
+
+    async def sync_folders(self, refs, folder_path, dest_root, max_concurrency=None, limit_per_host=None):
+        """
+        Asynchronously download a folder at several refs, fetching only the files that are not on disk yet.
+
+        The folder is looked up with one trees API request per folder level, see _get_folder. A ref whose folder tree
+        SHA matches a folder that was downloaded before is materialised locally, otherwise only the blobs that are not
+        in the BlobStore under dest_root are downloaded. Version folders are hardlinked from the store and renamed into
+        place once they are complete.
+
+        Parameters:
+        - refs: list of str, the branches, tags or commits to download.
+        - folder_path: str, the folder path inside the repository.
+        - dest_root: str, the local folder that receives one subfolder per ref.
+        - max_concurrency: int, the maximum number of requests in flight.
+        - limit_per_host: int, the maximum number of pooled connections per host.
+
+        Returns:
+        - List of refs that failed to download.
+        """
+        folder_path = folder_path.strip("/")
+        prefix = folder_path + "/"
+        store = BlobStore(dest_root)
+        local_trees, _ = store.index()
+        semaphore = asyncio.Semaphore(max_concurrency or self.MAX_CONCURRENCY)
+        failed = []
+
+        # Staging folders left behind by an interrupted run.
+        for ref in refs:
+            if os.path.isdir(os.path.join(dest_root, ref + ".partial")):
+                shutil.rmtree(os.path.join(dest_root, ref + ".partial"))
+
+        async with self._create_session(limit_per_host) as session:
+            tree_requests = {}
+            folders = await asyncio.gather(*(self._get_folder(session, semaphore, ref, folder_path, tree_requests, local_trees) for ref in refs), return_exceptions=True)
+
+            plans = {}      # ref -> (folder tree SHA, {file name: blob SHA})
+            fallback = []   # refs whose folder tree was truncated, they are downloaded through the contents API
+            for ref, folder in zip(refs, folders):
+                if isinstance(folder, Exception):
+                    print(f"Failed to fetch the tree of {ref}: {folder}")
+                    failed.append(ref)
+                elif folder is None:
+                    print(f"{folder_path} does not exist in {ref}")
+                    failed.append(ref)
+                elif folder[1] is None:
+                    fallback.append(ref)
+                else:
+                    plans[ref] = folder
+
+            # Download every blob that is not in the store yet exactly once.
+            incoming_folder = os.path.join(store.store_path, "incoming")
+            downloads = {}
+            download_counts = {}
+            for ref, (folder_sha, files) in plans.items():
+                download_counts[ref] = 0
+                if folder_sha in local_trees:
+                    continue
+                for filename, blob_sha in files.items():
+                    if blob_sha not in downloads and blob_sha not in store:
+                        url = f"{self.RAW_URL}/{self.repo_owner}/{self.repo_name}/{quote(ref, safe='')}/{quote(prefix + filename)}"
+                        downloads[blob_sha] = url
+                        download_counts[ref] += 1
+
+            if downloads:
+                os.makedirs(incoming_folder, exist_ok=True)
+            results = await asyncio.gather(*(self._download_file(session, url, incoming_folder, blob_sha, semaphore) for blob_sha, url in downloads.items()))
+            for blob_sha, downloaded in zip(downloads, results):
+                if downloaded:
+                    try:
+                        store.add_file(os.path.join(incoming_folder, blob_sha), blob_sha, move=True)
+                    except ValueError as ex:
+                        print(ex)
+
+            if fallback:
+                failed.extend(await self._download_refs(session, semaphore, fallback, folder_path, dest_root))
+
+        if os.path.isdir(incoming_folder):
+            shutil.rmtree(incoming_folder)
+
+        # Materialise every complete ref from the store and move it into place.
+        for ref, (folder_sha, files) in plans.items():
+            missing = [filename for filename, blob_sha in files.items() if blob_sha not in store]
+            if missing:
+                print(f"Failed to download {len(missing)} files from {ref}.")
+                failed.append(ref)
+                continue
+
+            staging_folder = os.path.join(dest_root, ref + ".partial")
+            store.materialize(staging_folder, files, folder_sha)
+            dest_folder = os.path.join(dest_root, ref)
+            if os.path.exists(dest_folder):
+                shutil.rmtree(dest_folder)
+            os.replace(staging_folder, dest_folder)
+            print(f"Synced {ref}: {len(files)} files, {download_counts[ref]} downloaded.")
+
+        return failed
+
+    async def stream_folders(self, refs, folder_path, sink_root=None, failed=None, max_concurrency=None, limit_per_host=None):
+        """
+        Asynchronously stream the files of a folder at several refs as they arrive, without a disk round-trip.
+
+        The folder is looked up with one trees API request per folder level, see _get_folder. A blob shared by several refs is fetched once and
+        yielded for each of them, blobs already in the BlobStore under sink_root are read from disk instead.
+        After the last file of a ref, (ref, None, None) is yielded to mark the ref as complete. At most
+        STREAM_BACKLOG files wait for the consumer, downloads pause until it catches up.
+
+        Parameters:
+        - refs: list of str, the branches, tags or commits to stream.
+        - folder_path: str, the folder path inside the repository.
+        - sink_root: str, optional local folder. Streamed blobs are added to its BlobStore and every complete ref is
+          materialised as a version folder, like sync_folders does.
+        - failed: list, optional list that refs which could not be streamed are appended to.
+        - max_concurrency: int, the maximum number of requests in flight.
+        - limit_per_host: int, the maximum number of pooled connections per host.
+
+        Yields:
+        - (ref, file name, file bytes) tuples.
+        """
+        folder_path = folder_path.strip("/")
+        prefix = folder_path + "/"
+        failed = failed if failed is not None else []
+        store = BlobStore(sink_root) if sink_root is not None else None
+        semaphore = asyncio.Semaphore(max_concurrency or self.MAX_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+
+        async with self._create_session(limit_per_host) as session:
+            tree_requests = {}
+            folders = await asyncio.gather(*(self._get_folder(session, semaphore, ref, folder_path, tree_requests) for ref in refs), return_exceptions=True)
+
+            plans = {}  # ref -> (folder tree SHA, {file name: blob SHA})
+            for ref, folder in zip(refs, folders):
+                if isinstance(folder, Exception):
+                    print(f"Failed to fetch the tree of {ref}: {folder}")
+                    failed.append(ref)
+                elif folder is None:
+                    print(f"{folder_path} does not exist in {ref}")
+                    failed.append(ref)
+                elif folder[1] is None:
+                    print(f"The tree of {ref} is truncated, it can not be streamed.")
+                    failed.append(ref)
+                else:
+                    plans[ref] = folder
+
+            users = {}      # blob SHA -> [(ref, file name)] that contain it
+            remaining = {}  # ref -> number of files that have not arrived yet
+            for ref, (_, files) in plans.items():
+                remaining[ref] = len(files)
+                for filename, blob_sha in files.items():
+                    users.setdefault(blob_sha, []).append((ref, filename))
+
+            # A full queue blocks the workers, so downloads pause while the consumer is busy.
+            queue = asyncio.Queue(maxsize=self.STREAM_BACKLOG)
+            pending = iter(users)
+
+            async def local_fetch_blob(blob_sha):
+                ref, filename = users[blob_sha][0]
+                try:
+                    if store is not None and blob_sha in store:
+                        data = await loop.run_in_executor(None, self._read_blob, store, blob_sha)
+                    else:
+                        url = f"{self.RAW_URL}/{self.repo_owner}/{self.repo_name}/{quote(ref, safe='')}/{quote(prefix + filename)}"
+                        async with semaphore:
+                            response = await self.client.get_async(session, url, use_cache=False)
+                        if response.status_code != 200:
+                            raise Exception(f"Failed to download {filename}: {response.status_code}")
+                        data = response.body
+                        if store is not None:
+                            await loop.run_in_executor(None, store.add_bytes, data, blob_sha)
+                except Exception as ex:
+                    data = ex
+                await queue.put((blob_sha, data))
+
+            async def local_worker():
+                for blob_sha in pending:
+                    await local_fetch_blob(blob_sha)
+
+            worker_count = min(max_concurrency or self.MAX_CONCURRENCY, len(users))
+            tasks = [asyncio.ensure_future(local_worker()) for _ in range(worker_count)]
+            try:
+                for _ in range(len(users)):
+                    blob_sha, data = await queue.get()
+                    for ref, filename in users[blob_sha]:
+                        if ref not in remaining:
+                            continue # The ref already failed.
+                        if isinstance(data, Exception):
+                            print(f"Failed to stream {ref}: {data}")
+                            failed.append(ref)
+                            del remaining[ref]
+                            continue
+
+                        yield ref, filename, data
+                        remaining[ref] -= 1
+                        if remaining[ref] == 0:
+                            del remaining[ref]
+                            if store is not None:
+                                await loop.run_in_executor(None, self._materialize_ref, store, ref, *plans[ref])
+                            yield ref, None, None
+
+                # Refs without any files are complete right away.
+                for ref in [ref for ref, count in remaining.items() if count == 0]:
+                    if store is not None:
+                        await loop.run_in_executor(None, self._materialize_ref, store, ref, *plans[ref])
+                    yield ref, None, None
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    @staticmethod
+    def _read_blob(store, blob_sha):
+        with open(store.blob_path(blob_sha), "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _materialize_ref(store, ref, folder_sha, files):
+        """This method materialises a complete ref from the store and moves it into place."""
+        staging_folder = os.path.join(store.root, ref + ".partial")
+        dest_folder = os.path.join(store.root, ref)
+        if os.path.isdir(staging_folder):
+            shutil.rmtree(staging_folder)
+        store.materialize(staging_folder, files, folder_sha)
+        if os.path.exists(dest_folder):
+            shutil.rmtree(dest_folder)
+        os.replace(staging_folder, dest_folder)
+
     async def download_folder(self, folder_path, dest_folder):
         """
         Asynchronously download all files from a specific folder in the repository.
@@ -85,28 +483,19 @@ class AsyncGitHubDownloader:
             os.makedirs(dest_folder)
 
         # Start an aiohttp session
-        async with aiohttp.ClientSession() as session:
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        async with self._create_session() as session:
             try:
-                folder_contents = await self._get_folder_contents(session, folder_path)
+                await self._download_ref(session, semaphore, self.branch, folder_path, dest_folder)
             except Exception as e:
                 print(str(e))
                 return
-
-            # Gather download tasks for all files in the folder
-            tasks = []
-            for item in folder_contents:
-                if item['type'] == 'file':
-                    download_url = item['download_url']
-                    filename = item['name']
-                    tasks.append(self._download_file(session, download_url, dest_folder, filename))
-
-            # Run all download tasks concurrently
-            await asyncio.gather(*tasks)
         print("All files downloaded successfully.")
 
 # Example usage:
 # async def main():
 #     downloader = AsyncGitHubDownloader('octocat', 'Hello-World')
 #     await downloader.download_folder('path/to/folder', './local_folder')
+#     await downloader.download_folders(['v1.0.0', 'v1.1.0'], 'path/to/folder', './local_versions')
 
 # asyncio.run(main())
\ No newline at end of file
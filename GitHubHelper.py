@@ -1,6 +1,8 @@
-import requests
+from GitHubClient import GitHubClient
 
-def check_tag_exists(repo_owner, repo_name, tag_name, github_token=None):
+GITHUB_API_URL = "https://api.github.com/repos"
+
+def check_tag_exists(repo_owner, repo_name, tag_name, github_token=None, http_cache=None, client=None):
     """
     Checks if a specific tag exists on a GitHub repository.
 
@@ -8,15 +10,15 @@ def check_tag_exists(repo_owner, repo_name, tag_name, github_token=None):
     :param repo_name: The name of the repository (e.g., 'Hello-World')
     :param tag_name: The name of the tag to check (e.g., 'v1.0.0')
     :param github_token: Optional GitHub token for authentication
+    :param http_cache: Optional HttpCache used to revalidate or serve the response
+    :param client: Optional shared GitHubClient, takes precedence over github_token and http_cache
     :return: True if the tag exists, False otherwise
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/git/refs/tags/{tag_name}"
-    
-    headers = {}
-    if github_token:
-        headers['Authorization'] = f'token {github_token}'
+    url = f"{GITHUB_API_URL}/{repo_owner}/{repo_name}/git/refs/tags/{tag_name}"
     
-    response = requests.get(url, headers=headers)
+    if client is None:
+        client = GitHubClient(token=github_token, http_cache=http_cache)
+    response = client.get(url)
 
     if response.status_code == 200:
         return True  # Tag exists
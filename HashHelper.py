@@ -0,0 +1,92 @@
+import os
+import sys
+import mmap
+import array
+import hashlib
+
+# The hash formats packwiz writes to pw.toml files.
+HASH_FORMATS = ("sha1", "sha256", "sha512", "md5", "murmur2")
+# The SHA git and the GitHub trees API report for a file, recorded in the manifests of the comparison snapshots.
+GIT_BLOB = "git-blob"
+
+# CurseForge leaves out these bytes before computing a murmur2 fingerprint.
+_MURMUR2_WHITESPACE = bytes((9, 10, 13, 32))
+_MURMUR2_M = 0x5BD1E995
+
+
+def murmur2_fingerprint(data):
+    """This function returns the CurseForge fingerprint of a file's bytes: 32-bit MurmurHash2 with seed 1 over the data without whitespace."""
+    data = data.translate(None, _MURMUR2_WHITESPACE)
+    length = len(data)
+    h = (1 ^ length) & 0xFFFFFFFF
+
+    blocks = length // 4
+    words = array.array("I", data[:blocks * 4])
+    if sys.byteorder == "big":
+        words.byteswap() # MurmurHash2 reads little-endian words.
+    for k in words:
+        k = (k * _MURMUR2_M) & 0xFFFFFFFF
+        k ^= k >> 24
+        k = (k * _MURMUR2_M) & 0xFFFFFFFF
+        h = ((h * _MURMUR2_M) & 0xFFFFFFFF) ^ k
+
+    tail = data[blocks * 4:]
+    if len(tail) >= 3:
+        h ^= tail[2] << 16
+    if len(tail) >= 2:
+        h ^= tail[1] << 8
+    if tail:
+        h ^= tail[0]
+        h = (h * _MURMUR2_M) & 0xFFFFFFFF
+
+    h ^= h >> 13
+    h = (h * _MURMUR2_M) & 0xFFFFFFFF
+    h ^= h >> 15
+    return h
+
+
+def hash_bytes(data, hash_format):
+    """
+    Hash data the way packwiz does for the given hash format.
+
+    Returns:
+    - str, a lowercase hex digest, or the decimal fingerprint for murmur2.
+    """
+    hash_format = hash_format.lower()
+    if hash_format == "murmur2":
+        return str(murmur2_fingerprint(data))
+    if hash_format not in HASH_FORMATS:
+        raise ValueError(f"Unsupported hash format {hash_format}")
+    return hashlib.new(hash_format, data).hexdigest()
+
+
+def hash_file(file_path, hash_format):
+    """
+    Hash a file the way packwiz does for the given hash format, or as a git blob for GIT_BLOB.
+
+    The file is mapped into memory and hashed in one update, hashlib releases the GIL while it runs, so several
+    files can be hashed at once on a thread pool.
+    """
+    hash_format = hash_format.lower()
+    with open(file_path, "rb") as f:
+        if hash_format == "murmur2":
+            return hash_bytes(f.read(), hash_format)
+        if hash_format == GIT_BLOB:
+            digest = hashlib.sha1(b"blob %d\0" % os.fstat(f.fileno()).st_size)
+        elif hash_format in HASH_FORMATS:
+            digest = hashlib.new(hash_format)
+        else:
+            raise ValueError(f"Unsupported hash format {hash_format}")
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                digest.update(data)
+        except (ValueError, OSError):
+            # Empty files can not be mapped, and some file systems do not support it.
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def hashes_match(expected, actual):
+    """This function compares two hashes, ignoring case and surrounding whitespace."""
+    return str(expected).strip().lower() == str(actual).strip().lower()
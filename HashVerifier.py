@@ -0,0 +1,103 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import HashHelper as hashes
+
+HASH_CACHE_VERSION = 1
+
+
+class VerificationError(Exception):
+    """Raised when files that go into an export do not match the hashes recorded for them."""
+
+
+class HashVerifier:
+    MAX_WORKERS = os.cpu_count() or 4
+
+    def __init__(self, cache_file=None, max_workers=None):
+        """
+        Checks files against recorded hashes on a thread pool, remembering every hash it computed.
+
+        Hashes are cached by (path, size, mtime), so a repeated run only hashes the files that changed since the
+        last one.
+
+        Parameters:
+        - cache_file: str, the JSON file the computed hashes are kept in. Without it nothing is remembered.
+        - max_workers: int, the number of threads hashing files.
+        """
+        self.cache_file = cache_file
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.entries = self._load() if cache_file else {}
+        self.lock = threading.Lock()
+        self.hashed = 0
+        self.cached = 0
+
+    def _load(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get("files", {}) if data.get("version") == HASH_CACHE_VERSION else {}
+
+    def save(self):
+        """This method writes the cache to disk, dropping entries of files that no longer exist."""
+        if not self.cache_file:
+            return
+        entries = {path: entry for path, entry in self.entries.items() if os.path.exists(path)}
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+        with open(self.cache_file + ".tmp", "w", encoding="utf8") as f:
+            json.dump({"version": HASH_CACHE_VERSION, "files": entries}, f)
+        os.replace(self.cache_file + ".tmp", self.cache_file)
+
+    def hash_file(self, file_path, hash_format):
+        """This method returns the hash of a file, from the cache if the file did not change since it was last hashed."""
+        file_path = os.path.abspath(file_path)
+        hash_format = hash_format.lower()
+        stat = os.stat(file_path)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns and hash_format in entry[2]:
+                self.cached += 1
+                return entry[2][hash_format]
+
+        file_hash = hashes.hash_file(file_path, hash_format)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if not entry or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                entry = self.entries[file_path] = [stat.st_size, stat.st_mtime_ns, {}]
+            entry[2][hash_format] = file_hash
+            self.hashed += 1
+        return file_hash
+
+    def _check(self, check):
+        """This method verifies a single file and returns an error message, or None if it matches."""
+        if not os.path.isfile(check["path"]):
+            return f"{check['source']}: {check['path']} is missing"
+        try:
+            actual_hash = self.hash_file(check["path"], check["hash-format"])
+        except (OSError, ValueError) as ex:
+            return f"{check['source']}: {ex}"
+        if not hashes.hashes_match(check["hash"], actual_hash):
+            return f"{check['source']}: {check['path']} has {check['hash-format']} {actual_hash}, expected {check['hash']}"
+        return None
+
+    def verify(self, checks):
+        """
+        Verify files against their recorded hashes.
+
+        Parameters:
+        - checks: list of dicts with path, hash-format, hash and source (where the hash was recorded, for messages).
+
+        Returns:
+        - list of (check, error message) tuples for the files that are missing or do not match.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            errors = list(executor.map(self._check, checks))
+        self.save()
+        return [(check, error) for check, error in zip(checks, errors) if error is not None]
+
+    def stats(self):
+        """This method returns a one-line summary of the cache usage."""
+        return f"[Verify] {self.hashed} files hashed, {self.cached} hashes from the cache"
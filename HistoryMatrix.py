@@ -0,0 +1,102 @@
+from array import array
+
+ABSENT = -1
+
+
+class HistoryMatrix:
+    def __init__(self):
+        """
+        Version x mod matrix of a modpack's release history.
+
+        Every metafile name is interned to a mod ID (a row) and every distinct (name, side, filename) record to a
+        record ID. Each version is a column stored as an array of record IDs indexed by mod ID, with ABSENT for mods
+        that are not part of that version. Any two columns can be diffed directly, without walking the versions in between.
+        """
+        self.mod_keys = []       # mod ID -> metafile name
+        self._mod_ids = {}       # metafile name -> mod ID
+        self.records = []        # record ID -> (name, side, filename)
+        self._record_ids = {}    # (name, side, filename) -> record ID
+        self.versions = []       # version labels in the order they were added
+        self._columns = {}       # version label -> array of record IDs
+        self._sorted_mod_ids = None
+
+    def __contains__(self, version):
+        return version in self._columns
+
+    def _intern_mod(self, mod_key):
+        mod_id = self._mod_ids.get(mod_key)
+        if mod_id is None:
+            mod_id = self._mod_ids[mod_key] = len(self.mod_keys)
+            self.mod_keys.append(mod_key)
+            self._sorted_mod_ids = None
+        return mod_id
+
+    def _intern_record(self, record):
+        record_id = self._record_ids.get(record)
+        if record_id is None:
+            record_id = self._record_ids[record] = len(self.records)
+            self.records.append(record)
+        return record_id
+
+    def add_version(self, version, snapshot):
+        """
+        Add a version column to the matrix.
+
+        Parameters:
+        - version: hashable, the label of the version (e.g. the snapshot folder).
+        - snapshot: mapping of metafile name -> metadata dict with name, side and filename keys.
+        """
+        cells = []
+        for mod_key, data in snapshot.items():
+            record = (data.get('name', mod_key), data.get('side', mod_key), data.get('filename', None))
+            cells.append((self._intern_mod(mod_key), self._intern_record(record)))
+
+        column = array('l', [ABSENT]) * len(self.mod_keys)
+        for mod_id, record_id in cells:
+            column[mod_id] = record_id
+
+        if version not in self._columns:
+            self.versions.append(version)
+        self._columns[version] = column
+
+    def _sorted_ids(self):
+        """This method returns the mod IDs ordered by metafile name, so diffs list mods in directory order."""
+        if self._sorted_mod_ids is None:
+            self._sorted_mod_ids = sorted(range(len(self.mod_keys)), key=self.mod_keys.__getitem__)
+        return self._sorted_mod_ids
+
+    def diff_pairs(self, pairs):
+        """
+        Diff several (old version, new version) pairs in a single sweep over the mod rows.
+
+        Returns:
+        - dict of (old, new) -> {'added': [...], 'removed': [...], 'modified': [...]}, where every item is a
+          (metafile name, old record, new record) tuple and records are None for absent mods.
+        """
+        pairs = list(pairs)
+        columns = [(self._columns[old], self._columns[new]) for old, new in pairs]
+        results = [{'added': [], 'removed': [], 'modified': []} for _ in pairs]
+        records = self.records
+
+        for mod_id in self._sorted_ids():
+            for (old_column, new_column), result in zip(columns, results):
+                old_id = old_column[mod_id] if mod_id < len(old_column) else ABSENT
+                new_id = new_column[mod_id] if mod_id < len(new_column) else ABSENT
+                if old_id == new_id:
+                    continue
+                if old_id == ABSENT:
+                    result['added'].append((self.mod_keys[mod_id], None, records[new_id]))
+                elif new_id == ABSENT:
+                    result['removed'].append((self.mod_keys[mod_id], records[old_id], None))
+                elif records[old_id][2] != records[new_id][2]:
+                    result['modified'].append((self.mod_keys[mod_id], records[old_id], records[new_id]))
+
+        return dict(zip(pairs, results))
+
+    def diff(self, old, new):
+        """This method diffs two versions directly, e.g. a range such as 2.0.0 -> 2.5.0."""
+        return self.diff_pairs([(old, new)])[(old, new)]
+
+    def diff_consecutive(self):
+        """This method diffs every version against the one added before it, in a single sweep."""
+        return self.diff_pairs(zip(self.versions, self.versions[1:]))
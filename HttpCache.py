@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode when a response is not in the cache."""
+    def __init__(self, url):
+        super().__init__(f"Offline mode: no cached response for {url}")
+        self.url = url
+
+
+class CachedResponse:
+    def __init__(self, url, status_code, headers, body, from_cache=False):
+        """
+        Minimal response object returned by HttpCache, independent of the HTTP library that fetched it.
+
+        Parameters:
+        - url: str, the requested URL.
+        - status_code: int, the HTTP status code.
+        - headers: dict, the response headers that were kept.
+        - body: bytes, the response body.
+        - from_cache: bool, whether the body was served from the cache.
+        """
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.body.decode("utf8")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpCache:
+    # Responses with these status codes are stored, so offline runs can answer both "found" and "not found".
+    CACHEABLE_STATUS = (200, 404)
+    KEPT_HEADERS = ("ETag", "Last-Modified", "Content-Type")
+
+    def __init__(self, cache_dir, offline=False):
+        """
+        On-disk cache of HTTP responses that revalidates with ETag/Last-Modified conditional requests.
+
+        GitHub does not count 304 Not Modified responses against the API rate limit, so revalidating is free.
+        GitHubClient sends the requests, wrapping them in before_request, conditional_headers and after_response.
+
+        Parameters:
+        - cache_dir: str, the folder the responses are stored in.
+        - offline: bool, whether responses are served strictly from the cache. A miss raises OfflineCacheMiss.
+        """
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json"), os.path.join(self.cache_dir, key + ".body")
+
+    def lookup(self, url):
+        """This method returns the cached response for a URL, or None if there is none."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(url, meta["status"], meta["headers"], body, from_cache=True)
+
+    def store(self, url, status_code, headers, body):
+        """This method stores a response if its status code is cacheable."""
+        if status_code not in self.CACHEABLE_STATUS:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        kept_headers = {name: headers[name] for name in self.KEPT_HEADERS if headers.get(name)}
+        for path, data in ((body_path, body), (meta_path, json.dumps({"url": url, "status": status_code, "headers": kept_headers, "stored": time.time()}).encode("utf8"))):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+    def conditional_headers(self, cached):
+        """This method returns the validator headers for revalidating a cached response."""
+        headers = {}
+        if cached is not None:
+            if cached.headers.get("ETag"):
+                headers["If-None-Match"] = cached.headers["ETag"]
+            if cached.headers.get("Last-Modified"):
+                headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+        return headers
+
+    def before_request(self, url):
+        """This method looks up a URL and enforces offline mode. It returns the cached response, if any."""
+        cached = self.lookup(url)
+        if self.offline:
+            if cached is None:
+                raise OfflineCacheMiss(url)
+            self.hits += 1
+        return cached
+
+    def after_response(self, url, cached, status_code, headers, body):
+        """This method turns a network response into a CachedResponse, serving the cached body on 304."""
+        if status_code == 304 and cached is not None:
+            self.revalidated += 1
+            return cached
+        self.misses += 1
+        self.store(url, status_code, headers, body)
+        return CachedResponse(url, status_code, dict(headers), body)
+
+    def stats(self):
+        """This method returns a one-line summary of the cache usage."""
+        return f"[Cache] GitHub API: {self.hits} served offline, {self.revalidated} revalidated (304), {self.misses} fetched"
@@ -1,4 +1,7 @@
+import io
+import os
 import re
+import contextlib
 
 def remove_bracketed_text(input_str):
         """This method takes an input string and removes any text surrounded by parentheses (), square brackets [], and curly braces {}."""
@@ -32,41 +35,112 @@ def markdown_list_maker(lines):
 
 
 def write_differences_to_markdown(differences, input_modpack_name, version1, version2, output_file=None, ):
-    markdown_lines = []
-    
+    """This function renders the mod differences between two versions as Markdown, writes them to output_file if one is given and returns them as a string."""
+    buffer = io.StringIO()
+    _write_differences(MarkdownWriter(buffer), differences, input_modpack_name, version1, version2)
+    markdown_output = buffer.getvalue()
+
+    if output_file:
+        with MarkdownWriter.open(output_file) as writer:
+            writer.write(markdown_output)
+
+    return markdown_output
+
+
+def _write_differences(writer, differences, input_modpack_name, version1, version2):
     # Title for the Markdown report
-    markdown_lines.append(f"# {input_modpack_name} {version1} -> {version2}\n")
+    writer.write(f"# {input_modpack_name} {version1} -> {version2}\n")
     
     # Added section
     if differences['added']:
-        markdown_lines.append("## Added\n")
+        writer.write("\n## Added\n")
         for name in differences['added']:
-            markdown_lines.append(f"- {(name)}")
+            writer.write(f"\n- {(name)}")
     else:
-        markdown_lines.append("## Added\n- None")
+        writer.write("\n## Added\n- None")
     
     # Removed section
     if differences['removed']:
-        markdown_lines.append("## Removed\n")
+        writer.write("\n## Removed\n")
         for name in differences['removed']:
-            markdown_lines.append(f"- {(name)}")
+            writer.write(f"\n- {(name)}")
     else:
-        markdown_lines.append("## Removed\n- None")
+        writer.write("\n## Removed\n- None")
     
     # Modified section
     if differences['modified']:
-        markdown_lines.append("## Modified\n")
+        writer.write("\n## Modified\n")
         for name, old_version, new_version in differences['modified']:
-            markdown_lines.append(f"- **{(name)}**: Changed from `{old_version}` to `{new_version}`")
+            writer.write(f"\n- **{(name)}**: Changed from {code_span(old_version)} to {code_span(new_version)}")
     else:
-        markdown_lines.append("## Modified\n- None")
-    
-    # Join all lines into a single string
-    markdown_output = "\n".join(markdown_lines)
-    
-    # Write to a file if an output path is provided
-    if output_file:
-        with open(output_file, 'w', encoding="utf8") as f:
-            f.write(markdown_output)
-    
-    return markdown_output
\ No newline at end of file
+        writer.write("\n## Modified\n- None")
+
+
+def code_span(text):
+        """This method formats a value as inline code."""
+        return f"`{text}`"
+
+
+class MarkdownWriter:
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, file, digest=None):
+        """
+        Writes Markdown incrementally to a text file handle instead of accumulating the document in memory.
+
+        The layout matches MdUtils: a setext title block followed by paragraphs that are each preceded by a blank line,
+        so files written through it are byte-identical to the ones MdUtils created.
+
+        Parameters:
+        - file: a text file handle (or io.StringIO) the Markdown is written to.
+        - digest: optional hashlib object that is updated with the UTF-8 bytes of everything written.
+        """
+        self.file = file
+        self.digest = digest
+        self.length = 0     # Characters written so far.
+
+    @classmethod
+    @contextlib.contextmanager
+    def open(cls, file_path, digest=None):
+        """
+        Open a buffered writer for a Markdown file.
+
+        The file is written under a temporary name and renamed into place once the block finishes, so a failure
+        half way through never leaves a truncated file (and, like MdUtils, leaves an existing file untouched).
+        """
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        try:
+            # Text mode and UTF-8, the same as MdUtils and the original report writer.
+            with open(temp_path, "w", encoding="utf-8", buffering=cls.BUFFER_SIZE) as f:
+                yield cls(f, digest)
+            os.replace(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def write(self, text):
+        """This method writes text as is."""
+        self.file.write(text)
+        self.length += len(text)
+        if self.digest is not None:
+            self.digest.update(text.encode("utf8"))
+
+    def title(self, text=""):
+        """This method writes the setext title block MdUtils starts every file with (three newlines for an empty title)."""
+        self.write("\n" + text + "\n" + "=" * len(text) + "\n")
+
+    def paragraph(self, text=""):
+        """This method writes a paragraph, the equivalent of MdUtils.new_paragraph."""
+        self.write("\n\n")
+        self.write(text)
+
+    def heading(self, text, level=1):
+        """This method writes an ATX heading as its own paragraph."""
+        self.paragraph("#" * level + " " + text)
+
+    def list(self, lines):
+        """This method writes a bullet list as its own paragraph, the equivalent of paragraph(markdown_list_maker(lines)) without joining the lines first."""
+        lines = iter(lines) # Fail before writing anything if there is no list, like markdown_list_maker would.
+        self.write("\n\n")
+        for i, line in enumerate(lines):
+            self.write(("\n- " if i else "- ") + line)
@@ -0,0 +1,247 @@
+import os
+import sys
+import sqlite3
+import argparse
+
+from PackwizMetadata import HEADER_KEYS
+from DiffCache import folder_fingerprint
+
+# The keys the index needs from every pw.toml file, pass them to SnapshotLoader so one parse serves both.
+INDEX_KEYS = HEADER_KEYS + ("download.hash",)
+# The default cache_path of the export: .modpack-cache in the pack repository that Modpack-CLI-Tool is cloned into.
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".modpack-cache", "mod_index.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,      -- 0 for the oldest version
+    fingerprint TEXT NOT NULL       -- folder_fingerprint of the snapshot folder when it was indexed
+);
+CREATE TABLE IF NOT EXISTS mods (
+    version TEXT NOT NULL REFERENCES versions (version) ON DELETE CASCADE,
+    metafile TEXT NOT NULL,
+    name TEXT COLLATE NOCASE,
+    side TEXT,
+    filename TEXT,
+    hash TEXT,
+    PRIMARY KEY (version, metafile)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mods_by_name ON mods (name);
+CREATE INDEX IF NOT EXISTS mods_by_metafile ON mods (metafile);
+"""
+
+
+class ModIndex:
+    def __init__(self, database_path=DEFAULT_DATABASE):
+        """
+        SQLite index of which mods (name, side, filename and download hash) every version of the pack shipped.
+
+        Versions are indexed from the same snapshots the changelogs compare, once per version: a version is only
+        indexed again when the files in its snapshot folder change. Lookups by mod and range diffs between any two
+        versions are then single indexed queries instead of parsing folders.
+
+        Parameters:
+        - database_path: str, the SQLite file, created if it does not exist.
+        """
+        self.database_path = database_path
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        # Stages run on worker threads, but never two at once on the same index.
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        self.indexed = 0
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #----------------------------------------
+    # Indexing
+    #----------------------------------------
+
+    def sync(self, version_paths, snapshot_loader, versions=None):
+        """
+        Index every version that is new or whose snapshot folder changed, and hand the others to the snapshot loader.
+
+        Versions that are already indexed are registered with snapshot_loader straight from the index, so the
+        changelogs read them without parsing their folders again. Versions that are no longer in the changelog are
+        removed from the index.
+
+        Parameters:
+        - version_paths: list of (version, snapshot folder) tuples, newest version first like the changelogs.
+        - snapshot_loader: SnapshotLoader, loaded with INDEX_KEYS so the snapshots carry the download hash.
+        - versions: list of str, every version of the changelog, newest first (default is the versions of
+          version_paths). Versions in it without a snapshot folder keep their entries.
+
+        Returns:
+        - list of the versions that were (re)indexed.
+        """
+        indexed = dict(self.connection.execute("SELECT version, fingerprint FROM versions"))
+        fingerprints = {version: folder_fingerprint(path) for version, path in version_paths}
+        stale = [(version, path) for version, path in version_paths if indexed.get(version) != fingerprints[version]]
+
+        snapshots = snapshot_loader.load_many([path for _, path in stale])
+        versions = versions if versions is not None else [version for version, _ in version_paths]
+        positions = {version: position for position, version in enumerate(reversed(versions))}
+        removed = [version for version in indexed if version not in positions]
+        with self.connection:
+            # The mods of removed versions go with them, through ON DELETE CASCADE.
+            self.connection.executemany("DELETE FROM versions WHERE version = ?", ((version,) for version in removed))
+            for (version, _), snapshot in zip(stale, snapshots):
+                self.connection.execute("DELETE FROM mods WHERE version = ?", (version,))
+                self.connection.execute("INSERT OR REPLACE INTO versions (version, position, fingerprint) VALUES (?, ?, ?)", (version, positions[version], fingerprints[version]))
+                self.connection.executemany(
+                    "INSERT INTO mods (version, metafile, name, side, filename, hash) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((version, metafile, data.get("name"), data.get("side"), data.get("filename"), data.get("download.hash")) for metafile, data in snapshot.items()),
+                )
+            self.connection.executemany("UPDATE versions SET position = ? WHERE version = ?", ((position, version) for version, position in positions.items()))
+        if removed:
+            print(f"[Mod Index] Removed {', '.join(removed)}, no longer in the changelog.")
+
+        stale_versions = {version for version, _ in stale}
+        for version, path in version_paths:
+            if version not in stale_versions:
+                snapshot_loader.add_snapshot(path, self.snapshot(version))
+        self.indexed += len(stale)
+        return [version for version, _ in stale]
+
+    def snapshot(self, version):
+        """This method returns {metafile: metadata} for a version, with the keys a freshly parsed snapshot would have."""
+        mods = {}
+        for metafile, name, side, filename, file_hash in self.connection.execute("SELECT metafile, name, side, filename, hash FROM mods WHERE version = ?", (version,)):
+            data = {"name": name, "side": side, "filename": filename, "download.hash": file_hash}
+            mods[metafile] = {key: value for key, value in data.items() if value is not None}
+        return mods
+
+    #----------------------------------------
+    # Queries
+    #----------------------------------------
+
+    def _mod_filter(self, mod):
+        """This method returns the WHERE clause and parameters matching a mod by name (case-insensitive) or metafile."""
+        metafile = mod if mod.endswith(".pw.toml") else mod + ".pw.toml"
+        return "(m.name = ? OR m.metafile = ?)", (mod, metafile)
+
+    def versions(self):
+        """This method returns the indexed versions, oldest first."""
+        return [version for version, in self.connection.execute("SELECT version FROM versions ORDER BY position")]
+
+    def first_seen(self, mod):
+        """This method returns (version, metafile, name, filename) of the oldest version that shipped a mod, or None."""
+        where, parameters = self._mod_filter(mod)
+        return self.connection.execute(f"SELECT v.version, m.metafile, m.name, m.filename FROM mods m JOIN versions v ON v.version = m.version WHERE {where} ORDER BY v.position LIMIT 1", parameters).fetchone()
+
+    def last_seen(self, mod):
+        """This method returns (version, metafile, name, filename) of the newest version that shipped a mod, or None."""
+        where, parameters = self._mod_filter(mod)
+        return self.connection.execute(f"SELECT v.version, m.metafile, m.name, m.filename FROM mods m JOIN versions v ON v.version = m.version WHERE {where} ORDER BY v.position DESC LIMIT 1", parameters).fetchone()
+
+    def history(self, mod):
+        """This method returns (version, side, filename, hash) for every version that shipped a mod, oldest first."""
+        where, parameters = self._mod_filter(mod)
+        return self.connection.execute(f"SELECT v.version, m.side, m.filename, m.hash FROM mods m JOIN versions v ON v.version = m.version WHERE {where} ORDER BY v.position", parameters).fetchall()
+
+    def members(self, version):
+        """This method returns (metafile, name, side, filename, hash) for every mod of a version."""
+        return self.connection.execute("SELECT metafile, name, side, filename, hash FROM mods WHERE version = ? ORDER BY metafile", (version,)).fetchall()
+
+    def diff(self, old_version, new_version):
+        """
+        Diff any two indexed versions.
+
+        Returns:
+        - dict in the format of HistoryMatrix.diff: 'added', 'removed' and 'modified' lists of (metafile name,
+          old record, new record) tuples with (name, side, filename) records, modified meaning a different jar.
+        """
+        rows = self.connection.execute("""
+            SELECT o.metafile, 1, n.metafile IS NOT NULL, o.name, o.side, o.filename, n.name, n.side, n.filename
+            FROM mods o LEFT JOIN mods n ON n.version = ? AND n.metafile = o.metafile
+            WHERE o.version = ?
+            UNION ALL
+            SELECT n.metafile, 0, 1, NULL, NULL, NULL, n.name, n.side, n.filename
+            FROM mods n
+            WHERE n.version = ? AND NOT EXISTS (SELECT 1 FROM mods o WHERE o.version = ? AND o.metafile = n.metafile)
+            ORDER BY 1
+        """, (new_version, old_version, new_version, old_version))
+
+        results = {'added': [], 'removed': [], 'modified': []}
+        for metafile, in_old, in_new, old_name, old_side, old_filename, new_name, new_side, new_filename in rows:
+            # The same defaults HistoryMatrix uses for files without a name or side.
+            old_record = (metafile if old_name is None else old_name, metafile if old_side is None else old_side, old_filename)
+            new_record = (metafile if new_name is None else new_name, metafile if new_side is None else new_side, new_filename)
+            if not in_old:
+                results['added'].append((metafile, None, new_record))
+            elif not in_new:
+                results['removed'].append((metafile, old_record, None))
+            elif old_filename != new_filename:
+                results['modified'].append((metafile, old_record, new_record))
+        return results
+
+    def stats(self):
+        """This method returns a one-line summary of the index."""
+        versions, mods = self.connection.execute("SELECT (SELECT COUNT(*) FROM versions), (SELECT COUNT(*) FROM mods)").fetchone()
+        return f"[Mod Index] {versions} versions, {mods} mod entries, {self.indexed} versions indexed this run"
+
+
+def print_rows(header, rows):
+    """This function prints query results as an aligned table."""
+    rows = [tuple("" if value is None else str(value) for value in row) for row in rows]
+    widths = [max([len(str(column))] + [len(row[i]) for row in rows]) for i, column in enumerate(header)]
+    print("  ".join(column.ljust(width) for column, width in zip(header, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the mod history index the export keeps up to date.")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="The index file (default: .modpack-cache/mod_index.sqlite in the pack repository).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    query_parser = subparsers.add_parser("query", help="Look up mods and versions in the index.")
+    query_subparsers = query_parser.add_subparsers(dest="query", required=True)
+    query_subparsers.add_parser("first-seen", help="The first version that shipped a mod.").add_argument("mod", help="Mod name or metafile name.")
+    query_subparsers.add_parser("last-seen", help="The last version that shipped a mod.").add_argument("mod", help="Mod name or metafile name.")
+    query_subparsers.add_parser("history", help="Which jar every version shipped of a mod.").add_argument("mod", help="Mod name or metafile name.")
+    query_subparsers.add_parser("members", help="The mods of a version.").add_argument("version")
+    query_subparsers.add_parser("versions", help="The indexed versions, oldest first.")
+    diff_parser = query_subparsers.add_parser("diff", help="The mods added, removed and updated between any two versions.")
+    diff_parser.add_argument("old_version")
+    diff_parser.add_argument("new_version")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.database):
+        sys.exit(f"{args.database} does not exist, run an export with update_mod_index enabled first.")
+
+    with ModIndex(args.database) as index:
+        if args.query in ("first-seen", "last-seen"):
+            row = index.first_seen(args.mod) if args.query == "first-seen" else index.last_seen(args.mod)
+            if row is None:
+                sys.exit(f"{args.mod} is not in any indexed version.")
+            print_rows(("version", "metafile", "name", "filename"), [row])
+        elif args.query == "history":
+            rows = index.history(args.mod)
+            if not rows:
+                sys.exit(f"{args.mod} is not in any indexed version.")
+            print_rows(("version", "side", "filename", "hash"), rows)
+        elif args.query == "members":
+            if args.version not in index.versions():
+                sys.exit(f"{args.version} is not indexed.")
+            print_rows(("metafile", "name", "side", "filename", "hash"), index.members(args.version))
+        elif args.query == "versions":
+            print("\n".join(index.versions()))
+        elif args.query == "diff":
+            indexed = index.versions()
+            for version in (args.old_version, args.new_version):
+                if version not in indexed:
+                    sys.exit(f"{version} is not indexed.")
+            differences = index.diff(args.old_version, args.new_version)
+            for metafile, _, (name, side, filename) in differences['added']:
+                print(f"+ {name} ({filename})")
+            for metafile, (name, side, filename), _ in differences['removed']:
+                print(f"- {name} ({filename})")
+            for metafile, (name, _, old_filename), (_, _, new_filename) in differences['modified']:
+                print(f"~ {name}: {old_filename} -> {new_filename}")
@@ -0,0 +1,306 @@
+import os
+import asyncio
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
+
+import MarkdownHelper as markdown
+from PackwizMetadata import HEADER_KEYS, parse_metadata, read_metadata
+from BlobStore import git_blob_sha, read_manifest
+
+ACTIVE_SIDES = ("both", "client", "server")
+
+
+def load_mod_metadata(file_path, keys=HEADER_KEYS):
+    """This function reads the requested keys from a single pw.toml file and returns a (data, error) tuple."""
+    try:
+        return read_metadata(file_path, keys), None
+    except Exception as ex:
+        return None, f"{ex} {file_path}"
+
+
+def parse_mod_metadata(data, name, keys=HEADER_KEYS):
+    """This function parses the bytes of a single pw.toml file and returns a (data, error) tuple."""
+    try:
+        # Universal newlines, the same text read_metadata would see.
+        text = data.decode("utf8").replace("\r\n", "\n").replace("\r", "\n")
+        return parse_metadata(text, keys), None
+    except Exception as ex:
+        return None, f"{ex} {name}"
+
+
+def load_mods_metadata(file_paths, keys=HEADER_KEYS):
+    """This function reads a batch of pw.toml files. It is the unit of work handed to the process pool."""
+    return [load_mod_metadata(file_path, keys) for file_path in file_paths]
+
+
+def snapshot_key(path):
+    """This function returns the normalised form of a folder path that snapshots are cached under."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _freeze(value):
+    """This function returns a read-only copy of parsed TOML data."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ModSnapshot(Mapping):
+    def __init__(self, path, mods):
+        """
+        Immutable view of the active mods in a packwiz mods folder, keyed by metafile name.
+
+        Parameters:
+        - path: str, the folder the snapshot was loaded from.
+        - mods: dict, metafile name -> dict of the metadata keys that were loaded.
+        """
+        self._path = path
+        self._mods = MappingProxyType({filename: _freeze(data) for filename, data in mods.items()})
+
+    @property
+    def path(self):
+        return self._path
+
+    def __getitem__(self, filename):
+        return self._mods[filename]
+
+    def __iter__(self):
+        return iter(self._mods)
+
+    def __len__(self):
+        return len(self._mods)
+
+    def __repr__(self):
+        return f"ModSnapshot({self._path!r}, {len(self._mods)} mods)"
+
+    def active_projects(self, parse_object="name"):
+        """This method returns the value of parse_object for every mod in the snapshot, tagging side-specific mods with their side."""
+        active_project = []
+        for mod_toml in self._mods.values():
+            side = str(mod_toml['side'])
+            mod_name = markdown.remove_bracketed_text(mod_toml[parse_object])
+            if side == "both":
+                active_project.append(mod_name)
+            else:
+                active_project.append(f"{mod_name} [{side.capitalize()}]")
+        return active_project
+
+
+class SnapshotLoader:
+    # Batches with fewer files than this are read in-process, starting worker processes would cost more than it saves.
+    # Most files take the header-only fast path, so only large cold histories are worth fanning out.
+    MIN_PARALLEL_FILES = 2000
+    CHUNK_SIZE = 256
+    STREAM_WORKERS = 4      # Parser threads consuming a download stream.
+    STREAM_BACKLOG = 64     # Files waiting for a parser before the stream is no longer pulled.
+
+    def __init__(self, max_workers=None, parallel=True, keys=HEADER_KEYS):
+        """
+        Loads packwiz mods folders into ModSnapshot objects, parsing every pw.toml file exactly once.
+
+        Parameters:
+        - max_workers: int, the maximum number of worker processes (default is the number of CPUs).
+        - parallel: bool, whether parsing should be spread across a process pool (default is True).
+        - keys: tuple of str, the metadata keys to load from each pw.toml file (default is name, filename and side).
+        """
+        self.max_workers = max_workers
+        self.parallel = parallel
+        self.keys = tuple(keys) if "side" in keys else tuple(keys) + ("side",)
+        self._snapshots = {}
+        self._blob_metadata = {}  # blob SHA -> (metadata, error), shared by every folder with a manifest
+        self._executor = None
+        self._executor_lock = threading.Lock()  # A loader can be shared by packs exported at the same time.
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def close(self):
+        """This method shuts down the worker processes. Loaded snapshots stay available."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def invalidate(self, path=None):
+        """This method drops the cached snapshot of a folder, or every cached snapshot if no path is given."""
+        if path is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(snapshot_key(path), None)
+
+    def load(self, path):
+        """This method returns the snapshot of a single mods folder."""
+        return self.load_many([path])[0]
+
+    def load_many(self, paths):
+        """
+        This method returns the snapshots of several mods folders, parsing all uncached folders in one batch.
+
+        Folders with a BlobStore manifest are memoised by blob SHA, so a file shared by many versions is parsed once.
+        """
+        pending = {}  # key -> (path, [(metafile name, job key)])
+        jobs = {}     # job key -> position in file_paths, a job key is a blob SHA or a file path
+        file_paths = []
+        blob_jobs = set()
+        for path in paths:
+            key = snapshot_key(path)
+            if key in self._snapshots or key in pending:
+                continue
+            try:
+                filenames = sorted(f for f in os.listdir(path) if f.endswith('.toml'))
+            except Exception as ex:
+                print(ex)
+                filenames = []
+
+            # The manifest is only trusted if it describes exactly the files in the folder.
+            manifest = read_manifest(path)
+            blob_shas = manifest["files"] if manifest and set(filenames) <= manifest["files"].keys() else {}
+
+            entries = []
+            for filename in filenames:
+                file_path = os.path.join(path, filename)
+                job_key = blob_shas.get(filename, file_path)
+                if filename in blob_shas:
+                    blob_jobs.add(job_key)
+                if job_key not in jobs and job_key not in self._blob_metadata:
+                    jobs[job_key] = len(file_paths)
+                    file_paths.append(file_path)
+                entries.append((filename, job_key))
+            pending[key] = (path, entries)
+
+        results = self._parse(file_paths)
+        for job_key, position in jobs.items():
+            if job_key in blob_jobs:  # Blob SHA jobs are remembered across calls.
+                metadata, error = results[position]
+                self._blob_metadata[job_key] = (_freeze(metadata) if metadata is not None else None, error)
+
+        for key, (path, entries) in pending.items():
+            mods = {}
+            for filename, job_key in entries:
+                if job_key in self._blob_metadata:
+                    metadata, error = self._blob_metadata[job_key]
+                else:
+                    metadata, error = results[jobs[job_key]]
+                if error:
+                    print(error)
+                    continue
+                if str(metadata.get('side')) in ACTIVE_SIDES:
+                    mods[filename] = metadata
+            self._snapshots[key] = ModSnapshot(path, mods)
+
+        return [self._snapshots[snapshot_key(path)] for path in paths]
+
+    def add_snapshot(self, path, mods):
+        """This method registers a snapshot built elsewhere, e.g. from a download stream, under a folder path."""
+        snapshot = ModSnapshot(path, {filename: mods[filename] for filename in sorted(mods)})
+        self._snapshots[snapshot_key(path)] = snapshot
+        return snapshot
+
+    def update_files(self, path, filenames):
+        """
+        Re-parse only the given files of a cached folder snapshot, e.g. the ones a file watcher reported.
+
+        Files that no longer exist are dropped from the snapshot. A folder that is not cached yet is loaded in full.
+
+        Returns:
+        - ModSnapshot, the updated snapshot, which replaces the cached one.
+        """
+        snapshot = self._snapshots.get(snapshot_key(path))
+        if snapshot is None:
+            return self.load(path)
+
+        mods = dict(snapshot.items())
+        filenames = sorted(filename for filename in set(filenames) if filename.endswith('.toml'))
+        for filename in filenames:
+            mods.pop(filename, None)
+        existing = [filename for filename in filenames if os.path.isfile(os.path.join(path, filename))]
+        for filename, (metadata, error) in zip(existing, load_mods_metadata([os.path.join(path, filename) for filename in existing], self.keys)):
+            if error:
+                print(error)
+            elif str(metadata.get('side')) in ACTIVE_SIDES:
+                mods[filename] = metadata
+        return self.add_snapshot(path, mods)
+
+    def _parse_blob(self, data, name):
+        """This method parses the bytes of a pw.toml file, memoised by blob SHA."""
+        blob_sha = git_blob_sha(data)
+        result = self._blob_metadata.get(blob_sha)
+        if result is None:
+            metadata, error = parse_mod_metadata(data, name, self.keys)
+            result = self._blob_metadata[blob_sha] = (_freeze(metadata) if metadata is not None else None, error)
+        return result
+
+    async def load_stream(self, records, root, on_snapshot=None, max_workers=None):
+        """
+        Build snapshots from a stream of downloaded files while the download is still running.
+
+        The files are parsed by a bounded pool of threads and every version is turned into a snapshot as soon as its
+        last file has been parsed, so downloading, parsing and diffing overlap.
+
+        Parameters:
+        - records: async iterable of (version, file name, bytes) tuples, with (version, None, None) marking a
+          complete version, as yielded by AsyncGitHubDownloader.stream_folders.
+        - root: str, the folder the versions belong to. Snapshots are registered under root/version, so later
+          load_many calls for those folders need no disk access.
+        - on_snapshot: callable, optional callback that receives every completed snapshot.
+        - max_workers: int, the number of parser threads (default is STREAM_WORKERS).
+
+        Returns:
+        - dict of version -> ModSnapshot
+        """
+        loop = asyncio.get_running_loop()
+        backlog = asyncio.Semaphore(self.STREAM_BACKLOG)
+        pending = {}    # version -> [parse futures]
+        snapshots = {}
+
+        async def local_parse(filename, data):
+            try:
+                return filename, await loop.run_in_executor(executor, self._parse_blob, data, filename)
+            finally:
+                backlog.release()
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.STREAM_WORKERS) as executor:
+            async for version, filename, data in records:
+                if filename is None:
+                    mods = {}
+                    for filename, (metadata, error) in await asyncio.gather(*pending.pop(version, [])):
+                        if error:
+                            print(error)
+                        elif str(metadata.get('side')) in ACTIVE_SIDES:
+                            mods[filename] = metadata
+                    snapshot = snapshots[version] = self.add_snapshot(os.path.join(root, version), mods)
+                    if on_snapshot is not None:
+                        on_snapshot(snapshot)
+                elif filename.endswith('.toml'):
+                    await backlog.acquire()
+                    pending.setdefault(version, []).append(asyncio.ensure_future(local_parse(filename, data)))
+
+            # Versions whose stream broke off before they were complete are dropped.
+            for futures in pending.values():
+                await asyncio.gather(*futures, return_exceptions=True)
+
+        return snapshots
+
+    def _parse(self, file_paths):
+        """This method parses the given files, fanning out across the process pool when there are enough of them."""
+        if not self.parallel or len(file_paths) < self.MIN_PARALLEL_FILES:
+            return load_mods_metadata(file_paths, self.keys)
+
+        chunks = [file_paths[i:i + self.CHUNK_SIZE] for i in range(0, len(file_paths), self.CHUNK_SIZE)]
+        results = []
+        for chunk_results in self._get_executor().map(partial(load_mods_metadata, keys=self.keys), chunks):
+            results.extend(chunk_results)
+        return results
@@ -9,27 +9,44 @@ import os, sys
 import os.path
 import json
 import subprocess
-from shutil import rmtree, make_archive, move, copytree
+from shutil import rmtree, move
 from pathlib import Path
 
 import toml  # pip install toml
 import yaml # pip install PyYAML
 from ruamel.yaml import YAML
-from mdutils.mdutils import MdUtils
-from mdutils import Html
 import re
-import requests
+import time
+import argparse
+from functools import partial
 
 # GitHub Download
-from GitHubDownloader import AsyncGitHubDownloader
+from GitHubClient import GitHubClient, RateLimitExceeded
+from HttpCache import HttpCache, OfflineCacheMiss
+import GitHubHelper as github
+from GitHistorySource import GitHistorySource
 import asyncio
 
 # Changelog stuff
-from ChangelogFactory import ChangelogFactory
+from ModSnapshot import SnapshotLoader
 
 # Markdown Stuff
 import MarkdownHelper as markdown
 
+# Stage scheduling
+from StageScheduler import StageScheduler, UnknownStage
+from PackwizExporter import PackwizExporter
+from ServerPackArchive import ServerPackArchive, read_entries
+from DeltaPack import DeltaPack, server_jar_changes
+from ServerModResolver import ServerModResolver, ModResolutionError
+from HashVerifier import VerificationError
+from BlobStore import BlobStore, STORE_NAME, read_manifest
+from HashHelper import GIT_BLOB, HASH_FORMATS
+from ModIndex import INDEX_KEYS
+from PackContext import PackContext, CACHE_FOLDER_NAME, load_settings
+from BatchRunner import BatchRunner
+from FolderWatcher import FolderWatcher
+
 ############################################################
 # Variables
 
@@ -39,28 +56,13 @@ user_path = os.path.expanduser("~")
 script_path = __file__
 git_path = str(os.path.dirname(os.path.dirname(script_path))).replace("/","\\") # .replace("/","\\") is to ensure that the path will be in the Windows format.
 
-packwiz_path = git_path + "\\Packwiz\\"
-serverpack_path = git_path + "\\Server Pack\\"
-packwiz_exe_path = os.path.expanduser("~") + "\\go\\bin\\packwiz.exe"
-packwiz_manifest = "pack.toml"
-bcc_client_config_path = packwiz_path + "config\\bcc.json"
-bcc_server_config_path = serverpack_path + "config\\bcc.json"
-export_path = git_path + "\\Export\\"
-tempfolder_path = export_path + "temp\\"
-temp_mods_path = tempfolder_path + "mods\\"
-settings_path = git_path + "\\settings.yml"
-packwiz_mods_path = packwiz_path + "mods\\"
-prev_release = git_path + "\\Modpack-CLI-Tool\\prev_release"
-changelog_dir_path = git_path + "\\Changelogs\\"
-tempgit_path = git_path + "\\Modpack-CLI-Tool\\tempgit\\"
-
 
 ############################################################
 # Functions
 
-def determine_server_export():
+def determine_server_export(ctx):
     """This method determines whether whether the server pack should be exported or not and returns a boolean."""
-    export_server_val = settings_yml['export_server']
+    export_server_val = ctx.settings['export_server']
     if export_server_val:
         if input("Want to export server pack? [N]: ") in ("y", "Y", "yes", "Yes"):
             return True
@@ -70,26 +72,13 @@ def determine_server_export():
         return False
 
 
-def parse_active_projects(input_path, parse_object):
+def parse_active_projects(ctx, input_path, parse_object):
     """This method takes a path as input and parses the pw.toml files inside, returning the names of activate projects in a list."""
-    active_project = []
-    for mod_toml in os.listdir(input_path):
-        mod_toml_path = input_path + mod_toml
-        try:
-            if os.path.isfile(mod_toml_path): # Checks if mod_toml_path is a file.
-                with open(mod_toml_path, "r", encoding="utf8") as f:
-                    mod_toml = toml.load(f)
-                    side = str(mod_toml['side'])
-                    if side in ("both", "client", "server"):
-                        mod_name = markdown.remove_bracketed_text(mod_toml[parse_object])
-                        
-                        if side == "both":
-                            active_project.append(mod_name)
-                        else:
-                            active_project.append(f"{mod_name} [{side.capitalize()}]")
-        except Exception as ex:
-            print(ex, mod_toml)
-    return active_project
+    try:
+        return ctx.snapshot_loader.load(input_path).active_projects(parse_object)
+    except Exception as ex:
+        print(ex, input_path)
+        return []
 
 def make_and_delete_dir(dir):
     """This function takes a directory path as a string and either clears its content if it already exists, or creates it if it doesn't."""
@@ -99,325 +88,642 @@ def make_and_delete_dir(dir):
     else:
         os.makedirs(dir)
 
-#print(markdown.markdown_list_maker(parse_active_projects(packwiz_mods_path, "name")))
-# print(markdown.markdown_list_maker(parse_active_projects(packwiz_mods_path, "filename")))
+#print(markdown.markdown_list_maker(parse_active_projects(ctx, ctx.packwiz_mods_path, "name")))
+# print(markdown.markdown_list_maker(parse_active_projects(ctx, ctx.packwiz_mods_path, "filename")))
 
-def get_latest_release_version(owner, repo):
+def get_latest_release_version(owner, repo, client):
     """
     Retrieve the latest release version from a GitHub repository.
 
     Parameters:
     - owner (str): The owner of the GitHub repository (e.g., 'torvalds' for https://github.com/torvalds/linux).
     - repo (str): The name of the GitHub repository (e.g., 'linux' for https://github.com/torvalds/linux).
+    - client (GitHubClient): The shared client the request is sent through.
 
     Returns:
     - str: The tag name of the latest release version, or a message if no release found.
     """
-    url = f"https://api.github.com/repos/{owner}/{repo}/releases/latest"
+    url = f"{github.GITHUB_API_URL}/{owner}/{repo}/releases/latest"
     headers = {"Accept": "application/vnd.github.v3+json"}
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an error for bad status codes
+        response = client.get(url, headers=headers)
+        if response.status_code != 200:
+            return f"HTTP error occurred: {response.status_code} for url: {url}"
 
         data = response.json()
 
         # Return the tag name of the latest release
         return data.get("tag_name", "No releases found.")
     
-    except requests.exceptions.HTTPError as http_err:
-        return f"HTTP error occurred: {http_err}"
+    except (OfflineCacheMiss, RateLimitExceeded):
+        raise
     except Exception as err:
         return f"Error occurred: {err}"
 
 
+async def stream_comparison_versions(ctx, versions):
+    """
+    Stream the mods folders of the given versions straight into the changelog history.
+
+    Downloading, parsing and diffing overlap, every version is diffed as soon as its last file has been parsed.
+    With keep_comparison_files the streamed files are also written to tempgit_path for the next run.
+
+    Returns:
+    - list: The versions that could not be streamed.
+    """
+    # Everything that is already on disk goes into the history first, so streamed versions can be diffed against it right away.
+    local_paths = [ctx.packwiz_mods_path] + [ctx.tempgit_path + version for version in ctx.changelog_corpus.versions if version != ctx.pack_version and version not in versions]
+    for snapshot in ctx.snapshot_loader.load_many(local_paths):
+        ctx.changelog_factory.add_snapshot(snapshot)
+
+    failed = []
+    records = ctx.downloader.stream_folders(versions, 'Packwiz/mods', sink_root=ctx.tempgit_path if ctx.keep_comparison_files else None, failed=failed, max_concurrency=ctx.download_max_concurrency, limit_per_host=ctx.download_connections_per_host)
+    snapshots = await ctx.snapshot_loader.load_stream(records, ctx.tempgit_path, on_snapshot=lambda snapshot: ctx.changelog_factory.add_snapshot(snapshot, ctx.tempgit_path, ctx.packwiz_mods_path))
+    print(f"Streamed {len(snapshots)} versions.")
+    return failed
 
 ############################################################
-# Start Message
+# Stages
+# Every stage uses absolute paths and passes cwd= to subprocesses, so stages can run concurrently.
 
-os.chdir(packwiz_path)
+def download_comparison_files_stage(ctx):
+    """This function downloads the mods folders of every released version that is not on disk yet."""
+    missing_versions = [version for version in ctx.changelog_corpus.versions if version != ctx.pack_version and not os.path.exists(ctx.tempgit_path + version)]
 
-# Parse pack.toml for modpack version.
-with open(packwiz_manifest, "r") as f:
-    pack_toml = toml.load(f)
-pack_version = pack_toml["version"]
-modpack_name = pack_toml["name"]
-minecraft_version = pack_toml["versions"]["minecraft"]
+    if missing_versions and ctx.history_source == "git":
+        # Read the release tags straight from the local repository, no network needed.
+        try:
+            with GitHistorySource(ctx.git_path) as history:
+                history.sync_folders(missing_versions, 'Packwiz/mods', ctx.tempgit_path)
+        except Exception as ex:
+            print(ex)
+    elif missing_versions and ctx.stream_comparison_files:
+        try:
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+            failed_versions = asyncio.run(stream_comparison_versions(ctx, missing_versions))
+            if failed_versions:
+                print(f"Failed to stream {', '.join(failed_versions)}.")
+        except Exception as ex:
+            print(ex)
+        if not ctx.keep_comparison_files:
+            # Streamed versions never reach the disk, so their folder fingerprints would all look alike.
+            ctx.changelog_factory.diff_cache = None
+    elif missing_versions:
+        try:
+            # All versions are fetched in one event loop over one pooled session, reusing files already on disk.
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+            asyncio.run(ctx.downloader.sync_folders(missing_versions, 'Packwiz/mods', ctx.tempgit_path, max_concurrency=ctx.download_max_concurrency, limit_per_host=ctx.download_connections_per_host))
+        except Exception as ex:
+            print(ex)
 
-input(f"""{launch_message}
-Modpack: {modpack_name}
-Version: {pack_version}
-Minecraft: {minecraft_version}
 
-Press Enter to continue...""")
+def mod_index_stage(ctx):
+    """This function indexes the versions that are new or changed and loads the others from the index for the changelogs."""
+    version_paths = [(version, ctx.packwiz_mods_path if version == ctx.pack_version else ctx.tempgit_path + version) for version in ctx.changelog_corpus.versions]
+    version_paths = [(version, path) for version, path in version_paths if os.path.isdir(path)]
+    indexed = ctx.mod_index.sync(version_paths, ctx.snapshot_loader, versions=ctx.changelog_corpus.versions)
+    print(f"[Mod Index] Indexed {', '.join(indexed) if indexed else 'no new versions'}.")
 
 
-############################################################
-# Configuration
+def primary_changelog_stage(ctx):
+    """This function generates the CHANGELOG.md file."""
+    ctx.changelog_factory.build_markdown_changelog(ctx.repo_owner, ctx.repo_name, ctx.tempgit_path, ctx.packwiz_mods_path, file_name=ctx.git_path + "\\CHANGELOG", repo_branch = ctx.repo_main_branch, mc_version=ctx.minecraft_version, manifest_path=ctx.cache_path + "changelog_manifest.json")
+    # Sections copied from the previous file are not diffed, so their cache entries must survive this save.
+    ctx.diff_cache.save(prune=False)
 
-with open(settings_path, "r") as s_file:
-    settings_yml = yaml.safe_load(s_file)
 
-# These lines contains all global configuration variables.
-export_client = refresh_only = update_bcc_version = cleanup_temp = create_release_notes = print_path_debug = update_publish_workflow = download_comparison_files = generate_mods_changelog = generate_primary_changelog = bool
-bh_banner = repo_owner = repo_name = repo_main_branch = str
-server_mods_remove_list = list
+def mods_changelog_stage(ctx):
+    """This function generates the mod changes comparison files."""
+    write_mods_changelogs(ctx)
 
-# Parse settings file and update variables.
-for key, value in settings_yml.items():
-    globals()[key] = value
 
-export_server = determine_server_export()
-prev_release_version = get_latest_release_version(repo_owner, repo_name)
+def write_mods_changelogs(ctx, versions=None):
+    """This function writes the mod changes comparison files of the given versions, or of every version."""
+    ctx.changelog_factory.prepare_history(ctx.tempgit_path, ctx.packwiz_mods_path, versions=versions)
+    for current_version, next_version in ctx.changelog_corpus.pairs():
+        if not next_version or (versions is not None and current_version not in versions):
+            continue # The oldest version has nothing to be compared against.
 
-if print_path_debug:
-    print("[DEBUG] " + git_path)
-    print("[DEBUG] " + packwiz_path)
-    print("[DEBUG] " + packwiz_exe_path)
-    print("[DEBUG] " + bcc_client_config_path)
-    print("[DEBUG] " + bcc_server_config_path)
+        comparison_paths = ctx.changelog_factory.get_comparison_paths(current_version, next_version, ctx.tempgit_path, ctx.packwiz_mods_path)
+        differences = ctx.changelog_factory.compare_toml_files(*comparison_paths)
 
+        markdown.write_differences_to_markdown(differences, ctx.modpack_name, next_version, current_version, ctx.git_path + f'\\Changelogs\\changelog_mods_{current_version}.md')
+    # Every version pair is compared when all of them are written, so only then can unused entries be dropped.
+    ctx.diff_cache.save(prune=versions is None)
 
-############################################################
-# Class Objects
 
-downloader = AsyncGitHubDownloader(repo_owner, repo_name, branch=prev_release_version)
-changelog_factory = ChangelogFactory(changelog_dir_path, modpack_name, pack_version)
+def publish_workflow_stage(ctx):
+    """This function updates the publish workflow values."""
+    yaml2 = YAML()
+
+    publish_workflow_path = ctx.git_path + f"\\.github\\workflows\\publish.yml"
+
+    with open(publish_workflow_path, "r") as pw_file:
+        publish_workflow_yml = yaml2.load(pw_file)
+
+    publish_workflow_yml['env']['MC_VERSION'] = ctx.minecraft_version
+
+    if "beta" in ctx.pack_version:
+        pw_release_type = "beta"
+    elif "alpha" in ctx.pack_version:
+        pw_release_type = "alpha"
+    else:
+        pw_release_type = "release"
+    
+    publish_workflow_yml['env']['RELEASE_TYPE'] = pw_release_type
+
+    with open(publish_workflow_path, "w") as pw_file:
+        yaml2.dump(publish_workflow_yml, pw_file)
+
+
+def release_notes_stage(ctx):
+    """This function parses the related changelog file for overview details and creates the release markdown files for CF and MR."""
+    changelog_path = ctx.git_path + f"\\Changelogs\\{ctx.pack_version}+{ctx.minecraft_version}.yml"
+    
+    md_element_full_changelog = f"#### **[[Full Changelog]](https://wiki.crismpack.net/modpacks/{ctx.modpack_name.lower()}/changelog/{ctx.minecraft_version}#v{ctx.pack_version})**"
+    md_element_pre_release = '**This is a pre-release. Here be dragons!**'
+    md_element_bh_banner = f"[![BisectHosting Banner]({ctx.bh_banner})](https://bisecthosting.com/CRISM)"
+    md_element_crism_spacer = "![CrismPack Spacer](https://github.com/CrismPack/CDN/blob/main/desc/breakneck/79ESzz1-tiny.png?raw=true)"
+    # html_element_bh_banner = "<p><a href='https://bisecthosting.com/CRISM'><img src='https://github.com/CrismPack/CDN/blob/main/desc/insomnia/bhbanner.png?raw=true' width='800' /></a></p>"
+
+
+    # Streamed straight to the file, which only replaces the previous release notes once it is complete.
+    with markdown.MarkdownWriter.open(ctx.git_path + '\\CurseForge-Release.md') as md_file_cf:
+        md_file_cf.title()
+    
+        if "beta" in ctx.pack_version or "alpha" in ctx.pack_version:
+            print("pack_version = " + ctx.pack_version)
+            md_file_cf.paragraph(md_element_pre_release)
+
+
+        with open(changelog_path, "r", encoding="utf8") as f:
+            changelog_yml = yaml.safe_load(f)
+        try:
+            update_overview = changelog_yml['Update overview']
+            md_file_cf.list(update_overview)
+        #update_overview = update_overview.replace("-","### -")
+        except:
+            improvements = changelog_yml['Changes/Improvements']
+            bug_fixes = changelog_yml['Bug Fixes']
+            if improvements:
+                md_file_cf.heading("Changes/Improvements ⭐", 3)
+                md_file_cf.list(improvements)
+            if bug_fixes:
+                md_file_cf.heading("Bug Fixes 🪲", 3)
+                md_file_cf.list(bug_fixes)
+
+        md_file_cf.paragraph(md_element_full_changelog)
+        md_file_cf.paragraph("<br>")
+        md_file_cf.paragraph(md_element_bh_banner)
+
+
+def bcc_version_stage(ctx):
+    """This function updates the BCC version number."""
+    # Client
+    with open(ctx.bcc_client_config_path, "r") as f:
+        bcc_json = json.load(f)
+    bcc_json["modpackVersion"] = ctx.pack_version
+    with open(ctx.bcc_client_config_path, "w") as f:
+        json.dump(bcc_json, f)
+    # Server
+    with open(ctx.bcc_server_config_path, "r") as f:
+        bcc_json = json.load(f)
+    bcc_json["modpackVersion"] = ctx.pack_version
+    with open(ctx.bcc_server_config_path, "w") as f:
+        json.dump(bcc_json, f)
+
+
+def packwiz_refresh_stage(ctx):
+    """This function refreshes the packwiz index, skipping packwiz when no file changed since the last refresh."""
+    result = ctx.packwiz_index.refresh(lambda: subprocess.call(f"{ctx.packwiz_exe_path} refresh", shell=True, cwd=ctx.packwiz_path), patch_metafiles=ctx.patch_packwiz_index)
+    if result == "up to date":
+        print("[PackWiz] Nothing changed since the last refresh, skipping packwiz refresh.")
+    elif result == "patched":
+        print("[PackWiz] Only mod metafiles changed, updated index.toml directly.")
+
+
+def verify_snapshots_stage(ctx):
+    """This function checks the comparison snapshots against the git blob SHAs in their manifests, before the changelogs read them."""
+    checks = []
+    if os.path.isdir(ctx.tempgit_path):
+        for version in os.listdir(ctx.tempgit_path):
+            manifest = read_manifest(ctx.tempgit_path + version) if version != STORE_NAME else None
+            for filename, blob_sha in (manifest or {}).get("files", {}).items():
+                checks.append({"path": ctx.tempgit_path + version + "\\" + filename, "hash-format": GIT_BLOB, "hash": blob_sha, "source": version})
+
+    failures = ctx.hash_verifier.verify(checks)
+    print(f"[Verify] Checked {len(checks)} snapshot files, {len(failures)} failed.")
+    if not failures:
+        return
+
+    # The snapshot files are hardlinks into the blob store, so the corrupt blobs have to go too or they would be linked again.
+    store = BlobStore(ctx.tempgit_path)
+    for check, error in failures:
+        print(f"[Verify] {error}")
+        store.remove(check["hash"])
+        if os.path.isdir(ctx.tempgit_path + check["source"]):
+            rmtree(ctx.tempgit_path + check["source"])
+            ctx.snapshot_loader.invalidate(ctx.tempgit_path + check["source"])
+            print(f"[Verify] Removed the {check['source']} snapshot.")
+    if ctx.download_comparison_files:
+        download_comparison_files_stage(ctx)
+
+
+def verify_stage(ctx):
+    """This function checks the pack and the jar cache against the hashes recorded for them."""
+    # Every file of the pack against index.toml. The refresh stage has just rewritten index.toml from these files, so
+    # this only catches files that change while the export runs, e.g. through an editor or a sync client. It does not
+    # tell whether index.toml itself is right.
+    index_path = ctx.packwiz_path + ctx.pack_toml["index"]["file"]
+    with open(index_path, "r", encoding="utf8") as f:
+        index_toml = toml.load(f)
+    pack_checks = [{
+        "path": ctx.packwiz_path + entry["file"].replace("/", "\\"),
+        "hash-format": entry.get("hash-format", index_toml["hash-format"]),
+        "hash": entry["hash"],
+        "source": "index.toml",
+        "kind": "pack",
+    } for entry in index_toml.get("files", [])]
+
+    # Cached server jars against the [download] hash of their pw.toml file.
+    resolver = ServerModResolver(ctx.packwiz_mods_path, ctx.jar_cache_path, ctx.github_client)
+    jar_checks = []
+    read_errors = []
+    for mod in resolver.read_mods(read_errors)[0]:
+        if mod["hash"] and str(mod["hash-format"]).lower() in HASH_FORMATS:
+            jar_path = resolver.cache_file_path(mod["hash-format"], mod["hash"])
+            if os.path.isfile(jar_path):
+                jar_checks.append({"path": jar_path, "hash-format": mod["hash-format"], "hash": mod["hash"], "source": mod["metafile"], "kind": "jar"})
+
+    failures = ctx.hash_verifier.verify(pack_checks + jar_checks)
+    # A pw.toml that can not be read fails on its own instead of stopping the check of the other files.
+    failures += [({"path": ctx.packwiz_mods_path + metafile, "kind": "pack"}, error) for metafile, error in read_errors]
+    print(f"[Verify] Checked {len(pack_checks)} pack files against the refreshed index.toml and {len(jar_checks)} cached jars, {len(failures)} failed.")
+
+    pack_failures = []
+    for check, error in failures:
+        print(f"[Verify] {error}")
+        if check["kind"] == "jar":
+            os.remove(check["path"])
+            print(f"[Verify] Removed {check['path']} from the jar cache, it will be downloaded again.")
+        else:
+            pack_failures.append(error)
+    if pack_failures:
+        raise VerificationError(f"{len(pack_failures)} pack files changed during the export or could not be read:\n" + "\n".join(pack_failures))
+
+
+def export_client_stage(ctx):
+    """This function exports the client pack."""
+    # Export CF modpack using Packwiz.
+    file = f'{ctx.modpack_name}-{ctx.pack_version}.zip'
+    subprocess.call(f"{ctx.packwiz_exe_path} cf export", shell=True, cwd=ctx.packwiz_path)
+    move(ctx.packwiz_path + file, f"{ctx.export_path}{file}")
+    print("[PackWiz] Client exported.")
+
+
+def export_server_stage(ctx):
+    """This function exports the server pack."""
+    # Export CF modpack using Packwiz.
+    file = f'{ctx.modpack_name}-{ctx.pack_version}.zip'
+    subprocess.call(f"{ctx.packwiz_exe_path} cf export -s server", shell=True, cwd=ctx.packwiz_path)
+    file_server_name = f'{ctx.modpack_name}-Server-{ctx.pack_version}.zip'
+    move(ctx.packwiz_path + file, f"{ctx.export_path}{file_server_name}")
+    print("[PackWiz] Server exported.")
+
+
+def export_packs_stage(ctx):
+    """This function exports the client and server packs at the same time, each in its own scratch copy of the pack."""
+    file = f'{ctx.modpack_name}-{ctx.pack_version}.zip'
+    targets = []
+    if ctx.export_client:
+        targets.append(("client", ["cf", "export"], file, f"{ctx.export_path}{file}"))
+    if ctx.export_server:
+        targets.append(("server", ["cf", "export", "-s", "server"], file, f"{ctx.export_path}{ctx.modpack_name}-Server-{ctx.pack_version}.zip"))
+
+    exporter = PackwizExporter(ctx.packwiz_exe_path, ctx.packwiz_path, ctx.export_path + ".scratch\\")
+    for name, exported in exporter.export(targets).items():
+        if not exported:
+            raise RuntimeError(f"The {name} export failed.")
+        print(f"[PackWiz] {name.capitalize()} exported.")
+
+
+def server_pack_stage(ctx):
+    """This function builds the server pack archive from the "Server Pack" folder and the server side mods of the pack."""
+    file_server_name = f'{ctx.modpack_name}-Server-{ctx.pack_version}.zip'
+
+    # Entries are streamed into the zip straight from their source folders, mods replacing files with the same name.
+    archive = ServerPackArchive()
+    archive.add_folder(ctx.serverpack_path)
+
+    if ctx.resolve_server_mods:
+        # The jars are downloaded from the URLs in the pw.toml files into the jar cache, no launcher needed.
+        resolver = ServerModResolver(ctx.packwiz_mods_path, ctx.jar_cache_path, ctx.github_client, max_concurrency=ctx.download_max_concurrency, limit_per_host=ctx.download_connections_per_host)
+        for filename, jar_path in resolver.resolve().items():
+            archive.add_file(jar_path, "mods/" + filename)
+    else:
+        # Console input.
+        server_mods_path = input(f'Create a new modpack instance in the CurseForge launcher using the {file_server_name} file. Then drag the mods folder from that instance into the terminal (No spaces allowed for the source directory): ')
+        archive.add_folder(server_mods_path, "mods")
+
+    # Removes specified files from mods folder
+    for file in ctx.server_mods_remove_list:
+        archive.discard("mods/" + file)
+
+    count = archive.write(ctx.export_path + file_server_name)
+    print(f"[Server Pack] Wrote {count} entries to {file_server_name}.")
+
+
+def delta_pack_stage(ctx):
+    """This function exports an update archive with only the server files that changed since the previous release."""
+    if ctx.prev_release_version == ctx.pack_version:
+        print(f"[Delta] {ctx.pack_version} is already released, there is nothing to update from.")
+        return
+    if not os.path.isdir(ctx.tempgit_path + ctx.prev_release_version):
+        print(f"[Delta] The {ctx.prev_release_version} snapshot is missing, enable download_comparison_files to build a delta pack.")
+        return
+
+    delta = DeltaPack(ctx.modpack_name, ctx.prev_release_version, ctx.pack_version)
+
+    # Mods from the metafile diff, the same one the changelogs use.
+    raw_differences = ctx.changelog_factory.compare_mod_files(ctx.tempgit_path + ctx.prev_release_version, ctx.packwiz_mods_path)
+    delta.changes = ctx.changelog_factory.format_differences(raw_differences)
+    deleted_jars, changed_metafiles = server_jar_changes(raw_differences)
+    for filename in deleted_jars:
+        delta.delete("mods/" + filename)
+    resolver = ServerModResolver(ctx.packwiz_mods_path, ctx.jar_cache_path, ctx.github_client, max_concurrency=ctx.download_max_concurrency, limit_per_host=ctx.download_connections_per_host)
+    for filename, jar_path in resolver.resolve(changed_metafiles).items():
+        delta.add_file(jar_path, "mods/" + filename)
+    for file in ctx.server_mods_remove_list:
+        delta.discard("mods/" + file)
+
+    # The rest of the server folder against the previous full server pack, if it is still in the export folder.
+    previous_pack_path = ctx.export_path + f"{ctx.modpack_name}-Server-{ctx.prev_release_version}.zip"
+    previous_entries = read_entries(previous_pack_path) if os.path.isfile(previous_pack_path) else None
+    if previous_entries is None:
+        print(f"[Delta] {previous_pack_path} not found, shipping every file of the Server Pack folder.")
+    delta.add_folder_changes(ctx.serverpack_path, previous_entries, skip_prefixes=("mods/",))
+
+    file_delta_name = f"{ctx.modpack_name}-Server-{ctx.prev_release_version}-to-{ctx.pack_version}.zip"
+    shipped, deleted = delta.write(ctx.export_path + file_delta_name)
+    print(f"[Delta] Wrote {file_delta_name}: {shipped} changed files, {deleted} deleted files.")
+
+
+def cleanup_temp_stage(ctx):
+    """This function deletes the temp folder."""
+    if os.path.isdir(ctx.tempfolder_path):
+        rmtree(ctx.tempfolder_path)
+        print("Temp folder cleanup finished.")
+
 
 ############################################################
 # Main Program
 
-def main():
-
-    if not refresh_only:
-
-        #----------------------------------------
-        # Download comparison files.
-        #----------------------------------------
-        if download_comparison_files:
-            
-            async def download_compare_files_async(input_version):
-                local_downloader = AsyncGitHubDownloader(repo_owner, repo_name, branch=input_version)
-                await local_downloader.download_folder('Packwiz/mods', tempgit_path + input_version)
-                return
-
-            for changelog in reversed(os.listdir(changelog_dir_path)):
-                if changelog.endswith(('.yml', '.yaml')):  # Filter only YAML files
-                    version = changelog_factory.get_changelog_value(changelog, "version")
-                    version_path = tempgit_path + version
-
-                    if version != pack_version and not os.path.exists(version_path):
-                        os.makedirs(version_path)
-                        try:
-                            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-                            asyncio.run(download_compare_files_async(version))
-                        except Exception as ex:
-                            print(ex)
-
-
-        #----------------------------------------
-        # Generate CHANGELOG.md file.
-        #----------------------------------------
-
-        if generate_primary_changelog:
-            os.chdir(git_path)
-            changelog_factory.build_markdown_changelog(repo_owner, repo_name, tempgit_path, packwiz_mods_path, repo_branch = repo_main_branch, mc_version=minecraft_version)
-
-
-        #----------------------------------------
-        # Generate mod changes comparison files.
-        #----------------------------------------
-
-        if generate_mods_changelog:
-            os.chdir(git_path)
-            changelog_list = changelog_factory.Reverse(os.listdir(changelog_dir_path))
-
-            # Iterate over the list with an index using enumerate
-            for i, changelog in enumerate(changelog_list):
-                # Check if there's a "next" item
-                if i + 1 < len(changelog_list):
-                    next_changelog = changelog_list[i + 1]
-                else:
-                    next_changelog = None  # No next item if we're at the last one
-                
-                if changelog.endswith(('.yml', '.yaml')):  # Filter only YAML files
-                    current_version = changelog_factory.get_changelog_value(changelog, 'version')
-                    if next_changelog:
-                        next_version = changelog_factory.get_changelog_value(next_changelog, 'version')
-
-                    next_version_path = os.path.join(tempgit_path, str(next_version))
-                    current_version_path = os.path.join(tempgit_path, str(current_version))
-
-                    if str(current_version) != str(pack_version) and next_version:
-                        differences = changelog_factory.compare_toml_files(next_version_path, current_version_path)
-                    elif str(current_version) == str(pack_version) and next_version:
-                        differences = changelog_factory.compare_toml_files(next_version_path, packwiz_mods_path)
-                    else:
-                        differences = None
-
-                    if next_version != current_version:
-                        markdown.write_differences_to_markdown(differences, modpack_name, next_version, current_version, git_path + f'\\Changelogs\\changelog_mods_{current_version}.md')
-
-
-        #----------------------------------------
-        # Update publish workflow values.
-        #----------------------------------------
-        if update_publish_workflow:
-            os.chdir(git_path)
-            yaml2 = YAML()
-
-            publish_workflow_path = git_path + f"\\.github\\workflows\\publish.yml"
-
-            with open(publish_workflow_path, "r") as pw_file:
-                publish_workflow_yml = yaml2.load(pw_file)
-
-            publish_workflow_yml['env']['MC_VERSION'] = minecraft_version
-
-            if "beta" in pack_version:
-                pw_release_type = "beta"
-            elif "alpha" in pack_version:
-                pw_release_type = "alpha"
-            else:
-                pw_release_type = "release"
-            
-            publish_workflow_yml['env']['RELEASE_TYPE'] = pw_release_type
-
-            with open(publish_workflow_path, "w") as pw_file:
-                yaml2.dump(publish_workflow_yml, pw_file)
-        
-
-        #----------------------------------------
-        # Create release notes.
-        #----------------------------------------
-
-        # Parse the related changelog file for overview details and create release markdown files for CF and MR.
-        if create_release_notes:
-            os.chdir(git_path)
-            changelog_path = git_path + f"\\Changelogs\\{pack_version}+{minecraft_version}.yml"
-            
-            md_element_full_changelog = f"#### **[[Full Changelog]](https://wiki.crismpack.net/modpacks/{modpack_name.lower()}/changelog/{minecraft_version}#v{pack_version})**"
-            md_element_pre_release = '**This is a pre-release. Here be dragons!**'
-            md_element_bh_banner = f"[![BisectHosting Banner]({bh_banner})](https://bisecthosting.com/CRISM)"
-            md_element_crism_spacer = "![CrismPack Spacer](https://github.com/CrismPack/CDN/blob/main/desc/breakneck/79ESzz1-tiny.png?raw=true)"
-            # html_element_bh_banner = "<p><a href='https://bisecthosting.com/CRISM'><img src='https://github.com/CrismPack/CDN/blob/main/desc/insomnia/bhbanner.png?raw=true' width='800' /></a></p>"
-
-
-            mdFile_CF = MdUtils(file_name='CurseForge-Release')
-            
-            if "beta" in pack_version or "alpha" in pack_version:
-                print("pack_version = " + pack_version)
-                mdFile_CF.new_paragraph(md_element_pre_release)
-
-
-            with open(changelog_path, "r", encoding="utf8") as f:
-                changelog_yml = yaml.safe_load(f)
-            try:
-                update_overview = changelog_yml['Update overview']
-                mdFile_CF.new_paragraph(markdown.markdown_list_maker(update_overview))
-            #update_overview = update_overview.replace("-","### -")
-            except:
-                improvements = changelog_yml['Changes/Improvements']
-                bug_fixes = changelog_yml['Bug Fixes']
-                if improvements:
-                    mdFile_CF.new_paragraph("### Changes/Improvements ⭐")
-                    mdFile_CF.new_paragraph(markdown.markdown_list_maker(improvements))
-                if bug_fixes:
-                    mdFile_CF.new_paragraph("### Bug Fixes 🪲")
-                    mdFile_CF.new_paragraph(markdown.markdown_list_maker(bug_fixes))
-
-            mdFile_CF.new_paragraph(md_element_full_changelog)
-            mdFile_CF.new_paragraph("<br>")
-            mdFile_CF.new_paragraph(md_element_bh_banner)
-            mdFile_CF.create_md_file()
-
-
-        #----------------------------------------
-        # Update BCC version number.
-        #----------------------------------------
-        
-        if update_bcc_version:
-            os.chdir(packwiz_path)
-            # Client
-            with open(bcc_client_config_path, "r") as f:
-                bcc_json = json.load(f)
-            bcc_json["modpackVersion"] = pack_version
-            with open(bcc_client_config_path, "w") as f:
-                json.dump(bcc_json, f)
-            # Server
-            with open(bcc_server_config_path, "r") as f:
-                bcc_json = json.load(f)
-            bcc_json["modpackVersion"] = pack_version
-            with open(bcc_server_config_path, "w") as f:
-                json.dump(bcc_json, f)
-
-
-        #----------------------------------------
-        # Export client pack.
-        #----------------------------------------
-        os.chdir(packwiz_path)
-
-        # Refresh the packwiz index
-        subprocess.call(f"{packwiz_exe_path} refresh", shell=True)
-
-        # Packwiz exporting
-        file = f'{modpack_name}-{pack_version}.zip'
-        if export_client:
-            # Export CF modpack using Packwiz.
-            subprocess.call(f"{packwiz_exe_path} cf export", shell=True)
-            move(file, f"{export_path}{file}")
-            print("[PackWiz] Client exported.")
-
-
-        #----------------------------------------
-        # Export server pack
-        # ----------------------------------------
-        if export_server:
-            # Export CF modpack using Packwiz.
-            subprocess.call(f"{packwiz_exe_path} cf export -s server", shell=True)
-            file_server_name = f'{modpack_name}-Server-{pack_version}.zip'
-            move(file, f"{export_path}{file_server_name}")
-            print("[PackWiz] Server exported.")
-
-            os.chdir(git_path)
-            # Deletes the temp folder if it already exists.
-            if os.path.isdir(tempfolder_path):
-                rmtree(tempfolder_path)
-
-            copytree("Server Pack", tempfolder_path) # Copies contents of "Server Pack" folder into the temp folder.
-
-            # Console input.
-            server_mods_path = input(f'Create a new modpack instance in the CurseForge launcher using the {file_server_name} file. Then drag the mods folder from that instance into the terminal (No spaces allowed for the source directory): ')
-            
-            copytree(server_mods_path, temp_mods_path, dirs_exist_ok=True)
-            
-            # Removes specified files from mods folder
-            os.chdir(temp_mods_path)
-            for file in os.listdir():
-                if file in server_mods_remove_list:
-                    os.remove(file)
-
-            os.chdir(export_path)
-            make_archive(f"{modpack_name}-Server-{pack_version}", 'zip', tempfolder_path)
-
-
-        #----------------------------------------
-        # Temp cleanup
-        #----------------------------------------
-        if cleanup_temp and os.path.isdir(tempfolder_path):
-            rmtree(tempfolder_path)
-            print("Temp folder cleanup finished.")
-        
-        os.chdir(packwiz_path)
-        subprocess.call(f"{packwiz_exe_path} refresh", shell=True)
-        
-    elif refresh_only:
-        subprocess.call(f"{packwiz_exe_path} refresh", shell=True)
+def main(ctx, only=None, skip=None, scheduler=None):
+    scheduler = scheduler or StageScheduler()
+
+    # Stages are declared in their original order with the resources they read and write.
+    # Stages that touch different resources run concurrently, the others keep their order.
+    if ctx.refresh_only:
+        scheduler.add("packwiz_refresh", partial(packwiz_refresh_stage, ctx), inputs=["pack/mods", "pack/config"], outputs=["pack/index"])
+        scheduler.run(only, skip)
+        return scheduler
+
+    if ctx.download_comparison_files:
+        scheduler.add("download_comparison_files", partial(download_comparison_files_stage, ctx), inputs=["changelogs"], outputs=["tempgit", "history"])
+    if ctx.verify_files:
+        # Removes corrupt snapshots and downloads them again before the changelogs read them.
+        scheduler.add("verify_snapshots", partial(verify_snapshots_stage, ctx), inputs=["changelogs"], outputs=["tempgit", "history"])
+    if ctx.update_mod_index:
+        scheduler.add("mod_index", partial(mod_index_stage, ctx), inputs=["changelogs", "tempgit", "pack/mods"], outputs=["mod_index", "history"])
+    if ctx.generate_primary_changelog:
+        scheduler.add("primary_changelog", partial(primary_changelog_stage, ctx), inputs=["changelogs", "tempgit", "pack/mods"], outputs=["CHANGELOG.md", "history"])
+    if ctx.generate_mods_changelog:
+        scheduler.add("mods_changelog", partial(mods_changelog_stage, ctx), inputs=["changelogs", "tempgit", "pack/mods"], outputs=["changelog_mods", "history"])
+    if ctx.update_publish_workflow:
+        scheduler.add("publish_workflow", partial(publish_workflow_stage, ctx), outputs=["publish.yml"])
+    if ctx.create_release_notes:
+        scheduler.add("release_notes", partial(release_notes_stage, ctx), inputs=["changelogs"], outputs=["CurseForge-Release.md"])
+    if ctx.update_bcc_version:
+        scheduler.add("bcc_version", partial(bcc_version_stage, ctx), outputs=["pack/config", "server_pack/config"])
+    scheduler.add("packwiz_refresh", partial(packwiz_refresh_stage, ctx), inputs=["pack/mods", "pack/config"], outputs=["pack/index"])
+    if ctx.verify_files:
+        # Removes corrupt cached jars, and stops the exports if the pack does not match its index.
+        scheduler.add("verify", partial(verify_stage, ctx), inputs=["pack/mods", "pack/config", "pack/index"], outputs=["jars", "verified"])
+    if ctx.parallel_exports and (ctx.export_client or ctx.export_server):
+        # Both exports run at once in scratch copies, so they only read the pack folder.
+        scheduler.add("export_packs", partial(export_packs_stage, ctx), inputs=["pack/mods", "pack/config", "pack/index", "verified"], outputs=["export"])
+    else:
+        if ctx.export_client:
+            scheduler.add("export_client", partial(export_client_stage, ctx), inputs=["pack/mods", "pack/config", "pack/index", "verified"], outputs=["pack/export", "export"])
+        if ctx.export_server:
+            scheduler.add("export_server", partial(export_server_stage, ctx), inputs=["pack/mods", "pack/config", "pack/index", "verified"], outputs=["pack/export", "export"])
+    if ctx.export_server:
+        # Without resolve_server_mods it asks for console input, so it runs on its own.
+        scheduler.add("server_pack", partial(server_pack_stage, ctx), inputs=["export", "server_pack/config", "pack/mods", "verified"], outputs=["export", "jars"], exclusive=not ctx.resolve_server_mods)
+    if ctx.export_delta_pack:
+        scheduler.add("delta_pack", partial(delta_pack_stage, ctx), inputs=["tempgit", "pack/mods", "server_pack/config", "export", "verified"], outputs=["export", "jars", "history"])
+    if ctx.cleanup_temp:
+        scheduler.add("cleanup_temp", partial(cleanup_temp_stage, ctx), outputs=["temp"])
+    scheduler.add("final_refresh", partial(packwiz_refresh_stage, ctx), inputs=["pack/mods", "pack/config"], outputs=["pack/index"])
+
+    scheduler.run(only, skip)
+    return scheduler
+
+
+############################################################
+# Watch Mode
+
+def watch_changelogs(ctx):
+    """
+    Keep CHANGELOG.md and the mods changelog of the work in progress version up to date while the pack is being edited.
+
+    The changelogs and snapshots are loaded once. After that only the metafiles and changelog files that changed are
+    parsed again, and only the Markdown files they affect are written. Changes are debounced by watch_debounce
+    seconds, so a bulk update of the mods folder is handled once.
+    """
+    # A first full pass loads everything and brings the outputs up to date.
+    if ctx.download_comparison_files:
+        download_comparison_files_stage(ctx)
+    if ctx.generate_primary_changelog:
+        primary_changelog_stage(ctx)
+    if ctx.generate_mods_changelog:
+        mods_changelog_stage(ctx)
+
+    with FolderWatcher([ctx.packwiz_mods_path, ctx.changelog_dir_path], debounce=ctx.watch_debounce) as watcher:
+        print(f"[Watch] Watching {ctx.packwiz_mods_path} and {ctx.changelog_dir_path} ({watcher.backend}), press Ctrl+C to stop.")
+        while True:
+            changes = watcher.wait(timeout=1.0) # A timeout keeps Ctrl+C responsive on Windows.
+            if not changes:
+                continue
+            start = time.perf_counter()
+            mods_versions = set()
+
+            mod_files = changes.get(ctx.packwiz_mods_path)
+            if mod_files:
+                snapshot = ctx.snapshot_loader.update_files(ctx.packwiz_mods_path, mod_files)
+                ctx.changelog_factory.refresh_snapshot(snapshot)
+                mods_versions.add(ctx.pack_version)
+
+            changelog_files = changes.get(ctx.changelog_dir_path)
+            if changelog_files:
+                old_pairs = dict(ctx.changelog_corpus.pairs())
+                ctx.changelog_corpus.reload_files(changelog_files)
+                # Adding or removing a changelog changes which versions are compared.
+                mods_versions.update(version for version, next_version in ctx.changelog_corpus.pairs() if version not in old_pairs or old_pairs[version] != next_version)
+
+            # CHANGELOG.md only renders the sections whose inputs changed, see ChangelogFactory.build_markdown_changelog.
+            if ctx.generate_primary_changelog:
+                primary_changelog_stage(ctx)
+            if ctx.generate_mods_changelog and mods_versions:
+                write_mods_changelogs(ctx, mods_versions)
+            changed_files = sum(len(files) for files in changes.values())
+            print(f"[Watch] {changed_files} files changed, changelogs updated in {time.perf_counter() - start:.2f} s.")
+
+
+############################################################
+# Batch Mode
+
+def export_batch_pack(pack_path, settings, github_client, snapshot_loader, jar_cache_path, output, only, skip, result):
+    """This function exports one pack of a batch without asking for input, reporting into its BatchRunner result."""
+    ctx = PackContext(pack_path, settings, snapshot_loader=snapshot_loader, jar_cache_path=jar_cache_path, interactive=False)
+    result.version = ctx.pack_version
+    if ctx.export_server and not ctx.resolve_server_mods and not ctx.refresh_only:
+        raise ValueError("Exporting the server pack in batch mode needs resolve_server_mods, the mods folder can not be asked for.")
+
+    try:
+        ctx.setup(github_client, get_latest_release_version(ctx.repo_owner, ctx.repo_name, github_client))
+        if ctx.print_path_debug:
+            ctx.print_paths()
+        # The stage threads label their output with the pack like the thread running this job.
+        result.scheduler = StageScheduler(initializer=output.inherit())
+        main(ctx, only, skip, result.scheduler)
+        for line in ctx.stats():
+            print(line)
+    finally:
+        ctx.close()
+
+
+def run_batch(batch_path, offline=False, only=None, skip=None):
+    """
+    Export every pack listed in a batch file in one process, without asking for input.
+
+    The packs are processed concurrently and share the GitHub client with its HTTP cache, the snapshot loader and
+    the jar cache, so a pack benefits from everything the others already fetched and parsed. See batch_template.yml.
+
+    Returns:
+    - bool: Whether every pack finished.
+    """
+    with open(batch_path, "r") as b_file:
+        batch_yml = yaml.safe_load(b_file)
+
+    # Next to the batch file by default, outside every pack and outside the tool's folder that the launchers clone again.
+    default_cache_path = str(os.path.dirname(os.path.abspath(batch_path))).replace("/","\\") + "\\" + CACHE_FOLDER_NAME
+    shared_cache_path = str(batch_yml.get("cache_path") or default_cache_path).replace("/","\\").rstrip("\\") + "\\"
+    http_cache = HttpCache(shared_cache_path + "http\\", offline=offline)
+    github_client = GitHubClient(token=batch_yml.get("github_token") or os.environ.get("GITHUB_TOKEN"), http_cache=http_cache)
+    # Loads the download hash too, so it serves the packs with and without the mod index.
+    snapshot_loader = SnapshotLoader(keys=INDEX_KEYS)
+    runner = BatchRunner(max_workers=batch_yml.get("max_workers", 2))
+
+    jobs = []
+    for pack in batch_yml["packs"]:
+        pack_path = str(pack["path"]).replace("/","\\").rstrip("\\")
+        # Settings for every pack first, then the pack's own, both on top of the pack's settings.yml.
+        settings = load_settings(pack_path + "\\settings.yml", {**(batch_yml.get("settings") or {}), **(pack.get("settings") or {})})
+        label = pack.get("name") or pack_path.split("\\")[-1]
+        jobs.append((label, partial(export_batch_pack, pack_path, settings, github_client, snapshot_loader, shared_cache_path + "jars\\", runner.output, only, skip)))
+
+    try:
+        results = runner.run(jobs)
+    finally:
+        snapshot_loader.close()
+        print(http_cache.stats())
+        print(github_client.stats())
+        github_client.close()
+    return all(result.status == "done" for result in results)
 
 
 if __name__ == "__main__":
+    ############################################################
+    # Command Line
+
+    arg_parser = argparse.ArgumentParser(description="HaXr's Modpack CLI Tool")
+    arg_parser.add_argument("--offline", action="store_true", help="Serve every GitHub API call from the local cache and fail on a cache miss.")
+    arg_parser.add_argument("--only", nargs="+", metavar="STAGE", help="Only run these stages.")
+    arg_parser.add_argument("--skip", nargs="+", metavar="STAGE", help="Run every stage except these.")
+    arg_parser.add_argument("--batch", metavar="FILE", help="Export every pack listed in this YAML file without asking for input, see batch_template.yml.")
+    arg_parser.add_argument("--watch", action="store_true", help="Regenerate the changelogs whenever the mods or changelog files change, until stopped with Ctrl+C.")
+    args = arg_parser.parse_args()
+    if args.watch and (args.batch or args.only or args.skip):
+        arg_parser.error("--watch can not be combined with --batch, --only or --skip.")
+
+    if args.batch:
+        try:
+            if not run_batch(args.batch, args.offline, args.only, args.skip):
+                exit(-1)
+        except KeyboardInterrupt:
+            print("Operation aborted by user.")
+            exit(-1)
+        exit(0)
+
+    ############################################################
+    # Configuration
+
+    ctx = PackContext(git_path, load_settings(git_path + "\\settings.yml"))
+
+    # GitHub API responses are cached on disk and revalidated with conditional requests.
+    http_cache = HttpCache(ctx.cache_path + "http\\", offline=args.offline)
+
+
+    ############################################################
+    # Start Message
+
+    input(f"""{launch_message}
+Modpack: {ctx.modpack_name}
+Version: {ctx.pack_version}
+Minecraft: {ctx.minecraft_version}
+
+Press Enter to continue...""")
+
+    # Every GitHub request goes through one pooled, rate limit aware client. A token raises the limit from 60 to 5,000 requests per hour.
+    github_client = GitHubClient(token=ctx.github_token or os.environ.get("GITHUB_TOKEN"), http_cache=http_cache)
+
+    # Watch mode only writes the changelogs.
+    ctx.export_server = determine_server_export(ctx) if not args.watch else False
+
+
     try:
+        ############################################################
+        # Class Objects
+
+        # Looking up the latest release raises OfflineCacheMiss and RateLimitExceeded, handled below.
+        ctx.setup(github_client, get_latest_release_version(ctx.repo_owner, ctx.repo_name, github_client))
+
+        if ctx.print_path_debug:
+            ctx.print_paths()
+
+        if args.watch:
+            try:
+                watch_changelogs(ctx)
+            except KeyboardInterrupt:
+                ctx.diff_cache.save(prune=False)
+                ctx.close()
+                github_client.close()
+                print("Stopped watching.")
+            exit(0)
+
         print("")
-        main()
+        main(ctx, args.only, args.skip)
+        for line in ctx.stats():
+            print(line)
+        ctx.close()
+        print(http_cache.stats())
+        print(github_client.stats())
+        github_client.close()
     except KeyboardInterrupt:
         print("Operation aborted by user.")
-        exit(-1)
\ No newline at end of file
+        exit(-1)
+    except (OfflineCacheMiss, RateLimitExceeded, UnknownStage, ModResolutionError, VerificationError) as ex:
+        print(ex)
+        exit(-1)
@@ -0,0 +1,170 @@
+import os
+
+import toml  # pip install toml
+import yaml # pip install PyYAML
+
+from GitHubDownloader import AsyncGitHubDownloader
+from ChangelogFactory import ChangelogFactory
+from ChangelogCorpus import ChangelogCorpus
+from ModSnapshot import SnapshotLoader
+from DiffCache import DiffCache
+from PackwizIndex import PackwizIndex
+from HashVerifier import HashVerifier
+from ModIndex import ModIndex, INDEX_KEYS
+
+# The caches live next to the tool's folder, the launchers delete and clone Modpack-CLI-Tool again on every start.
+CACHE_FOLDER_NAME = ".modpack-cache"
+
+# The value of every setting a pack's settings.yml does not set, the same as settings_template.yml.
+DEFAULT_SETTINGS = {
+    "export_client": True,
+    "export_server": False,
+    "refresh_only": False,
+    "update_bcc_version": True,
+    "cleanup_temp": True,
+    "create_release_notes": True,
+    "server_mods_remove_list": [],
+    "print_path_debug": True,
+    "update_publish_workflow": True,
+    "download_comparison_files": True,
+    "generate_primary_changelog": True,
+    "generate_mods_changelog": True,
+    "history_source": "github",
+    "download_max_concurrency": AsyncGitHubDownloader.MAX_CONCURRENCY,
+    "download_connections_per_host": AsyncGitHubDownloader.LIMIT_PER_HOST,
+    "stream_comparison_files": False,
+    "keep_comparison_files": True,
+    "github_token": None,
+    "parallel_exports": True,
+    "patch_packwiz_index": True,
+    "resolve_server_mods": True,
+    "verify_files": True,
+    "export_delta_pack": False,
+    "update_mod_index": True,
+    "watch_debounce": 1.0,
+    "cache_path": "",
+    "bh_banner": "",
+    "repo_owner": "",
+    "repo_name": "",
+    "repo_main_branch": "main",
+}
+
+
+def load_settings(settings_path, overrides=None):
+    """
+    Load the settings of a pack.
+
+    Parameters:
+    - settings_path: str, the pack's settings.yml. A missing file leaves every setting at its default.
+    - overrides: dict, optional settings that take precedence over the file, e.g. from a batch file.
+
+    Returns:
+    - dict with a value for every key of DEFAULT_SETTINGS, plus any other key the file or overrides set.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.isfile(settings_path):
+        with open(settings_path, "r") as s_file:
+            settings.update(yaml.safe_load(s_file) or {})
+    settings.update(overrides or {})
+    return settings
+
+
+class PackContext:
+    def __init__(self, git_path, settings, snapshot_loader=None, jar_cache_path=None, interactive=True):
+        """
+        Everything one export of one pack works with: its paths, its settings and the objects built for it.
+
+        The stages of Modpack-Export.py read all of their state from a context, so several packs can be exported
+        in one process. Objects that can serve several packs (the GitHub client with its HTTP cache, the snapshot
+        loader and the jar cache) are passed in, the ones tied to the pack's files are created by setup().
+        Reading pack.toml and the settings needs no network, so the banner can be shown before setup().
+
+        Parameters:
+        - git_path: str, the root of the pack's repository, in the Windows format.
+        - settings: dict, the pack's settings, see load_settings. Every key becomes an attribute.
+        - snapshot_loader: SnapshotLoader, optional loader shared with other packs. It must load INDEX_KEYS when
+          update_mod_index is enabled. Without it the pack gets its own.
+        - jar_cache_path: str, optional folder of downloaded server jars shared with other packs (default is the
+          jars\\ folder of the pack's cache).
+        - interactive: bool, whether the export may ask for console input.
+        """
+        self.git_path = git_path.rstrip("\\")
+        self.interactive = interactive
+
+        self.settings = settings
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+        self.packwiz_path = self.git_path + "\\Packwiz\\"
+        self.serverpack_path = self.git_path + "\\Server Pack\\"
+        self.packwiz_exe_path = os.path.expanduser("~") + "\\go\\bin\\packwiz.exe"
+        self.packwiz_manifest = self.packwiz_path + "pack.toml"
+        self.bcc_client_config_path = self.packwiz_path + "config\\bcc.json"
+        self.bcc_server_config_path = self.serverpack_path + "config\\bcc.json"
+        self.export_path = self.git_path + "\\Export\\"
+        self.tempfolder_path = self.export_path + "temp\\"
+        self.temp_mods_path = self.tempfolder_path + "mods\\"
+        self.settings_path = self.git_path + "\\settings.yml"
+        self.packwiz_mods_path = self.packwiz_path + "mods\\"
+        self.prev_release = self.git_path + "\\Modpack-CLI-Tool\\prev_release"
+        self.changelog_dir_path = self.git_path + "\\Changelogs\\"
+        self.cache_path = str(settings.get("cache_path") or self.git_path + "\\" + CACHE_FOLDER_NAME).replace("/","\\").rstrip("\\") + "\\"
+        self.tempgit_path = self.cache_path + "tempgit\\"
+        self.jar_cache_path = jar_cache_path or self.cache_path + "jars\\"
+
+        # Parse pack.toml for modpack version.
+        with open(self.packwiz_manifest, "r") as f:
+            self.pack_toml = toml.load(f)
+        self.pack_version = self.pack_toml["version"]
+        self.modpack_name = self.pack_toml["name"]
+        self.minecraft_version = self.pack_toml["versions"]["minecraft"]
+
+        self.github_client = None
+        self.snapshot_loader = snapshot_loader
+        self.owns_snapshot_loader = snapshot_loader is None
+        self.prev_release_version = None
+        self.mod_index = None
+
+    def setup(self, github_client, prev_release_version):
+        """
+        Create the objects the stages work with.
+
+        Parameters:
+        - github_client: GitHubClient, the client every GitHub and download request goes through.
+        - prev_release_version: str, the tag of the latest release of the pack.
+        """
+        self.github_client = github_client
+        self.prev_release_version = prev_release_version
+        self.downloader = AsyncGitHubDownloader(self.repo_owner, self.repo_name, branch=prev_release_version, client=self.github_client)
+        self.changelog_corpus = ChangelogCorpus(self.changelog_dir_path)
+        if self.snapshot_loader is None:
+            # With the mod index the download hash is parsed along with the header, one parse serves both.
+            self.snapshot_loader = SnapshotLoader(keys=INDEX_KEYS) if self.update_mod_index else SnapshotLoader()
+        self.mod_index = ModIndex(self.cache_path + "mod_index.sqlite") if self.update_mod_index else None
+        self.diff_cache = DiffCache(self.cache_path + "diff_cache.json")
+        self.changelog_factory = ChangelogFactory(self.changelog_dir_path, self.modpack_name, self.pack_version, corpus=self.changelog_corpus, snapshot_loader=self.snapshot_loader, diff_cache=self.diff_cache)
+        self.packwiz_index = PackwizIndex(self.packwiz_path, self.cache_path + "packwiz_index.json")
+        self.hash_verifier = HashVerifier(self.cache_path + "hash_cache.json")
+
+    def print_paths(self):
+        """This method prints the paths the export works with."""
+        print("[DEBUG] " + self.git_path)
+        print("[DEBUG] " + self.packwiz_path)
+        print("[DEBUG] " + self.packwiz_exe_path)
+        print("[DEBUG] " + self.bcc_client_config_path)
+        print("[DEBUG] " + self.bcc_server_config_path)
+
+    def stats(self):
+        """This method returns the one-line summaries of the caches that belong to the pack."""
+        lines = [self.diff_cache.stats()]
+        if self.mod_index is not None:
+            lines.append(self.mod_index.stats())
+        lines.append(self.hash_verifier.stats())
+        return lines
+
+    def close(self):
+        """This method closes the mod index, and the snapshot loader if it is not shared."""
+        if self.owns_snapshot_loader and self.snapshot_loader is not None:
+            self.snapshot_loader.close()
+        if self.mod_index is not None:
+            self.mod_index.close()
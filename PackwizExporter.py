@@ -0,0 +1,102 @@
+import os
+import sys
+import shutil
+import asyncio
+
+
+class PackwizExporter:
+    def __init__(self, packwiz_exe_path, pack_path, scratch_root):
+        """
+        Runs several packwiz exports of the same pack at once, each in its own scratch copy of the pack.
+
+        packwiz always writes its export to '<name>-<version>.zip' in the pack folder, so exports that share the
+        folder have to run one after another. In separate copies they can run concurrently.
+
+        Parameters:
+        - packwiz_exe_path: str, the packwiz executable.
+        - pack_path: str, the packwiz folder containing pack.toml.
+        - scratch_root: str, the folder the scratch copies are created in. It should be on the same drive as the
+          export destinations, so the finished archives can be renamed into place atomically.
+        """
+        self.packwiz_exe_path = packwiz_exe_path
+        self.pack_path = pack_path
+        self.scratch_root = scratch_root
+
+    def _create_scratch_copy(self, name):
+        """This method copies the pack into a fresh scratch folder and returns its path."""
+        scratch_path = os.path.join(self.scratch_root, name)
+        if os.path.isdir(scratch_path):
+            shutil.rmtree(scratch_path)
+        # Real copies rather than hardlinks, packwiz may rewrite index.toml and pack.toml while exporting.
+        shutil.copytree(self.pack_path, scratch_path, ignore=shutil.ignore_patterns("*.zip"))
+        return scratch_path
+
+    async def _export(self, name, args, artifact, dest_path):
+        """
+        Asynchronously run a single export in its scratch copy and move the archive to dest_path.
+
+        Returns:
+        - True if the archive was exported, False otherwise.
+        """
+        loop = asyncio.get_running_loop()
+        scratch_path = await loop.run_in_executor(None, self._create_scratch_copy, name)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.packwiz_exe_path, *args,
+                cwd=scratch_path,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            # The output of both exports is interleaved line by line, tagged with the export it belongs to.
+            async for line in process.stdout:
+                print(f"[PackWiz {name}] {line.decode(errors='replace').rstrip()}")
+            return_code = await process.wait()
+
+            artifact_path = os.path.join(scratch_path, artifact)
+            if return_code != 0 or not os.path.isfile(artifact_path):
+                print(f"[PackWiz {name}] Export failed with exit code {return_code}.")
+                return False
+
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            try:
+                os.replace(artifact_path, dest_path)
+            except OSError:
+                # Different drives, copy next to the destination first and rename from there.
+                await loop.run_in_executor(None, shutil.copyfile, artifact_path, dest_path + ".tmp")
+                os.replace(dest_path + ".tmp", dest_path)
+            return True
+        finally:
+            await loop.run_in_executor(None, shutil.rmtree, scratch_path, True)
+
+    async def export_async(self, targets):
+        """
+        Asynchronously run several exports concurrently.
+
+        Parameters:
+        - targets: list of (name, packwiz arguments, archive name written by packwiz, destination path) tuples.
+
+        Returns:
+        - dict of name -> whether the export succeeded.
+        """
+        results = await asyncio.gather(*(self._export(*target) for target in targets), return_exceptions=True)
+        try:
+            os.rmdir(self.scratch_root)
+        except OSError:
+            pass # Not empty or never created.
+        exported = {}
+        for (name, *_), result in zip(targets, results):
+            if isinstance(result, Exception):
+                print(f"[PackWiz {name}] Export failed: {result}")
+                result = False
+            exported[name] = result
+        return exported
+
+    def export(self, targets):
+        """This method runs several exports concurrently from synchronous code, see export_async."""
+        # Subprocesses need the proactor loop on Windows, whatever event loop policy other stages have set.
+        loop = asyncio.ProactorEventLoop() if sys.platform == "win32" else asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.export_async(targets))
+        finally:
+            loop.close()
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+
+from HashHelper import HASH_FORMATS, hash_file
+
+MANIFEST_VERSION = 1
+IGNORED_FOLDERS = (".git",)
+IGNORED_SUFFIXES = (".zip", ".mrpack")
+
+
+class UnsupportedIndex(Exception):
+    """Raised when index.toml or pack.toml can not be updated directly, packwiz refresh is used instead."""
+
+
+class PackwizIndex:
+    def __init__(self, pack_path, manifest_path):
+        """
+        Tracks the files of a packwiz pack so that `packwiz refresh` only runs when something changed.
+
+        After every refresh the size, modification time and SHA-256 of each file in the pack folder is recorded. A
+        file counts as changed when its size or modification time differs and its hash does too, so files that
+        were only rewritten with the same content do not trigger a refresh.
+
+        Parameters:
+        - pack_path: str, the packwiz folder containing pack.toml and index.toml.
+        - manifest_path: str, the JSON file the state after the last refresh is stored in.
+        """
+        self.pack_path = pack_path
+        self.manifest_path = manifest_path
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("pack") != os.path.abspath(self.pack_path):
+            return {}
+        return manifest.get("files", {})
+
+    def _save_manifest(self, files):
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf8") as f:
+            json.dump({"version": MANIFEST_VERSION, "pack": os.path.abspath(self.pack_path), "files": files}, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def scan(self):
+        """This method returns {relative path: (size, mtime_ns)} for every file in the pack folder, with '/' separators."""
+        files = {}
+        for root, folders, filenames in os.walk(self.pack_path):
+            folders[:] = [folder for folder in folders if folder not in IGNORED_FOLDERS]
+            relative_root = os.path.relpath(root, self.pack_path).replace(os.sep, "/")
+            for filename in filenames:
+                if filename.endswith(IGNORED_SUFFIXES):
+                    continue
+                stat = os.stat(os.path.join(root, filename))
+                relative_path = filename if relative_root == "." else f"{relative_root}/{filename}"
+                files[relative_path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def _state(self, manifest):
+        """
+        This method compares the pack folder against the manifest.
+
+        Returns:
+        - (files, changed) where files is the new manifest content and changed the set of paths that were added,
+          removed or modified since the last refresh.
+        """
+        files = {}
+        current = self.scan()
+        changed = set(manifest) - set(current)
+        for relative_path, (size, mtime_ns) in current.items():
+            previous = manifest.get(relative_path)
+            if previous and previous[0] == size and previous[1] == mtime_ns:
+                files[relative_path] = previous
+                continue
+            content_hash = hash_file(os.path.join(self.pack_path, relative_path), "sha256")
+            files[relative_path] = [size, mtime_ns, content_hash]
+            if not previous or previous[2] != content_hash:
+                changed.add(relative_path)
+        return files, changed
+
+    def refresh(self, run_packwiz, patch_metafiles=True):
+        """
+        Bring index.toml up to date, running packwiz only if it has to.
+
+        Parameters:
+        - run_packwiz: callable that runs `packwiz refresh` and returns its exit code.
+        - patch_metafiles: bool, whether index.toml and pack.toml may be updated directly when only .pw.toml files in
+          the mods folder changed.
+
+        Returns:
+        - str, 'up to date', 'patched' or 'refreshed'.
+        """
+        manifest = self._load_manifest()
+        files, changed = self._state(manifest)
+
+        if manifest and not changed:
+            self._save_manifest(files) # Remember new modification times of files that were rewritten unchanged.
+            return "up to date"
+
+        if manifest and patch_metafiles and all(path.startswith("mods/") and path.endswith(".pw.toml") for path in changed):
+            try:
+                self._patch_index(changed)
+                self._save_manifest(self._state(files)[0])
+                return "patched"
+            except UnsupportedIndex as ex:
+                print(f"[PackWiz] {ex}, running packwiz refresh.")
+
+        return_code = run_packwiz()
+        if return_code == 0:
+            self._save_manifest(self._state(files)[0])
+        return "refreshed"
+
+    #----------------------------------------
+    # Direct index updates
+    #----------------------------------------
+
+    @staticmethod
+    def _entry_hash_format(block, default):
+        """This method returns the hash format of an index.toml entry, which may override the format of the index."""
+        entry_format = re.search(r'^\s*hash-format\s*=\s*"([^"]+)"', block, re.MULTILINE)
+        if entry_format is None:
+            return default
+        if entry_format.group(1) not in HASH_FORMATS:
+            raise UnsupportedIndex(f"An entry of index.toml uses the hash format {entry_format.group(1)}, which can not be computed here")
+        return entry_format.group(1)
+
+    def _patch_index(self, changed):
+        """This method updates the index.toml entries of the changed metafiles and the index hash in pack.toml."""
+        pack_toml_path = os.path.join(self.pack_path, "pack.toml")
+        with open(pack_toml_path, "r", encoding="utf8", newline="") as f:
+            pack_toml = f.read()
+
+        index_table = re.search(r"^\[index\][^\[]*", pack_toml, re.MULTILINE)
+        if index_table is None:
+            raise UnsupportedIndex("pack.toml has no [index] table")
+        index_file = re.search(r'^\s*file\s*=\s*"([^"]+)"', index_table.group(0), re.MULTILINE)
+        index_hash_format = re.search(r'^\s*hash-format\s*=\s*"([^"]+)"', index_table.group(0), re.MULTILINE)
+        index_hash = re.search(r'^(\s*hash\s*=\s*")([^"]*)(")', index_table.group(0), re.MULTILINE)
+        if not (index_file and index_hash_format and index_hash):
+            raise UnsupportedIndex("The [index] table of pack.toml is not in the expected format")
+
+        index_path = os.path.join(self.pack_path, index_file.group(1))
+        with open(index_path, "r", encoding="utf8", newline="") as f:
+            index_text = f.read()
+
+        # index.toml is a header followed by one [[files]] block per file, sorted by path.
+        newline = "\r\n" if "\r\n" in index_text else "\n"
+        parts = re.split(r"(?m)^(?=\[\[files\]\])", index_text)
+        header, blocks = parts[0], parts[1:]
+
+        # Only the header's hash-format is the index default, entries may have their own.
+        hash_format = re.search(r'^hash-format\s*=\s*"([^"]+)"', header, re.MULTILINE)
+        if hash_format is None or hash_format.group(1) not in HASH_FORMATS:
+            raise UnsupportedIndex("index.toml uses a hash format that can not be computed here")
+        entries = {}
+        for block in blocks:
+            path = re.search(r'^\s*file\s*=\s*"([^"]+)"', block, re.MULTILINE)
+            if path is None:
+                raise UnsupportedIndex("index.toml contains an entry without a file")
+            entries[path.group(1)] = block
+
+        template = next((block for block in blocks if re.search(r"^\s*metafile\s*=\s*true", block, re.MULTILINE)), None)
+        for relative_path in changed:
+            file_path = os.path.join(self.pack_path, relative_path)
+            if not os.path.exists(file_path):
+                entries.pop(relative_path, None)
+                continue
+            if relative_path in entries:
+                new_hash = hash_file(file_path, self._entry_hash_format(entries[relative_path], hash_format.group(1)))
+                entries[relative_path] = re.sub(r'(?m)^(\s*hash\s*=\s*")[^"]*(")', lambda match: match.group(1) + new_hash + match.group(2), entries[relative_path], count=1)
+            elif template is not None:
+                # New entries are hashed with the index's format, like packwiz does, not with an override of the template.
+                new_hash = hash_file(file_path, hash_format.group(1))
+                block = re.sub(r'(?m)^\s*hash-format\s*=.*(\r?\n|$)', "", template)
+                block = re.sub(r'(?m)^(\s*file\s*=\s*")[^"]*(")', lambda match: match.group(1) + relative_path + match.group(2), block, count=1)
+                entries[relative_path] = re.sub(r'(?m)^(\s*hash\s*=\s*")[^"]*(")', lambda match: match.group(1) + new_hash + match.group(2), block, count=1)
+            else:
+                raise UnsupportedIndex("index.toml has no metafile entry to model a new entry on")
+
+        # Every block but the last ends with the blank line that separates it from the next one.
+        ordered = [entries[path] for path in sorted(entries)]
+        ordered = [block.rstrip("\r\n") + newline for block in ordered]
+        new_index_text = header + newline.join(ordered) if ordered else header.rstrip("\r\n") + newline
+
+        with open(index_path + ".tmp", "w", encoding="utf8", newline="") as f:
+            f.write(new_index_text)
+        os.replace(index_path + ".tmp", index_path)
+
+        new_index_hash = hash_file(index_path, index_hash_format.group(1))
+        start = index_table.start() + index_hash.start(2)
+        end = index_table.start() + index_hash.end(2)
+        with open(pack_toml_path + ".tmp", "w", encoding="utf8", newline="") as f:
+            f.write(pack_toml[:start] + new_index_hash + pack_toml[end:])
+        os.replace(pack_toml_path + ".tmp", pack_toml_path)
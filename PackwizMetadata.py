@@ -0,0 +1,150 @@
+import json
+import re
+import toml
+
+# The only keys the changelog and mod list code reads from a pw.toml file.
+HEADER_KEYS = ("name", "filename", "side")
+
+_BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+_TABLE_NAME = re.compile(r"[A-Za-z0-9_-]+(\.[A-Za-z0-9_-]+)*")
+_INTEGER = re.compile(r"[+-]?\d[\d_]*")
+
+
+class UnsupportedSyntax(Exception):
+    """Raised by the line scanner when a file uses TOML syntax it does not handle."""
+
+
+def _parse_value(raw):
+    """This function parses a single-line TOML value and returns it, raising UnsupportedSyntax for anything unusual."""
+    if raw.startswith(('"""', "'''", "{")):
+        raise UnsupportedSyntax(raw)
+
+    if raw.startswith('"'):
+        end = 1
+        while True:
+            end = raw.find('"', end)
+            if end == -1:
+                raise UnsupportedSyntax(raw)
+            # Count the backslashes in front of the quote to see whether it is escaped.
+            backslashes = len(raw[:end]) - len(raw[:end].rstrip("\\"))
+            if backslashes % 2 == 0:
+                break
+            end += 1
+        value, rest = raw[1:end], raw[end + 1:]
+        if "\\" in value:
+            if "\\U" in value:
+                raise UnsupportedSyntax(raw)
+            try:
+                value = json.loads(f'"{value}"')
+            except ValueError:
+                raise UnsupportedSyntax(raw)
+    elif raw.startswith("'"):
+        end = raw.find("'", 1)
+        if end == -1:
+            raise UnsupportedSyntax(raw)
+        value, rest = raw[1:end], raw[end + 1:]
+    else:
+        value, rest = raw.partition("#")[0].strip(), ""
+        if value == "true":
+            value = True
+        elif value == "false":
+            value = False
+        elif _INTEGER.fullmatch(value):
+            value = int(value.replace("_", ""))
+        else:
+            raise UnsupportedSyntax(raw)
+
+    rest = rest.strip()
+    if rest and not rest.startswith("#"):
+        raise UnsupportedSyntax(raw)
+    return value
+
+
+def _skip_value(raw):
+    """This function checks that a value the caller is not interested in cannot span multiple lines."""
+    if raw.startswith(('"""', "'''", "{")):
+        raise UnsupportedSyntax(raw)
+    if raw.startswith("[") and raw.count("[") != raw.count("]"):
+        raise UnsupportedSyntax(raw)
+
+
+def scan_metadata(text, keys=HEADER_KEYS):
+    """
+    Extract the requested keys from the text of a pw.toml file with a single pass over its lines.
+
+    Parameters:
+    - text: str, the content of the pw.toml file.
+    - keys: iterable of str, the keys to extract. Keys inside tables are dotted, e.g. 'download.hash'.
+
+    Returns:
+    - dict of the requested keys that are present in the file.
+
+    Raises UnsupportedSyntax for multi-line strings, inline tables and other syntax the scanner does not handle.
+    """
+    wanted = set(keys)
+    found = {}
+    table = ""
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        if line.startswith("["):
+            if line.startswith("[["):
+                raise UnsupportedSyntax(line)
+            end = line.find("]")
+            name = line[1:end].strip() if end != -1 else ""
+            rest = line[end + 1:].strip()
+            if not _TABLE_NAME.fullmatch(name) or (rest and not rest.startswith("#")):
+                raise UnsupportedSyntax(line)
+            table = name
+            # Top-level keys can only appear before the first table.
+            if not any("." in key for key in wanted - found.keys()):
+                break
+            continue
+
+        key, sep, raw = line.partition("=")
+        key, raw = key.strip(), raw.strip()
+        if not sep or not _BARE_KEY.fullmatch(key):
+            raise UnsupportedSyntax(line)
+
+        full_key = f"{table}.{key}" if table else key
+        if full_key in wanted:
+            found[full_key] = _parse_value(raw)
+            if len(found) == len(wanted):
+                break
+        else:
+            _skip_value(raw)
+
+    return found
+
+
+def _lookup(data, key):
+    """This function resolves a dotted key in parsed TOML data."""
+    for part in key.split("."):
+        if not isinstance(data, dict) or part not in data:
+            raise KeyError(key)
+        data = data[part]
+    return data
+
+
+def parse_metadata(text, keys=HEADER_KEYS):
+    """This function extracts the requested keys from pw.toml text, falling back to the full TOML parser for unusual files."""
+    try:
+        return scan_metadata(text, keys)
+    except UnsupportedSyntax:
+        data = toml.loads(text)
+        metadata = {}
+        for key in keys:
+            try:
+                metadata[key] = _lookup(data, key)
+            except KeyError:
+                pass
+        return metadata
+
+
+def read_metadata(file_path, keys=HEADER_KEYS):
+    """This function reads a pw.toml file and returns the requested keys."""
+    with open(file_path, "r", encoding="utf8") as f:
+        return parse_metadata(f.read(), keys)
@@ -0,0 +1,197 @@
+import os
+import asyncio
+import threading
+from urllib.parse import quote
+
+from PackwizMetadata import read_metadata
+import HashHelper as hashes
+
+# The pw.toml keys needed to download a mod and verify it.
+DOWNLOAD_KEYS = ("name", "filename", "side", "download.url", "download.hash-format", "download.hash", "update.curseforge.file-id")
+SERVER_SIDES = ("both", "server")
+
+
+class ModResolutionError(Exception):
+    """Raised when one or more server mods could not be downloaded or failed hash verification."""
+
+
+def curseforge_download_url(file_id, filename):
+    """This function returns the CurseForge CDN URL of a file, used for mods whose pw.toml has no download URL."""
+    file_id = int(file_id)
+    return f"https://edge.forgecdn.net/files/{file_id // 1000}/{file_id % 1000}/{quote(filename)}"
+
+
+class ServerModResolver:
+    MAX_CONCURRENCY = 8
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, mods_path, cache_path, client, max_concurrency=None, limit_per_host=None):
+        """
+        Downloads the server side mods of a packwiz pack into a hash-keyed jar cache.
+
+        Every pw.toml file already names the jar, where to download it and its hash. Jars are fetched concurrently
+        over one pooled session, verified against that hash and stored under it, so later runs and other packs
+        using the same jar never download it again.
+
+        Parameters:
+        - mods_path: str, the packwiz mods folder.
+        - cache_path: str, the folder of the jar cache.
+        - client: GitHubClient, used for its pooled session, throttling and retries.
+        - max_concurrency: int, the maximum number of downloads running at once.
+        - limit_per_host: int, the maximum number of connections per host.
+        """
+        self.mods_path = mods_path
+        self.cache_path = cache_path
+        self.client = client
+        self.max_concurrency = max_concurrency or self.MAX_CONCURRENCY
+        self.limit_per_host = limit_per_host
+        self.downloaded = 0
+        self.cached = 0
+
+    def read_mods(self, errors=None):
+        """
+        Read the server side mods from the pw.toml files in the mods folder.
+
+        Parameters:
+        - errors: list, optional list that (pw.toml file name, error message) tuples of unreadable files are appended
+          to. Without it the first unreadable file raises.
+
+        Returns:
+        - (mods, extra_files) where mods is a list of dicts with filename, url, hash-format and hash, and
+          extra_files is a list of paths of jars that sit in the mods folder without a pw.toml file.
+        """
+        mods = []
+        extra_files = []
+        for file in sorted(os.listdir(self.mods_path)):
+            file_path = os.path.join(self.mods_path, file)
+            if not os.path.isfile(file_path):
+                continue
+            if not file.endswith(".pw.toml"):
+                extra_files.append(file_path)
+                continue
+
+            try:
+                metadata = read_metadata(file_path, DOWNLOAD_KEYS)
+            except (OSError, ValueError) as ex:
+                if errors is None:
+                    raise
+                errors.append((file, f"{file} could not be read: {ex}"))
+                continue
+            if metadata.get("side", "both") not in SERVER_SIDES:
+                continue
+            url = metadata.get("download.url")
+            if not url and "update.curseforge.file-id" in metadata:
+                url = curseforge_download_url(metadata["update.curseforge.file-id"], metadata["filename"])
+            mods.append({
+                "name": metadata.get("name", file),
+                "metafile": file,
+                "filename": metadata.get("filename"),
+                "url": url,
+                "hash-format": metadata.get("download.hash-format"),
+                "hash": metadata.get("download.hash"),
+            })
+        return mods, extra_files
+
+    def cache_file_path(self, hash_format, file_hash):
+        """This method returns the path a jar with the given hash is stored at in the cache."""
+        file_hash = str(file_hash).lower()
+        return os.path.join(self.cache_path, hash_format.lower(), file_hash[:2], file_hash)
+
+    async def _fetch(self, session, mod, semaphore):
+        """
+        Asynchronously download a single mod into the cache unless it is already there.
+
+        Returns:
+        - str, the path of the verified jar in the cache.
+        """
+        if not (mod["filename"] and mod["url"] and mod["hash-format"] and mod["hash"]):
+            raise ModResolutionError(f"{mod['metafile']} has no download URL or hash")
+        if mod["hash-format"].lower() not in hashes.HASH_FORMATS:
+            raise ModResolutionError(f"{mod['metafile']} uses the unsupported hash format {mod['hash-format']}")
+
+        file_path = self.cache_file_path(mod["hash-format"], mod["hash"])
+        if os.path.isfile(file_path):
+            self.cached += 1
+            return file_path
+        if self.client.http_cache is not None and self.client.http_cache.offline:
+            raise ModResolutionError(f"Failed to download {mod['filename']}: offline mode")
+
+        loop = asyncio.get_running_loop()
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.part"  # The jar cache can be shared by packs exported at the same time.
+        await loop.run_in_executor(None, lambda: os.makedirs(os.path.dirname(file_path), exist_ok=True))
+        async with semaphore:
+            async with self.client.stream_async(session, mod["url"]) as response:
+                if response.status != 200:
+                    raise ModResolutionError(f"Failed to download {mod['filename']}: {response.status}")
+                f = await loop.run_in_executor(None, open, temp_path, "wb")
+                try:
+                    try:
+                        while True:
+                            chunk = await response.content.read(self.CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            await loop.run_in_executor(None, f.write, chunk)
+                    finally:
+                        await loop.run_in_executor(None, f.close)
+
+                    actual_hash = await loop.run_in_executor(None, hashes.hash_file, temp_path, mod["hash-format"])
+                    if not hashes.hashes_match(mod["hash"], actual_hash):
+                        raise ModResolutionError(f"{mod['filename']} failed hash verification: expected {mod['hash-format']} {mod['hash']}, got {actual_hash}")
+                    await loop.run_in_executor(None, os.replace, temp_path, file_path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+
+        self.downloaded += 1
+        print(f"[Server Mods] Downloaded {mod['filename']}")
+        return file_path
+
+    async def resolve_async(self, metafiles=None):
+        """
+        Asynchronously download every server side mod that is not cached yet.
+
+        Parameters:
+        - metafiles: collection of str, optionally only resolve the mods of these pw.toml files.
+
+        Returns:
+        - dict of jar filename -> path of the file to put in the server pack's mods folder.
+
+        Raises ModResolutionError listing every mod that could not be resolved.
+        """
+        read_errors = []
+        mods, extra_files = self.read_mods(read_errors)
+        if metafiles is not None:
+            mods = [mod for mod in mods if mod["metafile"] in metafiles]
+            read_errors = [(file, error) for file, error in read_errors if file in metafiles]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self.client.create_async_session(self.limit_per_host) as session:
+            # Mods sharing a jar (same hash) share one download.
+            fetches = {}
+            keys = []
+            for mod in mods:
+                key = (str(mod["hash-format"]).lower(), str(mod["hash"]).lower()) if mod["hash"] else mod["metafile"]
+                if key not in fetches:
+                    fetches[key] = self._fetch(session, mod, semaphore)
+                keys.append(key)
+            results = dict(zip(fetches, await asyncio.gather(*fetches.values(), return_exceptions=True)))
+        results = [results[key] for key in keys]
+
+        resolved = {os.path.basename(file_path): file_path for file_path in extra_files}
+        errors = [error for _, error in read_errors]
+        for mod, result in zip(mods, results):
+            if isinstance(result, ModResolutionError):
+                errors.append(str(result))
+            elif isinstance(result, Exception):
+                errors.append(f"Failed to download {mod['filename']}: {result!r}")
+            else:
+                resolved[mod["filename"]] = result
+        if errors:
+            raise ModResolutionError("Could not resolve every server mod:\n" + "\n".join(errors))
+
+        print(f"[Server Mods] {len(mods)} server mods, {self.downloaded} downloaded, {self.cached} from the jar cache.")
+        return resolved
+
+    def resolve(self, metafiles=None):
+        """This method downloads every server side mod from synchronous code, see resolve_async."""
+        return asyncio.run(self.resolve_async(metafiles))
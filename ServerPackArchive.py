@@ -0,0 +1,213 @@
+import os
+import zlib
+import struct
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Every entry gets the same timestamp and permissions, so the same input always gives the same archive.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+FILE_MODE = 0o100644
+EXECUTABLE_MODE = 0o100755
+FOLDER_MODE = 0o040755
+EXECUTABLE_SUFFIXES = (".sh",)
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+STORED = 0
+DEFLATED = 8
+
+
+class ServerPackArchive:
+    MAX_WORKERS = os.cpu_count() or 4
+    MAX_PENDING_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, compress_level=6, max_workers=None):
+        """
+        Builds a zip archive straight from the source folders, without copying them into a temp folder first.
+
+        Entries are read and compressed on a thread pool (zlib releases the GIL) and written to the archive in
+        sorted order. Timestamps and permissions are fixed, so the archive is reproducible: the same files always
+        give a byte-identical zip.
+
+        Parameters:
+        - compress_level: int, the zlib compression level.
+        - max_workers: int, the number of threads compressing entries.
+        """
+        self.compress_level = compress_level
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.entries = {}   # arcname -> source path, bytes for generated files, None for folders
+
+    def add_folder(self, source_path, arcname_prefix=""):
+        """This method adds every file and folder below source_path, replacing entries with the same name like copytree(dirs_exist_ok=True)."""
+        prefix = arcname_prefix.strip("/")
+        if prefix:
+            self.entries[prefix + "/"] = None
+        for root, folders, files in os.walk(source_path):
+            relative_root = os.path.relpath(root, source_path).replace(os.sep, "/")
+            parts = [part for part in (prefix, relative_root if relative_root != "." else "") if part]
+            base = "/".join(parts) + "/" if parts else ""
+            for folder in folders:
+                self.entries[f"{base}{folder}/"] = None
+            for file in files:
+                self.entries[f"{base}{file}"] = os.path.join(root, file)
+
+    def add_file(self, source_path, arcname):
+        """This method adds a single file under the given name."""
+        self.entries[arcname] = source_path
+
+    def add_bytes(self, data, arcname):
+        """This method adds a generated file under the given name."""
+        self.entries[arcname] = bytes(data)
+
+    def discard(self, arcname):
+        """This method removes an entry if it was added."""
+        self.entries.pop(arcname, None)
+
+    def _compress(self, source):
+        """This method reads and compresses a file, it runs on the thread pool."""
+        if isinstance(source, bytes):
+            data = source
+        else:
+            with open(source, "rb") as f:
+                data = f.read()
+        crc = zlib.crc32(data)
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush()
+        # Mod jars are already compressed, deflating them again usually makes them bigger.
+        if len(compressed) >= len(data):
+            return STORED, crc, len(data), data
+        return DEFLATED, crc, len(data), compressed
+
+    def write(self, dest_path):
+        """
+        Write the archive to dest_path. The archive is written next to it first and renamed into place when complete.
+
+        Returns:
+        - int, the number of entries written.
+        """
+        names = sorted(self.entries)
+        temp_path = f"{dest_path}.{os.getpid()}.part"
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        try:
+            with open(temp_path, "wb") as f, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                writer = _ZipWriter(f)
+                pending = deque()
+                pending_bytes = 0
+
+                def write_next():
+                    nonlocal pending_bytes
+                    name, size, future = pending.popleft()
+                    pending_bytes -= size
+                    writer.add(name, *future.result())
+
+                for name in names:
+                    source = self.entries[name]
+                    if source is None:
+                        folder = Future()
+                        folder.set_result((STORED, 0, 0, b""))
+                        pending.append((name, 0, folder))
+                        continue
+                    size = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+                    # Keep every worker busy, but bound the memory held by compressed entries waiting to be written.
+                    while pending and (len(pending) >= self.max_workers * 2 or pending_bytes + size > self.MAX_PENDING_BYTES):
+                        write_next()
+                    pending.append((name, size, executor.submit(self._compress, source)))
+                    pending_bytes += size
+                while pending:
+                    write_next()
+                writer.close()
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return len(names)
+
+
+def read_entries(archive_path):
+    """This function returns {arcname: (CRC-32, size)} for the files in an existing zip archive, read from its central directory."""
+    with zipfile.ZipFile(archive_path) as archive:
+        return {info.filename: (info.CRC, info.file_size) for info in archive.infolist() if not info.is_dir()}
+
+
+def file_crc(file_path):
+    """This function returns the CRC-32 of a file, the checksum zip archives record for every entry."""
+    crc = 0
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+
+class _ZipWriter:
+    def __init__(self, f):
+        """A minimal zip writer for entries that were already compressed, with zip64 support for large archives."""
+        self.f = f
+        self.offset = 0
+        self.central_directory = []
+        year, month, day, hour, minute, second = ZIP_DATE_TIME
+        self.dos_date = (year - 1980) << 9 | month << 5 | day
+        self.dos_time = hour << 11 | minute << 5 | second // 2
+
+    def _write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
+
+    def add(self, name, method, crc, size, data):
+        """This method writes a local file header followed by the entry data, and remembers the central directory record."""
+        encoded_name = name.encode("utf8")
+        flags = 0x800 # The name is UTF-8.
+        header_offset = self.offset
+        compressed_size = len(data)
+        zip64 = size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 0x0001, 16, size, compressed_size) if zip64 else b""
+        version = 45 if zip64 else 20
+
+        self._write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, version, flags, method, self.dos_time, self.dos_date, crc,
+            ZIP64_LIMIT if zip64 else compressed_size, ZIP64_LIMIT if zip64 else size, len(encoded_name), len(extra),
+        ))
+        self._write(encoded_name)
+        self._write(extra)
+        self._write(data)
+
+        if name.endswith("/"):
+            external_attr = FOLDER_MODE << 16 | 0x10 # MS-DOS directory flag.
+        elif name.endswith(EXECUTABLE_SUFFIXES):
+            external_attr = EXECUTABLE_MODE << 16
+        else:
+            external_attr = FILE_MODE << 16
+        self.central_directory.append((encoded_name, flags, method, crc, size, compressed_size, header_offset, external_attr))
+
+    def close(self):
+        """This method writes the central directory and the end of central directory records."""
+        directory_offset = self.offset
+        for encoded_name, flags, method, crc, size, compressed_size, header_offset, external_attr in self.central_directory:
+            zip64_fields = []
+            if size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT:
+                zip64_fields += [size, compressed_size]
+            if header_offset >= ZIP64_LIMIT:
+                zip64_fields.append(header_offset)
+            extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields) if zip64_fields else b""
+            version = 45 if zip64_fields else 20
+            large_sizes = size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT
+            self._write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, 3 << 8 | version, version, flags, method, self.dos_time, self.dos_date, crc,
+                ZIP64_LIMIT if large_sizes else compressed_size, ZIP64_LIMIT if large_sizes else size,
+                len(encoded_name), len(extra), 0, 0, 0, external_attr,
+                ZIP64_LIMIT if header_offset >= ZIP64_LIMIT else header_offset,
+            ))
+            self._write(encoded_name)
+            self._write(extra)
+
+        count = len(self.central_directory)
+        directory_size = self.offset - directory_offset
+        if count >= ZIP64_COUNT_LIMIT or directory_offset >= ZIP64_LIMIT or directory_size >= ZIP64_LIMIT:
+            zip64_end_offset = self.offset
+            self._write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, directory_size, directory_offset))
+            self._write(struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1))
+        self._write(struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, min(count, ZIP64_COUNT_LIMIT), min(count, ZIP64_COUNT_LIMIT),
+            min(directory_size, ZIP64_LIMIT), min(directory_offset, ZIP64_LIMIT), 0,
+        ))
@@ -0,0 +1,150 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class UnknownStage(ValueError):
+    """Raised when --only or --skip names a stage that does not exist."""
+
+
+class Stage:
+    def __init__(self, name, run, inputs=(), outputs=(), exclusive=False):
+        """
+        A single step of the export pipeline.
+
+        Parameters:
+        - name: str, the name used for --only/--skip and in the summary.
+        - run: callable without arguments that performs the stage.
+        - inputs: iterable of str, the resources the stage reads (e.g. 'tempgit', 'pack/mods').
+        - outputs: iterable of str, the resources the stage writes.
+        - exclusive: bool, whether the stage must run alone, e.g. because it asks for console input.
+        """
+        self.name = name
+        self.run = run
+        self.inputs = frozenset(inputs)
+        self.outputs = frozenset(outputs)
+        self.exclusive = exclusive
+        self.dependencies = set()
+        self.status = "pending"
+        self.duration = 0.0
+        self.error = None
+
+    def conflicts_with(self, earlier):
+        """This method checks whether the stage has to wait for an earlier stage: a write before a read or write, or a read before a write."""
+        return bool(earlier.outputs & (self.inputs | self.outputs) or earlier.inputs & self.outputs)
+
+
+class StageScheduler:
+    def __init__(self, max_workers=4, initializer=None):
+        """
+        Runs stages as a DAG on a thread pool, starting every stage as soon as the stages it depends on are done.
+
+        Dependencies follow from the declared inputs and outputs: a stage waits for every stage added before it that
+        writes something it reads or writes, or that reads something it writes. Stages without such conflicts run
+        concurrently, and the result is the same as running them one after another in the order they were added.
+
+        Parameters:
+        - max_workers: int, the maximum number of stages running at once.
+        - initializer: callable, optional, called at the start of every worker thread, e.g. to label its output.
+        """
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.stages = {}
+
+    def add(self, name, run, inputs=(), outputs=(), exclusive=False):
+        """This method adds a stage. It depends on every stage added before it that it conflicts with."""
+        if name in self.stages:
+            raise ValueError(f"Stage {name} was added twice.")
+        stage = Stage(name, run, inputs, outputs, exclusive)
+        for earlier in self.stages.values():
+            if stage.conflicts_with(earlier):
+                stage.dependencies.add(earlier.name)
+        self.stages[name] = stage
+        return stage
+
+    def select(self, only=None, skip=None):
+        """This method returns the names of the stages to run, in the order they were added."""
+        for name in list(only or []) + list(skip or []):
+            if name not in self.stages:
+                raise UnknownStage(f"Unknown stage {name}. Available stages: {', '.join(self.stages)}")
+        return [name for name in self.stages if (not only or name in only) and name not in (skip or [])]
+
+    def run(self, only=None, skip=None):
+        """
+        Run the selected stages. Stages that are not selected count as done, stages whose dependencies failed are skipped.
+
+        The first exception raised by a stage is re-raised once every other runnable stage has finished.
+        """
+        selected = self.select(only, skip)
+        for name in self.stages:
+            if name not in selected:
+                self.stages[name].status = "not selected"
+
+        pending = list(selected)
+        running = {}    # future -> stage
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, initializer=self.initializer) as executor:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    dependency_states = [self.stages[dependency].status for dependency in stage.dependencies]
+                    if any(state in ("failed", "skipped") for state in dependency_states):
+                        stage.status = "skipped"
+                        pending.remove(name)
+                        print(f"[Stages] Skipped {name}, a stage it depends on did not finish.")
+                        continue
+                    if any(state in ("pending", "running") for state in dependency_states):
+                        continue
+                    # Exclusive stages wait for the pool to drain and block everything else while they run.
+                    if running and (stage.exclusive or any(other.exclusive for other in running.values())):
+                        continue
+                    stage.status = "running"
+                    pending.remove(name)
+                    running[executor.submit(self._run_stage, stage)] = stage
+                    if stage.exclusive:
+                        break
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+
+        self.wall_time = time.perf_counter() - start
+        self.print_summary()
+
+        for name in selected:
+            if self.stages[name].error is not None:
+                raise self.stages[name].error
+
+    def _run_stage(self, stage):
+        start = time.perf_counter()
+        try:
+            stage.run()
+            stage.status = "done"
+        except BaseException as ex:
+            stage.status = "failed"
+            stage.error = ex
+            print(f"[Stages] {stage.name} failed: {ex}")
+        finally:
+            stage.duration = time.perf_counter() - start
+
+    def critical_path(self):
+        """This method returns the chain of finished stages with the longest total duration, the lower bound of the wall time."""
+        finished = [name for name, stage in self.stages.items() if stage.status in ("done", "failed")]
+        longest = {}    # name -> (total duration, path)
+        for name in finished:  # Dependencies are always added before their dependents.
+            stage = self.stages[name]
+            best = max((longest[dependency] for dependency in stage.dependencies if dependency in longest), default=(0.0, []))
+            longest[name] = (best[0] + stage.duration, best[1] + [name])
+        return max(longest.values(), default=(0.0, []))
+
+    def print_summary(self):
+        """This method prints the duration of every stage and the critical path."""
+        for name, stage in self.stages.items():
+            if stage.status in ("done", "failed"):
+                print(f"[Stages] {name}: {stage.status} in {stage.duration:.2f} s")
+        total, path = self.critical_path()
+        if path:
+            print(f"[Stages] Critical path: {' -> '.join(f'{name} ({self.stages[name].duration:.2f} s)' for name in path)}")
+            print(f"[Stages] {total:.2f} s on the critical path, {sum(stage.duration for stage in self.stages.values()):.2f} s of stage time, {self.wall_time:.2f} s wall time.")
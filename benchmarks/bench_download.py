@@ -0,0 +1,101 @@
+# Compares the old download loop (1 KiB reads, blocking writes on the event loop) against
+# AsyncGitHubDownloader._download_file, against a local HTTP server standing in for GitHub.
+# Usage: python benchmarks/bench_download.py [file count] [file size in KiB]
+
+import io
+import os
+import sys
+import time
+import contextlib
+import asyncio
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GitHubDownloader import AsyncGitHubDownloader
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like GitHub.
+    payload = b""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.payload)))
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(payload):
+    """This function serves the payload on every path from a background thread and returns the server."""
+    FileHandler.payload = payload
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def legacy_download_file(session, url, dest_folder, filename):
+    """The download loop before non-blocking writes, kept here as the baseline."""
+    file_path = os.path.join(dest_folder, filename)
+    async with session.get(url) as response:
+        with open(file_path, 'wb') as f:
+            while True:
+                chunk = await response.content.read(1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+    return True
+
+
+async def time_downloads(downloader, download, base_url, dest_folder, count):
+    """This function downloads count files concurrently and returns the elapsed seconds."""
+    semaphore = asyncio.Semaphore(downloader.MAX_CONCURRENCY)
+
+    async def local_download(session, i):
+        async with semaphore:
+            return await download(session, f"{base_url}/file-{i}", dest_folder, f"file-{i}.bin")
+
+    async with downloader._create_session() as session:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(local_download(session, i) for i in range(count)))
+        elapsed = time.perf_counter() - start
+
+    if not all(results):
+        raise SystemExit("Some downloads failed.")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = (int(sys.argv[2]) if len(sys.argv) > 2 else 1024) * 1024
+
+    payload = os.urandom(size)
+    server = start_server(payload)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    downloader = AsyncGitHubDownloader("owner", "repo")
+
+    with tempfile.TemporaryDirectory() as legacy_folder, tempfile.TemporaryDirectory() as new_folder:
+        legacy_time = asyncio.run(time_downloads(downloader, legacy_download_file, base_url, legacy_folder, count))
+        with contextlib.redirect_stdout(io.StringIO()): # _download_file reports every file.
+            new_time = asyncio.run(time_downloads(downloader, downloader._download_file, base_url, new_folder, count))
+
+        for folder in (legacy_folder, new_folder):
+            with open(os.path.join(folder, "file-0.bin"), "rb") as f:
+                if f.read() != payload:
+                    raise SystemExit(f"{folder} received different content.")
+
+    server.shutdown()
+    total_mib = count * size / (1024 * 1024)
+    print(f"{count} files of {size // 1024} KiB")
+    print(f"1 KiB blocking:   {legacy_time:8.3f} s  ({total_mib / legacy_time:7.1f} MiB/s)")
+    print(f"_download_file:   {new_time:8.3f} s  ({total_mib / new_time:7.1f} MiB/s)")
+    print(f"speedup:          {legacy_time / new_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Compares the header-only pw.toml scanner against toml.load on a synthetic mods folder.
+# Usage: python benchmarks/bench_metadata.py [file count]
+
+import os
+import sys
+import time
+import tempfile
+import toml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PackwizMetadata import HEADER_KEYS, read_metadata
+
+MOD_TEMPLATE = """name = "Synthetic Mod {i} [Fabric]"
+filename = "synthetic-mod-{i}-1.{i}.0+mc1.20.1.jar"
+side = "{side}"
+
+[download]
+url = "https://cdn.modrinth.com/data/{i:08d}/versions/{i:08d}/synthetic-mod-{i}-1.{i}.0+mc1.20.1.jar"
+hash-format = "sha512"
+hash = "{hash}"
+
+[update]
+[update.modrinth]
+mod-id = "{i:08d}"
+version = "{i:08d}"
+"""
+
+
+def create_mods_folder(path, count):
+    """This function fills a folder with synthetic pw.toml files."""
+    sides = ("both", "both", "client", "server")
+    for i in range(count):
+        with open(os.path.join(path, f"synthetic-mod-{i}.pw.toml"), "w", encoding="utf8") as f:
+            f.write(MOD_TEMPLATE.format(i=i, side=sides[i % len(sides)], hash=f"{i:0128x}"))
+
+
+def time_loader(path, load):
+    """This function loads every file in a folder and returns (seconds, results)."""
+    filenames = sorted(os.listdir(path))
+    start = time.perf_counter()
+    results = [load(os.path.join(path, filename)) for filename in filenames]
+    return time.perf_counter() - start, results
+
+
+def load_full(file_path):
+    with open(file_path, "r", encoding="utf8") as f:
+        data = toml.load(f)
+    return {key: data[key] for key in HEADER_KEYS if key in data}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    with tempfile.TemporaryDirectory() as path:
+        create_mods_folder(path, count)
+
+        # Warm the OS file cache so both loaders read from memory.
+        time_loader(path, lambda file_path: open(file_path, "rb").read())
+
+        full_time, full_results = time_loader(path, load_full)
+        scan_time, scan_results = time_loader(path, read_metadata)
+
+    if full_results != scan_results:
+        raise SystemExit("The scanner returned different metadata than toml.load.")
+
+    print(f"{count} files")
+    print(f"toml.load:     {full_time:8.3f} s  ({full_time / count * 1e6:7.1f} us/file)")
+    print(f"read_metadata: {scan_time:8.3f} s  ({scan_time / count * 1e6:7.1f} us/file)")
+    print(f"speedup:       {full_time / scan_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
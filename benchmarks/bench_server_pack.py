@@ -0,0 +1,75 @@
+# Compares the old server pack build (copy both folders into a temp tree, delete the removed mods, make_archive)
+# against ServerPackArchive streaming the entries straight from the source folders.
+# Usage: python benchmarks/bench_server_pack.py [mod count] [mod size in KiB]
+
+import os
+import sys
+import time
+import shutil
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ServerPackArchive import ServerPackArchive
+
+
+def create_sources(root, count, size):
+    """This function creates a server pack folder with configs and a mods folder with half compressible, half random jars."""
+    serverpack_path = os.path.join(root, "Server Pack")
+    mods_path = os.path.join(root, "mods")
+    for i in range(50):
+        os.makedirs(os.path.join(serverpack_path, "config", f"mod{i}"), exist_ok=True)
+        with open(os.path.join(serverpack_path, "config", f"mod{i}", "common.toml"), "w") as f:
+            f.write(f"[general]\nenabled = true\nvalue = {i}\n" * 100)
+    os.makedirs(mods_path)
+    for i in range(count):
+        with open(os.path.join(mods_path, f"mod-{i}.jar"), "wb") as f:
+            f.write(os.urandom(size) if i % 2 else (b"class file contents " * (size // 20 + 1))[:size])
+    return serverpack_path, mods_path
+
+
+def legacy_build(serverpack_path, mods_path, remove_list, temp_path, dest_base):
+    """The server pack build before ServerPackArchive, kept here as the baseline."""
+    shutil.copytree(serverpack_path, temp_path)
+    shutil.copytree(mods_path, os.path.join(temp_path, "mods"), dirs_exist_ok=True)
+    for file in os.listdir(os.path.join(temp_path, "mods")):
+        if file in remove_list:
+            os.remove(os.path.join(temp_path, "mods", file))
+    shutil.make_archive(dest_base, "zip", temp_path)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = (int(sys.argv[2]) if len(sys.argv) > 2 else 1024) * 1024
+    remove_list = [f"mod-{i}.jar" for i in range(0, count, 10)]
+
+    with tempfile.TemporaryDirectory() as root:
+        serverpack_path, mods_path = create_sources(root, count, size)
+
+        start = time.perf_counter()
+        legacy_build(serverpack_path, mods_path, remove_list, os.path.join(root, "temp"), os.path.join(root, "legacy"))
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        archive = ServerPackArchive()
+        archive.add_folder(serverpack_path)
+        archive.add_folder(mods_path, "mods")
+        for file in remove_list:
+            archive.discard("mods/" + file)
+        archive.write(os.path.join(root, "streamed.zip"))
+        new_time = time.perf_counter() - start
+
+        with zipfile.ZipFile(os.path.join(root, "legacy.zip")) as legacy, zipfile.ZipFile(os.path.join(root, "streamed.zip")) as streamed:
+            legacy_files = {info.filename: info.CRC for info in legacy.infolist() if not info.is_dir()}
+            streamed_files = {info.filename: info.CRC for info in streamed.infolist() if not info.is_dir()}
+            if legacy_files != streamed_files:
+                raise SystemExit("The archives contain different files.")
+
+    print(f"{count} mods of {size // 1024} KiB, {ServerPackArchive.MAX_WORKERS} workers")
+    print(f"copytree + make_archive: {legacy_time:8.3f} s")
+    print(f"ServerPackArchive:       {new_time:8.3f} s")
+    print(f"speedup:                 {legacy_time / new_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GitHubClient import GitHubClient
+
+
+class HeaderRecordingHandler(BaseHTTPRequestHandler):
+    """Answers every request with an empty 200 and records its Authorization header."""
+
+    def do_GET(self):
+        self.server.authorizations.append(self.headers.get("Authorization"))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GitHubClientTokenTest(unittest.TestCase):
+    def setUp(self):
+        self.client = GitHubClient(token="secret", max_retries=0)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_token_sent_to_github_hosts(self):
+        for url in ("https://api.github.com/repos/o/r", "https://github.com/o/r", "https://raw.githubusercontent.com/o/r/main/a.toml"):
+            self.assertEqual(self.client._headers(url).get("Authorization"), "Bearer secret", url)
+
+    def test_token_not_sent_to_lookalike_hosts(self):
+        for url in ("https://evilgithub.com/x.jar", "https://github.com.evil.org/x.jar", "https://evilgithubusercontent.com/x.jar", "https://cdn.modrinth.com/x.jar"):
+            self.assertNotIn("Authorization", self.client._headers(url), url)
+
+    def test_token_not_sent_to_other_servers(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), HeaderRecordingHandler)
+        server.authorizations = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            response = self.client.get(f"http://127.0.0.1:{server.server_port}/x.jar", use_cache=False)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.authorizations, [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
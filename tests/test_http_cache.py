@@ -0,0 +1,116 @@
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GitHubClient import GitHubClient
+from HttpCache import HttpCache, OfflineCacheMiss
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the server's documents with an ETag and answers matching If-None-Match requests with 304."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path not in server.documents:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body, etag = server.documents[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.documents = {"/releases/latest": (b'{"tag_name": "1.0.0"}', '"v1"')}
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "http")
+        self.client = GitHubClient(http_cache=HttpCache(self.cache_dir), max_retries=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def offline_client(self):
+        client = GitHubClient(http_cache=HttpCache(self.cache_dir, offline=True), max_retries=0)
+        self.addCleanup(client.close)
+        return client
+
+    def test_revalidates_with_etag(self):
+        first = self.client.get(self.url + "/releases/latest")
+        second = self.client.get(self.url + "/releases/latest")
+
+        self.assertEqual(first.json()["tag_name"], "1.0.0")
+        self.assertFalse(first.from_cache)
+        self.assertEqual(second.json()["tag_name"], "1.0.0")
+        self.assertTrue(second.from_cache)
+        self.assertEqual(self.server.requests, [("/releases/latest", None), ("/releases/latest", '"v1"')])
+        self.assertEqual((self.client.http_cache.misses, self.client.http_cache.revalidated), (1, 1))
+
+    def test_changed_response_replaces_cached_one(self):
+        self.client.get(self.url + "/releases/latest")
+        self.server.documents["/releases/latest"] = (b'{"tag_name": "1.1.0"}', '"v2"')
+
+        response = self.client.get(self.url + "/releases/latest")
+        self.assertEqual(response.json()["tag_name"], "1.1.0")
+        self.assertEqual(self.offline_client().get(self.url + "/releases/latest").json()["tag_name"], "1.1.0")
+
+    def test_offline_serves_cache_without_requests(self):
+        self.client.get(self.url + "/releases/latest")
+        self.client.get(self.url + "/missing")
+        request_count = len(self.server.requests)
+
+        client = self.offline_client()
+        self.assertEqual(client.get(self.url + "/releases/latest").json()["tag_name"], "1.0.0")
+        self.assertEqual(client.get(self.url + "/missing").status_code, 404)
+        self.assertEqual(len(self.server.requests), request_count)
+        self.assertEqual(client.http_cache.hits, 2)
+
+    def test_offline_miss_raises(self):
+        with self.assertRaises(OfflineCacheMiss):
+            self.offline_client().get(self.url + "/releases/latest")
+        self.assertEqual(self.server.requests, [])
+
+    def test_async_revalidates_with_etag(self):
+        async def fetch_twice():
+            async with self.client.create_async_session() as session:
+                first = await self.client.get_async(session, self.url + "/releases/latest")
+                second = await self.client.get_async(session, self.url + "/releases/latest")
+                return first, second
+
+        first, second = asyncio.run(fetch_twice())
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.json()["tag_name"], "1.0.0")
+        self.assertEqual(self.server.requests[-1], ("/releases/latest", '"v1"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
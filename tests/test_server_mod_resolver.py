@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GitHubClient import GitHubClient
+from ServerModResolver import ServerModResolver, ModResolutionError
+
+
+class JarHandler(BaseHTTPRequestHandler):
+    """Serves the server's jars slowly enough that concurrent downloads overlap, counting the requests in flight."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(0.1)
+            body = server.jars.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/java-archive")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServerModResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), JarHandler)
+        self.server.jars = {}
+        self.server.requests = []
+        self.server.lock = threading.Lock()
+        self.server.active = 0
+        self.server.max_active = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.mods_path = os.path.join(self.temp_dir.name, "mods")
+        self.cache_path = os.path.join(self.temp_dir.name, "jars")
+        os.makedirs(self.mods_path)
+        self.client = GitHubClient(max_retries=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def add_mod(self, name, body, side="both", file_hash=None):
+        """This method serves a jar and writes the pw.toml pointing at it, returning the jar's SHA-1."""
+        self.server.jars[f"/{name}.jar"] = body
+        file_hash = file_hash or hashlib.sha1(body).hexdigest()
+        with open(os.path.join(self.mods_path, f"{name}.pw.toml"), "w", encoding="utf8") as f:
+            f.write(f'name = "{name}"\nfilename = "{name}.jar"\nside = "{side}"\n\n[download]\nurl = "{self.url}/{name}.jar"\nhash-format = "sha1"\nhash = "{file_hash}"\n')
+        return file_hash
+
+    def resolver(self):
+        return ServerModResolver(self.mods_path, self.cache_path, self.client)
+
+    def cached_files(self):
+        return [file for _, _, files in os.walk(self.cache_path) for file in files]
+
+    def test_concurrent_fetch_into_hash_keyed_cache(self):
+        hashes = {name: self.add_mod(name, name.encode() * 1000) for name in ("alpha", "beta", "gamma", "delta")}
+        self.add_mod("client_only", b"client", side="client")
+
+        resolver = self.resolver()
+        resolved = resolver.resolve()
+
+        self.assertEqual(set(resolved), {f"{name}.jar" for name in hashes})
+        for name, file_hash in hashes.items():
+            self.assertEqual(resolved[f"{name}.jar"], resolver.cache_file_path("sha1", file_hash))
+            with open(resolved[f"{name}.jar"], "rb") as f:
+                self.assertEqual(f.read(), name.encode() * 1000)
+        self.assertNotIn("/client_only.jar", self.server.requests)
+        self.assertGreater(self.server.max_active, 1)
+        self.assertEqual(resolver.downloaded, 4)
+
+    def test_cache_hit_sends_no_request(self):
+        self.add_mod("alpha", b"alpha jar")
+        self.resolver().resolve()
+        self.server.requests.clear()
+
+        resolver = self.resolver()
+        resolved = resolver.resolve()
+
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual((resolver.downloaded, resolver.cached), (0, 1))
+        with open(resolved["alpha.jar"], "rb") as f:
+            self.assertEqual(f.read(), b"alpha jar")
+
+    def test_hash_mismatch_raises_and_caches_nothing(self):
+        self.add_mod("alpha", b"tampered jar", file_hash=hashlib.sha1(b"original jar").hexdigest())
+
+        with self.assertRaises(ModResolutionError) as context:
+            self.resolver().resolve()
+
+        self.assertIn("failed hash verification", str(context.exception))
+        self.assertEqual(self.cached_files(), [])
+
+    def test_unreadable_metafile_is_reported_with_the_others_resolved(self):
+        file_hash = self.add_mod("alpha", b"alpha jar")
+        with open(os.path.join(self.mods_path, "broken.pw.toml"), "w", encoding="utf8") as f:
+            f.write('name = "broken\nfilename = [\n')
+
+        resolver = self.resolver()
+        with self.assertRaises(ModResolutionError) as context:
+            resolver.resolve()
+
+        self.assertIn("broken.pw.toml could not be read", str(context.exception))
+        self.assertTrue(os.path.isfile(resolver.cache_file_path("sha1", file_hash)))
+
+
+if __name__ == "__main__":
+    unittest.main()